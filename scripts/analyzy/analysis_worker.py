@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dlouho běžící Python worker pro kroky workflow (runScript v src/routes/analyses.js).
+
+Při startu jednou naimportuje pandas, matplotlib (Agg), mysql.connector
+a pomocné moduly analýz a pak na lokálním Unix socketu přijímá kroky:
+
+  požadavek (1 řádek JSON):  {"script": "<cesta k .py>", "workDir": "<results/id>"}
+  odpověď (řádky JSON):      {"stream": "stdout"|"stderr", "data": "..."} …
+                             {"exitCode": 0}
+
+Každý krok běží ve forku předehřátého procesu: skript se spustí přes runpy
+jako __main__ s vlastními globály (data, OUTPUT_DIR, …), vlastním sys.argv
+a cwd = workDir, takže se kroky navzájem neovlivní a můžou běžet souběžně.
+Odpadá start interpretru a import knihoven – režie kroku je fork (ms).
+
+Použití: python analysis_worker.py [socket]
+         (výchozí socket: $PY_WORKER_SOCKET nebo /tmp/rpa-analysis-worker.sock)
+
+Závislosti: pandas, matplotlib, mysql-connector-python (Linux – os.fork)
+"""
+
+import io
+import json
+import os
+import runpy
+import signal
+import socket
+import sys
+import traceback
+
+# ======= KONFIGURACE =======
+
+DEFAULT_SOCKET = "/tmp/rpa-analysis-worker.sock"
+# backend/scripts bez symlinků – porovnává se s realpath skriptu (nasazení přes symlink)
+SCRIPTS_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Knihovny a moduly, které se naimportují jednou v rodiči (fork je sdílí)
+PRELOAD_MODULES = [
+    "numpy", "pandas", "matplotlib.pyplot", "mysql.connector",
+    "dbsettings", "stream_fetch", "shared_data", "render_pool",
+    "grouped_stats", "desc_stats", "desc_cache", "series_renderer",
+]
+
+
+# ======= POMOCNÉ =======
+class StepStream(io.TextIOBase):
+    """stdout/stderr kroku – po celých řádcích posílané klientovi jako JSON."""
+
+    def __init__(self, out, name):
+        self._out = out
+        self._name = name
+        self._pending = ""
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self._pending += text
+        if "\n" in self._pending:
+            head, _, self._pending = self._pending.rpartition("\n")
+            self._send(head + "\n")
+        return len(text)
+
+    def flush(self):
+        if self._pending:
+            self._send(self._pending)
+            self._pending = ""
+
+    def _send(self, text):
+        self._out.write(json.dumps({"stream": self._name, "data": text}, ensure_ascii=False) + "\n")
+        self._out.flush()
+
+
+def preload():
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from startup import pyplot
+    plt = pyplot()  # Agg + trvalá font cache ještě před importem matplotlibu
+    for name in PRELOAD_MODULES:
+        __import__(name)
+    # první vykreslení načítá fonty – ať to nezaplatí každý krok znovu
+    fig = plt.figure()
+    fig.gca().set_title("0")
+    fig.savefig(io.BytesIO(), format="png")
+    plt.close(fig)
+    print(f"Předehřáto: {', '.join(PRELOAD_MODULES)}")
+
+
+def resolve_script(script):
+    """Absolutní cesta ke skriptu – povolené jsou jen .py ve složce scripts."""
+    path = os.path.realpath(script if os.path.isabs(script) else os.path.join(SCRIPTS_ROOT, script))
+    if os.path.commonpath([path, SCRIPTS_ROOT]) != SCRIPTS_ROOT or not path.endswith(".py"):
+        raise ValueError(f"Skript mimo {SCRIPTS_ROOT}: {script}")
+    if not os.path.exists(path):
+        raise ValueError(f"Skript neexistuje: {path}")
+    return path
+
+
+def run_step(script, work_dir):
+    """Spustí skript jako __main__ (nové globály) s argv [script, work_dir]; vrací exit kód."""
+    sys.argv = [script, work_dir]
+    sys.path.insert(0, os.path.dirname(script))
+    os.chdir(work_dir)
+    os.environ["WORK_DIR"] = work_dir
+    code = _run_main(script)
+    # fork končí os._exit – atexit se nespustí, timings.json zapíšeme sami
+    import timings
+    timings.flush(exit_code=code)
+    return code
+
+
+def _run_main(script):
+    try:
+        runpy.run_path(script, run_name="__main__")
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        if isinstance(e.code, int):
+            return e.code
+        print(e.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+
+# ======= KROK (potomek) =======
+def handle_connection(conn):
+    """Běží ve forku – přečte požadavek, provede krok a pošle výstup + exit kód."""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)  # kvůli render_pool (waitpid)
+    reader = conn.makefile("r", encoding="utf-8")
+    writer = conn.makefile("w", encoding="utf-8")
+    sys.stdout = StepStream(writer, "stdout")
+    sys.stderr = StepStream(writer, "stderr")
+    try:
+        request = json.loads(reader.readline())
+        code = run_step(resolve_script(request["script"]), request["workDir"])
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        writer.write(json.dumps({"exitCode": code}) + "\n")
+        writer.flush()
+    finally:
+        conn.close()
+
+
+# ======= HLAVNÍ =======
+def serve(socket_path):
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(16)
+    # ukončené kroky nenechávají zombie procesy
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # kill → úklid socketu ve finally
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Worker poslouchá na {socket_path}")
+    sys.stdout.flush()
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                try:
+                    handle_connection(conn)
+                finally:
+                    os._exit(0)
+            conn.close()
+    finally:
+        server.close()
+        os.unlink(socket_path)
+
+
+def main():
+    if len(sys.argv) > 2:
+        print("Použití: python analysis_worker.py [socket]")
+        sys.exit(1)
+    socket_path = sys.argv[1] if len(sys.argv) == 2 else os.environ.get("PY_WORKER_SOCKET", DEFAULT_SOCKET)
+    preload()
+    serve(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dávkové spuštění více výsledků (results/<id>) se sdílenými řezy dat.
+
+Výsledky se seskupí podle (basketId, dateFrom, dateTo). Za každou skupinu
+se z DB jednou načtou řezy, které kroky jejích workflow potřebují
+(shared_data: price_stat_i1 pro plot skripty a prepare_stats, denní mapy cen
+pro prepare_stats a histogram.py s "aggregatedFetch" nebo číselným histBins),
+a do <work_dir>/cache všech výsledků skupiny se nalinkují (hardlink, jinak
+kopie). Kroky pak data najdou hotová a do DB pro ně nesahají – noční dávka
+roste s počtem různých košíků a období, ne s počtem analýz.
+
+Kroky se berou z data.json "workflow" (cesty relativně ke scripts/, jako
+runScript v src/routes/analyses.js) a běží pro každý výsledek v pořadí:
+.py ve forku jednou předehřátého procesu (jako analysis_worker.py),
+.js/.cjs přes node. Chybný krok ukončí workflow svého výsledku, ostatní
+výsledky pokračují. Po posledním kroku se smažou tabulky a_desc*_<resultId>
+(jako runAnalysis). Stav výsledků v tabulce result dávka nemění.
+
+prepare_stats se statsEngine "sql" počítá na DB serveru do tabulek
+a_desc_<resultId> – sdílené řezy využije jen statsEngine "python".
+
+Použití:
+  python batch_run.py <work_dir> [<work_dir> ...] [--dry-run] [--report batch.json]
+
+Závislosti: jako kroky workflow (numpy, pandas, matplotlib, mysql-connector-python), node pro .js kroky
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from analysis_worker import SCRIPTS_ROOT, preload, resolve_script, run_step
+from dbsettings import DB_BACKEND
+from histogram import uses_shared_prices
+from shared_data import CACHE_DIR, cache_key, daily_price_path, price_stat_path
+
+# ======= KONFIGURACE =======
+
+# kroky, které čtou řez price_stat_i1 přes shared_data
+PRICE_STAT_STEPS = {
+    "plot_min_mode_avg.py", "plot_sladenost.py", "plot_index_sladeni.py",
+    "plot_cenovy_odstup_a.py", "plot_cenovy_odstup_b.py", "entropizace_cen.py",
+    "scatterplot_sladenost_cenovy_odstup_b.py",
+}
+NODE_EXTENSIONS = (".js", ".cjs")
+
+
+# ======= POMOCNÉ =======
+def read_settings(work_dir):
+    """data.json výsledku (bez load_data_json – ten by zahájil měření kroku v rodiči)."""
+    with open(os.path.join(work_dir, "data.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def workflow_steps(data):
+    return [s.strip() for s in (data.get('workflow') or '').split('\n') if s.strip()]
+
+
+def python_stats_extract(data):
+    """Spočítá prepare_stats a_desc v Pythonu z řezů shared_data (ne z cache / úložiště cen)?"""
+    python_engine = data.get('statsEngine') == 'python' or DB_BACKEND == "duckdb" or data.get('priceStore')
+    return python_engine and not data.get('statsCache')
+
+
+def needed_extracts(data, steps):
+    """Které sdílené řezy ({"price_stat", "daily_prices"}) kroky výsledku načtou."""
+    names = {os.path.basename(s) for s in steps}
+    needs = set()
+    if names & PRICE_STAT_STEPS:
+        needs.add("price_stat")
+    if "prepare_stats.py" in names and python_stats_extract(data):
+        needs.add("price_stat")
+        if not data.get('priceStore'):
+            needs.add("daily_prices")
+    if "histogram.py" in names and uses_shared_prices(data):
+        needs.add("daily_prices")
+    return needs
+
+
+def group_results(work_dirs):
+    """{cache_key: [(work_dir, data, kroky), …]} v pořadí zadání."""
+    groups = {}
+    for work_dir in work_dirs:
+        data = read_settings(work_dir)
+        groups.setdefault(cache_key(data), []).append((work_dir, data, workflow_steps(data)))
+    return groups
+
+
+def share_file(src, work_dir):
+    """Soubor z cache vedoucího výsledku do cache dalšího (hardlink, jinak kopie; atomicky)."""
+    dst = os.path.join(work_dir, CACHE_DIR, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def in_fork(fn, *args):
+    """Zavolá fn(*args) ve forku a vrátí jeho exit kód (rodič nedrží připojení k DB)."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = fn(*args)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            import traceback
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+# ======= EXTRAKCE =======
+def extract(work_dir, data, needs):
+    """Načte sdílené řezy do <work_dir>/cache (běží ve forku); měření do timings.json výsledku."""
+    import timings
+    from shared_data import load_daily_prices, load_price_stats
+
+    timings.start(work_dir, step="batch_run.py")
+    if "price_stat" in needs:
+        load_price_stats(work_dir, data)
+    if "daily_prices" in needs:
+        load_daily_prices(work_dir, data)
+    timings.flush(exit_code=0)
+    return 0
+
+
+def extract_group(members):
+    """Řezy pro skupinu jednou (do prvního výsledku) a nalinkování ostatním; vrací popis."""
+    needs = set()
+    for _, data, steps in members:
+        needs |= needed_extracts(data, steps)
+    if not needs:
+        return {"extracts": [], "seconds": 0.0, "ok": True}
+
+    leader, data, _ = members[0]
+    started = time.perf_counter()
+    ok = in_fork(extract, leader, data, needs) == 0
+    if ok:
+        paths = []
+        if "price_stat" in needs:
+            paths.append(price_stat_path(leader))
+        if "daily_prices" in needs:
+            paths.append(daily_price_path(leader))
+        for work_dir, _, _ in members[1:]:
+            for path in paths:
+                share_file(path, work_dir)
+    return {"extracts": sorted(needs), "seconds": round(time.perf_counter() - started, 1), "ok": ok}
+
+
+# ======= KROKY =======
+def run_workflow(work_dir, steps):
+    """Kroky výsledku v pořadí; vrací [{step, exit_code, seconds}] až po první chybný."""
+    results = []
+    for step in steps:
+        print(f"--- {os.path.basename(work_dir)}: {step}")
+        started = time.perf_counter()
+        if step.lower().endswith(NODE_EXTENSIONS):
+            sys.stdout.flush()
+            code = subprocess.run(
+                ["node", os.path.join(SCRIPTS_ROOT, step), work_dir],
+                cwd=work_dir, env={**os.environ, "WORK_DIR": work_dir},
+            ).returncode
+        else:
+            try:
+                script = resolve_script(step)
+            except ValueError as e:
+                print(f"Chyba: {e}")
+                code = 1
+            else:
+                code = in_fork(run_step, script, work_dir)
+        results.append({"step": step, "exit_code": code,
+                        "seconds": round(time.perf_counter() - started, 1)})
+        if code != 0:
+            print(f"Krok {step} skončil s kódem {code} – zbytek workflow {work_dir} přeskakuji.")
+            break
+    return results
+
+
+def drop_stats_tables(data):
+    """Tabulky statistik výsledku z prepare_stats (statsEngine "sql") – jako dropStatsTables v analyses.js."""
+    from dbsettings import mysql_connection, stats_table
+    tables = [stats_table(data, base) for base in ("a_desc", "a_desc1", "a_desc2", "a_desc3")]
+    conn = mysql_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(f"DROP TABLE IF EXISTS {', '.join(tables)}")
+        cur.close()
+    finally:
+        conn.close()
+    return 0
+
+
+def cleanup(data, steps):
+    """Po workflow výsledku: smazat jeho tabulky a_desc* (jen MySQL a prepare_stats v krocích)."""
+    if data.get('resultId') is None or DB_BACKEND != "mysql":
+        return
+    if "prepare_stats.py" not in {os.path.basename(s) for s in steps}:
+        return
+    if in_fork(drop_stats_tables, data) != 0:
+        print(f"Pozor: tabulky statistik výsledku {data['resultId']} se nepodařilo smazat.")
+
+
+# ======= HLAVNÍ =======
+def main():
+    parser = argparse.ArgumentParser(description="Dávkové spuštění výsledků se sdílenými řezy dat.")
+    parser.add_argument("work_dirs", nargs="+", help="adresáře výsledků (results/<id>) s data.json")
+    parser.add_argument("--dry-run", action="store_true", help="jen vypsat skupiny a potřebné řezy")
+    parser.add_argument("--report", help="souhrn dávky do JSON souboru")
+    args = parser.parse_args()
+
+    work_dirs = [os.path.abspath(w) for w in args.work_dirs]
+    missing = [w for w in work_dirs if not os.path.exists(os.path.join(w, "data.json"))]
+    if missing:
+        print(f"Chyba: chybí data.json v {', '.join(missing)}")
+        sys.exit(1)
+
+    groups = group_results(work_dirs)
+    print(f"{len(work_dirs)} výsledků, {len(groups)} různých košíků/období.")
+    for key, members in groups.items():
+        needs = set().union(*(needed_extracts(d, s) for _, d, s in members))
+        print(f"  {key}: {len(members)} výsledků, řezy: {', '.join(sorted(needs)) or 'žádné'}")
+    if args.dry_run:
+        return
+
+    preload()
+    report = {"started_at": datetime.now().isoformat(timespec="seconds"), "groups": []}
+    failed = 0
+    for key, members in groups.items():
+        print(f"\n=== {key} ({len(members)} výsledků)")
+        group = {"key": key, **extract_group(members), "results": []}
+        if not group["ok"]:
+            print(f"Načtení sdílených dat pro {key} selhalo – kroky si data načtou samy.")
+        for work_dir, data, steps in members:
+            steps_run = run_workflow(work_dir, steps)
+            cleanup(data, steps)
+            ok = len(steps_run) == len(steps) and all(r["exit_code"] == 0 for r in steps_run)
+            failed += not ok
+            group["results"].append({"work_dir": work_dir, "ok": ok, "steps": steps_run})
+        report["groups"].append(group)
+
+    print(f"\n{len(work_dirs) - failed}/{len(work_dirs)} výsledků v pořádku, "
+          f"{sum(bool(g['extracts']) for g in report['groups'])} sdílených načtení z DB.")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Uloženo: {args.report}")
+    print("Hotovo.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
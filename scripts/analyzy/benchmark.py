@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark kroků analýzy nad syntetickou databází.
+
+Pro každé měřítko (produkty × dny × pozorování na den) vygeneruje tabulky
+product, bp, price a price_stat_i1 do zvláštního schématu (BENCH_SCHEMA)
+na lokálním MySQL/MariaDB, připraví work_dir s data.json a postupně spustí
+kroky (prepare_stats, histogram, grafy) jako samostatné procesy – stejně
+jako runScript. Pro každý krok zaznamená:
+
+  wall_s      – čas procesu
+  db_s        – čas serveru na dotazech schématu (performance_schema, jinak null)
+  peak_rss_mb – špičková paměť procesu kroku (bez workerů render_pool)
+  output_mb   – kolik přibylo ve work_dir
+
+Výsledek jde do JSON reportu (--report) a souhrn na stdout.
+
+Ostrá DB se nepoužije: server se musí zadat explicitně v ANALYZY_DB_HOST
+(+ ANALYZY_DB_PORT/USER/PASSWORD), schéma si benchmark založí sám a kroky
+na něj přesměruje přes ANALYZY_DB_DATABASE (viz dbsettings).
+
+Použití:
+  python benchmark.py [--scales 100x90x5,1000x365x5] [--steps prepare_stats,histogram]
+                      [--report bench_report.json] [--keep]
+
+Závislosti: mysql-connector-python, numpy (+ závislosti měřených skriptů)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+# ======= KONFIGURACE =======
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCH_SCHEMA = "rpa_bench"
+BENCH_BASKET = 1
+BENCH_DATE_FROM = "2025-01-01"
+BENCH_RESULT_ID = 900001      # a_desc_<id> – nepřepíše žádný skutečný výsledek
+
+DEFAULT_SCALES = "100x90x5,1000x365x5"
+INSERT_BATCH = 5000           # řádků na jeden INSERT
+MISSING_DAY_SHARE = 0.05      # podíl dní bez jediné ceny (T0)
+INVALID_SHARE = 0.02          # podíl neplatných cen
+
+# (název, skript, přepsané hodnoty data.json)
+BENCH_STEPS = [
+    ("prepare_stats", "prepare_stats.py", {}),
+    ("prepare_stats_python", "prepare_stats.py", {"statsEngine": "python"}),
+    ("histogram", "histogram.py", {}),
+    ("histogram_aggregated", "histogram.py", {"aggregatedFetch": True}),
+    ("plot_min_mode_avg", "plot_min_mode_avg.py", {}),
+    ("plot_sladenost", "plot_sladenost.py", {}),
+    ("plot_index_sladeni", "plot_index_sladeni.py", {}),
+    ("plot_cenovy_odstup_a", "plot_cenovy_odstup_a.py", {}),
+    ("plot_cenovy_odstup_b", "plot_cenovy_odstup_b.py", {}),
+    ("entropizace_cen", "entropizace_cen.py", {}),
+    ("scatterplot", "scatterplot_sladenost_cenovy_odstup_b.py", {}),
+]
+
+TABLES_DDL = [
+    """CREATE TABLE product (
+        id INT PRIMARY KEY, name VARCHAR(255) NOT NULL,
+        brand VARCHAR(255), category VARCHAR(255))""",
+    """CREATE TABLE bp (
+        basket_id INT, product_id INT, PRIMARY KEY (basket_id, product_id))""",
+    """CREATE TABLE price (
+        product_id INT, date DATE, price DECIMAL(10,2), invalid TINYINT,
+        KEY (product_id, date))""",
+    """CREATE TABLE price_stat_i1 (
+        product_id INT, date DATE, seller_count INT,
+        min_price DECIMAL(10,2), mode_price DECIMAL(10,2), avg_price DECIMAL(12,4),
+        on_par DOUBLE, diB DOUBLE, PRIMARY KEY (product_id, date))""",
+]
+
+# čas serveru na dotazech ve schématu (pikosekundy)
+DB_TIME_SQL = """
+SELECT COALESCE(SUM(SUM_TIMER_WAIT), 0)
+FROM performance_schema.events_statements_summary_by_digest
+WHERE SCHEMA_NAME = %s
+"""
+
+
+# ======= POMOCNÉ =======
+def parse_scale(text):
+    products, days, obs = (int(v) for v in text.lower().split("x"))
+    return {"products": products, "days": days, "obs": obs}
+
+
+def bench_connection():
+    """Připojení k benchmarkovému serveru (bez schématu – to se teprve zakládá)."""
+    import mysql.connector
+    from dbsettings import DB_CONFIG
+    config = {k: v for k, v in DB_CONFIG.items() if k != "database"}
+    return mysql.connector.connect(**config)
+
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for f in files:
+            total += os.path.getsize(os.path.join(root, f))
+    return total
+
+
+def insert_rows(cur, sql, rows):
+    for i in range(0, len(rows), INSERT_BATCH):
+        cur.executemany(sql, rows[i:i + INSERT_BATCH])
+
+
+# ======= GENEROVÁNÍ =======
+def product_day_stats(day_idx, prices_cents):
+    """Řádky price_stat_i1 jednoho produktu z jeho platných cen (v haléřích) po dnech."""
+    from grouped_stats import partition_price_stats
+
+    s = partition_price_stats(day_idx, prices_cents)
+    return {
+        "day": s["key"],
+        "seller_count": s["seller_count"],
+        "min_price": s["min_cents"] / 100,
+        "mode_price": s["mode_cents"] / 100,
+        "avg_price": s["avg_price"],
+        "on_par": s["on_par"],
+        "diB": s["diB"],
+    }
+
+
+def generate(cur, products, days, obs, seed=1):
+    """Založí schéma s tabulkami a naplní ho syntetickými daty."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(BENCH_DATE_FROM)
+
+    cur.execute(f"DROP DATABASE IF EXISTS {BENCH_SCHEMA}")
+    cur.execute(f"CREATE DATABASE {BENCH_SCHEMA}")
+    cur.execute(f"USE {BENCH_SCHEMA}")
+    for ddl in TABLES_DDL:
+        cur.execute(ddl)
+
+    insert_rows(cur, "INSERT INTO product VALUES (%s, %s, %s, %s)",
+                [(pid, f"Produkt {pid}", f"Značka {pid % 50}", f"Kategorie {pid % 20}")
+                 for pid in range(1, products + 1)])
+    insert_rows(cur, "INSERT INTO bp VALUES (%s, %s)",
+                [(BENCH_BASKET, pid) for pid in range(1, products + 1)])
+
+    # cenové hladiny kolem základní ceny – opakují se, aby měl modus smysl
+    levels = np.array([0.95, 0.99, 1.0, 1.0, 1.0, 1.02, 1.05, 1.1])
+    for pid in range(1, products + 1):
+        base = rng.uniform(10, 5000)
+        day_idx = np.repeat(np.arange(days), obs)
+        present = rng.random(days) >= MISSING_DAY_SHARE
+        day_idx = day_idx[present[day_idx]]
+        trend = 1 + 0.1 * np.sin(day_idx / 30 + pid)
+        cents = np.rint(base * trend * rng.choice(levels, len(day_idx)) * 100).astype("int64")
+        invalid = rng.random(len(day_idx)) < INVALID_SHARE
+
+        dates = (start + day_idx).astype(str)
+        insert_rows(cur, "INSERT INTO price VALUES (%s, %s, %s, %s)",
+                    list(zip([pid] * len(dates), dates.tolist(), (cents / 100).tolist(),
+                             invalid.astype(int).tolist())))
+
+        valid = ~invalid
+        if not valid.any():
+            continue
+        s = product_day_stats(day_idx[valid], cents[valid])
+        insert_rows(cur, "INSERT INTO price_stat_i1 VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    list(zip([pid] * len(s["day"]), (start + s["day"]).astype(str).tolist(),
+                             s["seller_count"].tolist(), s["min_price"].tolist(),
+                             s["mode_price"].tolist(), s["avg_price"].tolist(),
+                             s["on_par"].tolist(), s["diB"].tolist())))
+    cur.execute("ANALYZE TABLE product, bp, price, price_stat_i1")
+    cur.fetchall()
+
+
+# ======= MĚŘENÍ =======
+def db_time(cur):
+    """Kumulovaný čas serveru na dotazech schématu v sekundách, nebo None."""
+    try:
+        cur.execute(DB_TIME_SQL, (BENCH_SCHEMA,))
+        return int(cur.fetchone()[0]) / 1e12
+    except Exception:
+        return None
+
+
+def run_step(script, work_dir, env):
+    """Spustí krok jako runScript; vrací (exit kód, čas s, peak RSS v MB, výstup)."""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPT_DIR, script), work_dir],
+        cwd=work_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    output = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - started
+    return proc.returncode, wall, usage.ru_maxrss / 1024, output
+
+
+def bench_scale(cur, scale, steps, env):
+    products, days, obs = scale["products"], scale["days"], scale["obs"]
+    date_to = date.fromordinal(date.fromisoformat(BENCH_DATE_FROM).toordinal() + days - 1).isoformat()
+
+    print(f"Generuji {products} produktů × {days} dní × {obs} cen …")
+    started = time.perf_counter()
+    generate(cur, products, days, obs)
+    gen_s = time.perf_counter() - started
+    print(f"  vygenerováno za {gen_s:.1f} s")
+
+    work_dir = tempfile.mkdtemp(prefix="rpa_bench_")
+    base_data = {
+        "basketId": BENCH_BASKET, "dateFrom": BENCH_DATE_FROM, "dateTo": date_to,
+        "resultId": BENCH_RESULT_ID,
+    }
+    results = []
+    try:
+        for name, script, overrides in steps:
+            with open(os.path.join(work_dir, "data.json"), "w", encoding="utf-8") as f:
+                json.dump({**base_data, **overrides}, f, indent=2)
+            size_before = dir_size(work_dir)
+            db_before = db_time(cur)
+            code, wall, rss_mb, output = run_step(script, work_dir, env)
+            db_after = db_time(cur)
+            result = {
+                "step": name,
+                "script": script,
+                "exit_code": code,
+                "wall_s": round(wall, 3),
+                "db_s": None if db_before is None or db_after is None else round(db_after - db_before, 3),
+                "peak_rss_mb": round(rss_mb, 1),
+                "output_mb": round((dir_size(work_dir) - size_before) / 2**20, 2),
+            }
+            results.append(result)
+            status = "OK" if code == 0 else f"CHYBA {code}"
+            db_text = "-" if result["db_s"] is None else f"{result['db_s']:.2f}"
+            print(f"  {name:24s} {wall:8.2f} s  DB {db_text:>7s} s  "
+                  f"RSS {rss_mb:7.1f} MB  výstup {result['output_mb']:7.2f} MB  {status}")
+            if code != 0:
+                print("    " + "\n    ".join(output.strip().splitlines()[-5:]))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        # tabulky výsledku SQL enginu (jinak je maže runAnalysis po posledním kroku)
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.a_desc_{BENCH_RESULT_ID}")
+
+    return {**scale, "date_from": BENCH_DATE_FROM, "date_to": date_to,
+            "generate_s": round(gen_s, 1), "steps": results}
+
+
+# ======= HLAVNÍ =======
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kroků analýzy nad syntetickou DB.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES,
+                        help="měřítka produkty×dny×ceny_na_den oddělená čárkou")
+    parser.add_argument("--steps", default="",
+                        help="jen vybrané kroky (názvy z BENCH_STEPS oddělené čárkou)")
+    parser.add_argument("--report", default="bench_report.json", help="cesta k JSON reportu")
+    parser.add_argument("--keep", action="store_true", help="schéma po doběhnutí nemazat")
+    args = parser.parse_args()
+
+    if not os.environ.get("ANALYZY_DB_HOST"):
+        print("Chyba: zadejte benchmarkový server v ANALYZY_DB_HOST "
+              "(+ ANALYZY_DB_PORT/USER/PASSWORD) – ostrá DB se nepoužívá.")
+        sys.exit(1)
+
+    steps = BENCH_STEPS
+    if args.steps:
+        wanted = set(args.steps.split(","))
+        steps = [s for s in BENCH_STEPS if s[0] in wanted]
+        unknown = wanted - {s[0] for s in steps}
+        if unknown:
+            print(f"Chyba: neznámé kroky {', '.join(sorted(unknown))}")
+            sys.exit(1)
+
+    # kroky čtou ze schématu benchmarku (dbsettings)
+    env = dict(os.environ, ANALYZY_DB_DATABASE=BENCH_SCHEMA)
+
+    conn = bench_connection()
+    cur = conn.cursor()
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "scales": [],
+    }
+    try:
+        for text in args.scales.split(","):
+            report["scales"].append(bench_scale(cur, parse_scale(text), steps, env))
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP DATABASE IF EXISTS {BENCH_SCHEMA}")
+        cur.close()
+        conn.close()
+
+    print(f"Uloženo: {args.report}")
+    failed = [s["step"] for sc in report["scales"] for s in sc["steps"] if s["exit_code"] != 0]
+    if failed:
+        print(f"Selhané kroky: {', '.join(failed)}")
+        sys.exit(1)
+    print("Hotovo.")
+
+
+if __name__ == "__main__":
+    main()
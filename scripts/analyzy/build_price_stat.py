@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Inkrementální sestavení tabulky price_stat_i1 z tabulky price.
+
+Pro každý (produkt, den) z platných cen (invalid = 0, cena není NULL):
+  seller_count – počet cen, min_price, mode_price (nejčastější cena, při shodě
+  nižší), avg_price, on_par – podíl cen rovných minimu, diB = modus / minimum.
+
+Tabulka price nemá čas importu ani rostoucí id, proto se změny hledají přes
+watermark na datu: poslední běh si uloží nejvyšší datum platné ceny
+(WATERMARK_TABLE) a další běh přepočítá jen dny od watermarku minus
+--lookback dní (dokončené a opožděné importy posledních dní). Přepočtené
+řádky se porovnají s uloženými a zapíše se jen to, co se změnilo
+(hromadný INSERT … ON DUPLICATE KEY UPDATE); (produkt, den), kde už žádná
+platná cena nezbyla, se smaže – u produktů z dávek při porovnání, u produktů,
+které v okně nemají jedinou platnou cenu (a do žádné dávky se tak nedostanou),
+závěrečným průchodem přes uložené řádky okna bez platné ceny v price.
+Denní běh je tak úměrný počtu cen v okně, ne celé historii.
+
+Bez watermarku (první běh) nebo s --full se přepočítá celá historie,
+--since DATUM přepočítá od zadaného dne. Watermark se posune až po
+úspěšném zápisu všech dávek – přerušený běh se dá bezpečně zopakovat.
+
+Upsert potřebuje PRIMARY/UNIQUE klíč (product_id, date) na price_stat_i1;
+bez něj se změněné řádky nejdřív smažou a vloží znovu (v transakci).
+Pro rychlé čtení okna pomáhá index price(invalid, date, …) – viz index_advisor.py (v4).
+
+Použití:
+  python build_price_stat.py [--lookback 1] [--since 2025-01-01] [--full] [--dry-run]
+
+Závislosti: mysql-connector-python, numpy, pandas
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from dbsettings import mysql_connection
+from grouped_stats import partition_price_stats, to_cents
+from stream_fetch import fetch_columns, iter_product_groups
+
+# ======= KONFIGURACE =======
+
+STAT_TABLE = "price_stat_i1"
+WATERMARK_TABLE = "price_stat_i1_watermark"
+DEFAULT_LOOKBACK_DAYS = 1
+BATCH_ROWS = 200_000        # cen na jednu dávku výpočtu
+BATCH_PRODUCTS = 1000       # produktů na jednu dávku (IN seznam při čtení uložených řádků)
+WRITE_BATCH = 5000          # řádků na jeden INSERT / DELETE
+DAY_BITS = 20               # klíč = product_id << DAY_BITS | den od 1970 (do roku 4840)
+
+# tolerance při porovnání s uloženými hodnotami (avg_price má 4 desetinná místa)
+AVG_ATOL = 5e-5
+RATIO_RTOL = 1e-6
+
+PRICE_COLUMNS = [("product_id", "int64"), ("date", "datetime64[D]"), ("price", "float64")]
+KEY_COLUMNS = [("product_id", "int64"), ("date", "datetime64[D]")]
+STAT_COLUMNS = [("product_id", "int64"), ("date", "datetime64[D]"), ("seller_count", "int64"),
+                ("min_price", "float64"), ("mode_price", "float64"), ("avg_price", "float64"),
+                ("on_par", "float64"), ("diB", "float64")]
+
+
+# ======= SQL =======
+
+def price_sql(since):
+    where = "invalid = 0 AND price IS NOT NULL" + (" AND date >= %s" if since else "")
+    return f"SELECT product_id, date, price FROM price WHERE {where} ORDER BY product_id, date"
+
+
+def stored_sql(since, n_products):
+    where = f"product_id IN ({', '.join(['%s'] * n_products)})" + (" AND date >= %s" if since else "")
+    return (f"SELECT product_id, date, seller_count, min_price, mode_price, avg_price, on_par, diB "
+            f"FROM {STAT_TABLE} WHERE {where}")
+
+
+def orphan_sql(since):
+    """Uložené (produkt, den) okna, ke kterým v price není žádná platná cena."""
+    return (f"SELECT s.product_id, s.date FROM {STAT_TABLE} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM price p WHERE p.product_id = s.product_id "
+            f"AND p.invalid = 0 AND p.price IS NOT NULL AND p.date = s.date)"
+            + (" AND s.date >= %s" if since else "")
+            + " ORDER BY s.product_id, s.date")
+
+
+UPSERT_SQL = f"""
+INSERT INTO {STAT_TABLE} (product_id, date, seller_count, min_price, mode_price, avg_price, on_par, diB)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+  seller_count = VALUES(seller_count), min_price = VALUES(min_price),
+  mode_price = VALUES(mode_price), avg_price = VALUES(avg_price),
+  on_par = VALUES(on_par), diB = VALUES(diB)
+"""
+
+INSERT_SQL = UPSERT_SQL[:UPSERT_SQL.index("ON DUPLICATE")]
+
+
+# ======= POMOCNÉ =======
+def partition_keys(product_ids, dates) -> np.ndarray:
+    """(produkt, den) → jeden int64 klíč, aby šly skupiny řadit a porovnávat vektorově."""
+    days = dates.astype("datetime64[D]").astype("int64")
+    return (product_ids.astype("int64") << DAY_BITS) | days
+
+
+def key_parts(keys):
+    """Klíč → (product_id, datum jako 'YYYY-MM-DD')."""
+    days = (keys & ((1 << DAY_BITS) - 1)).astype("datetime64[D]")
+    return (keys >> DAY_BITS), days.astype(str)
+
+
+def compute_stats(prices) -> dict:
+    """Statistiky všech (produkt, den) z dávky cen {product_id, date, price}."""
+    keys = partition_keys(prices["product_id"], prices["date"])
+    return partition_price_stats(keys, to_cents(prices["price"]))
+
+
+def changed_mask(new, stored) -> np.ndarray:
+    """Které nově spočtené řádky chybí mezi uloženými nebo se od nich liší."""
+    old_keys = partition_keys(stored["product_id"], stored["date"])
+    order = np.argsort(old_keys)
+    old_keys = old_keys[order]
+    if len(old_keys) == 0:
+        return np.ones(len(new["key"]), dtype=bool)
+    pos = np.minimum(np.searchsorted(old_keys, new["key"]), len(old_keys) - 1)
+    found = old_keys[pos] == new["key"]
+    old = {name: stored[name][order][pos] for name, _ in STAT_COLUMNS[2:]}
+    same = (
+        found
+        & (old["seller_count"] == new["seller_count"])
+        & (to_cents(old["min_price"]) == new["min_cents"])
+        & (to_cents(old["mode_price"]) == new["mode_cents"])
+        & np.isclose(old["avg_price"], new["avg_price"], rtol=0, atol=AVG_ATOL)
+        & np.isclose(old["on_par"], new["on_par"], rtol=RATIO_RTOL, atol=0)
+        & np.isclose(old["diB"], new["diB"], rtol=RATIO_RTOL, atol=0)
+    )
+    return ~same
+
+
+def vanished_keys(new, stored) -> np.ndarray:
+    """Klíče uložených řádků, pro které už v okně není žádná platná cena."""
+    old_keys = partition_keys(stored["product_id"], stored["date"])
+    return old_keys[~np.isin(old_keys, new["key"])]
+
+
+def orphan_keys(since, seen_products) -> np.ndarray:
+    """
+    Klíče uložených řádků okna bez platné ceny u produktů, které nebyly
+    v žádné dávce (u ostatních je našlo vanished_keys).
+    """
+    orphans = fetch_columns(orphan_sql(since), (since,) if since else None, KEY_COLUMNS,
+                            connect=mysql_connection)
+    keep = ~np.isin(orphans["product_id"], seen_products)
+    return partition_keys(orphans["product_id"][keep], orphans["date"][keep])
+
+
+def stat_rows(new, mask):
+    pids, dates = key_parts(new["key"][mask])
+    return list(zip(
+        pids.tolist(), dates.tolist(), new["seller_count"][mask].tolist(),
+        (new["min_cents"][mask] / 100).tolist(), (new["mode_cents"][mask] / 100).tolist(),
+        new["avg_price"][mask].round(4).tolist(), new["on_par"][mask].tolist(),
+        new["diB"][mask].tolist(),
+    ))
+
+
+def iter_batches(sql, params):
+    """Dávky cen po celých produktech (nejvýš BATCH_ROWS cen / BATCH_PRODUCTS produktů)."""
+    pending, rows = [], 0
+    for group in iter_product_groups(sql, params, PRICE_COLUMNS, connect=mysql_connection):
+        pending.append(group)
+        rows += len(group["product_id"])
+        if rows >= BATCH_ROWS or len(pending) >= BATCH_PRODUCTS:
+            yield {name: np.concatenate([g[name] for g in pending]) for name, _ in PRICE_COLUMNS}
+            pending, rows = [], 0
+    if pending:
+        yield {name: np.concatenate([g[name] for g in pending]) for name, _ in PRICE_COLUMNS}
+
+
+# ======= DB =======
+def read_watermark(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+            id TINYINT PRIMARY KEY,
+            max_date DATE NOT NULL,
+            rows_written INT,
+            rows_deleted INT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )""")
+    cur.execute(f"SELECT max_date FROM {WATERMARK_TABLE} WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def write_watermark(cur, max_date, written, deleted):
+    cur.execute(
+        f"INSERT INTO {WATERMARK_TABLE} (id, max_date, rows_written, rows_deleted) VALUES (1, %s, %s, %s) "
+        f"ON DUPLICATE KEY UPDATE max_date = VALUES(max_date), rows_written = VALUES(rows_written), "
+        f"rows_deleted = VALUES(rows_deleted)", (max_date, written, deleted))
+
+
+def has_unique_key(cur):
+    """Má price_stat_i1 PRIMARY/UNIQUE klíč přesně na (product_id, date)?"""
+    cur.execute(
+        "SELECT index_name, column_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 0", (STAT_TABLE,))
+    indexes = {}
+    for index_name, column_name in cur.fetchall():
+        indexes.setdefault(index_name, set()).add(column_name.lower())
+    return {"product_id", "date"} in indexes.values()
+
+
+def delete_keys(cur, keys):
+    pids, dates = key_parts(keys)
+    pairs = list(zip(pids.tolist(), dates.tolist()))
+    for i in range(0, len(pairs), WRITE_BATCH):
+        chunk = pairs[i:i + WRITE_BATCH]
+        cur.execute(f"DELETE FROM {STAT_TABLE} WHERE (product_id, date) IN "
+                    f"({', '.join(['(%s, %s)'] * len(chunk))})",
+                    [v for pair in chunk for v in pair])
+
+
+def write_batch(conn, rows, changed_keys, gone_keys, upsert):
+    """Zapíše jednu dávku v transakci: smazané + změněné řádky."""
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        delete_keys(cur, gone_keys if upsert else np.concatenate((gone_keys, changed_keys)))
+        sql = UPSERT_SQL if upsert else INSERT_SQL
+        for i in range(0, len(rows), WRITE_BATCH):
+            cur.executemany(sql, rows[i:i + WRITE_BATCH])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# ======= HLAVNÍ =======
+def build(since, dry_run=False):
+    """Přepočítá price_stat_i1 od data since (None = celá historie); vrací souhrn."""
+    conn = mysql_connection()
+    summary = {"since": since, "prices": 0, "partitions": 0, "written": 0, "deleted": 0, "max_date": None}
+    try:
+        cur = conn.cursor()
+        upsert = has_unique_key(cur)
+        cur.close()
+        if not upsert:
+            print(f"Pozor: {STAT_TABLE} nemá UNIQUE klíč (product_id, date) – změny se zapíší přes DELETE + INSERT.")
+
+        price_params = (since,) if since else None
+        seen = []
+        for batch in iter_batches(price_sql(since), price_params):
+            new = compute_stats(batch)
+            products = np.unique(batch["product_id"]).tolist()
+            seen.append(np.asarray(products, dtype="int64"))
+            stored = fetch_columns(stored_sql(since, len(products)),
+                                   tuple(products) + ((since,) if since else ()), STAT_COLUMNS,
+                                   connect=mysql_connection)
+            mask = changed_mask(new, stored)
+            gone = vanished_keys(new, stored)
+            rows = stat_rows(new, mask)
+
+            summary["prices"] += len(batch["product_id"])
+            summary["partitions"] += len(new["key"])
+            summary["written"] += len(rows)
+            summary["deleted"] += len(gone)
+            batch_max = str(batch["date"].max())
+            summary["max_date"] = max(summary["max_date"] or batch_max, batch_max)
+            print(f"  {len(products)} produktů, {len(batch['product_id'])} cen: "
+                  f"{len(rows)} změněných dní, {len(gone)} ke smazání")
+            if not dry_run and (rows or len(gone)):
+                write_batch(conn, rows, new["key"][mask], gone, upsert)
+
+        gone = orphan_keys(since, np.concatenate(seen) if seen else np.array([], dtype="int64"))
+        summary["deleted"] += len(gone)
+        print(f"  produkty bez platné ceny v okně: {len(gone)} dní ke smazání")
+        if not dry_run and len(gone):
+            write_batch(conn, [], np.array([], dtype="int64"), gone, upsert)
+    finally:
+        conn.close()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inkrementální sestavení price_stat_i1 z price.")
+    parser.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK_DAYS,
+                        help="kolik dní před watermarkem přepočítat znovu")
+    parser.add_argument("--since", type=date.fromisoformat, help="přepočítat od tohoto dne (YYYY-MM-DD)")
+    parser.add_argument("--full", action="store_true", help="přepočítat celou historii")
+    parser.add_argument("--dry-run", action="store_true", help="jen spočítat změny, nic nezapisovat")
+    args = parser.parse_args()
+
+    conn = mysql_connection()
+    try:
+        cur = conn.cursor()
+        watermark = read_watermark(cur)
+        cur.close()
+    finally:
+        conn.close()
+
+    if args.full:
+        since = None
+    elif args.since:
+        since = args.since
+    elif watermark:
+        since = watermark - timedelta(days=args.lookback)
+    else:
+        since = None
+    print(f"Watermark: {watermark or 'žádný'}; přepočítávám "
+          f"{'celou historii' if since is None else f'od {since}'} …")
+
+    started = time.perf_counter()
+    summary = build(since, args.dry_run)
+    print(f"Zpracováno {summary['prices']} cen v {summary['partitions']} dnech produktů: "
+          f"zapsáno {summary['written']}, smazáno {summary['deleted']} "
+          f"({time.perf_counter() - started:.1f} s)")
+
+    if args.dry_run:
+        print("Dry run – nic nezapsáno.")
+    elif summary["max_date"]:
+        new_watermark = max(str(watermark or ""), summary["max_date"])
+        conn = mysql_connection()
+        try:
+            cur = conn.cursor()
+            write_watermark(cur, new_watermark, summary["written"], summary["deleted"])
+            cur.close()
+        finally:
+            conn.close()
+        print(f"Nový watermark: {new_watermark}")
+    print("Hotovo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Regresní kontrola a_desc2: porovná SELECT z prepare_stats.py s původní verzí
+(kalendář WITH RECURSIVE × EXISTS na každý den) na malém testovacím vzorku.
+
+Vzorek se nahraje do tabulek bp a price ve zvláštním schématu (FIXTURE_SCHEMA),
+oba dotazy běží v něm a schéma se nakonec smaže. Dočasné tabulky použít nejdou,
+MySQL je neumí otevřít víckrát v jednom dotazu. Ostrá DB se nepoužije: server
+se musí zadat explicitně v ANALYZY_DB_HOST (+ ANALYZY_DB_PORT/USER/PASSWORD).
+
+Použití: python check_a_desc2.py
+Návratový kód 0 = shoda, 1 = rozdíl.
+
+Závislosti: mysql-connector-python
+"""
+
+import os
+import sys
+
+from dbsettings import get_connection
+from prepare_stats import a_desc2_select
+
+# ======= TESTOVACÍ VZOREK =======
+
+FIXTURE_SCHEMA = "rpa_check"
+
+FIXTURE_DATA = {
+    'basketId': 1,
+    'dateFrom': '2025-01-01',
+    'dateTo': '2025-01-10',
+}
+
+# (basket_id, product_id)
+FIXTURE_BP = [
+    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5),
+    (2, 1), (2, 6),
+]
+
+# (product_id, date, price, invalid)
+FIXTURE_PRICES = [
+    # 1: víc cen denně, díry v řadě, shoda četností u modu
+    (1, '2025-01-01', 10.00, 0), (1, '2025-01-01', 12.50, 0), (1, '2025-01-01', 10.00, 0),
+    (1, '2025-01-02', 12.50, 0), (1, '2025-01-05', 11.00, 0), (1, '2025-01-05', 12.50, 0),
+    (1, '2025-01-10', 10.00, 0), (1, '2025-01-10', 99.00, 1),
+    # 2: jen krajní dny + ceny mimo období
+    (2, '2024-12-31', 5.00, 0), (2, '2025-01-01', 5.10, 0), (2, '2025-01-10', 5.20, 0),
+    (2, '2025-01-11', 5.30, 0),
+    # 3: jen neplatné ceny
+    (3, '2025-01-03', 7.00, 1), (3, '2025-01-04', 7.00, 1),
+    # 4: bez cen
+    # 5: cena každý den
+    *[(5, f'2025-01-{d:02d}', 20.00 + d % 3, 0) for d in range(1, 11)],
+    # 6: jiný košík
+    (6, '2025-01-02', 1.00, 0),
+]
+
+# ======= PŮVODNÍ DOTAZ =======
+def legacy_a_desc2_select(data):
+    """a_desc2 před přepisem T0 na množinový výpočet (reference)."""
+    return f"""
+            WITH RECURSIVE
+            bp_products AS (
+            SELECT DISTINCT bp.product_id
+            FROM bp
+            WHERE bp.basket_id = {data['basketId']}
+            ),
+            prices AS (
+            SELECT p.product_id, p.date, p.price
+            FROM price p
+            JOIN bp_products bpp USING (product_id)
+            WHERE p.invalid = 0
+                AND p.date BETWEEN '{data['dateFrom']}' and '{data['dateTo']}'
+            ),
+            avg_stats AS (
+            SELECT product_id, COUNT(*) AS num_prices, AVG(price) AS avg_price
+            FROM prices
+            GROUP BY product_id
+            ),
+            ordered_prices AS (
+            SELECT
+                product_id,
+                price,
+                ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY price) AS rn,
+                COUNT(*)    OVER (PARTITION BY product_id)                 AS cnt
+            FROM prices
+            ),
+            median_stats AS (
+            SELECT
+                product_id,
+                CASE
+                WHEN cnt % 2 = 1
+                    THEN MAX(CASE WHEN rn = (cnt + 1) / 2 THEN price END)
+                ELSE
+                    AVG(CASE WHEN rn IN (cnt / 2, cnt / 2 + 1) THEN price END)
+                END AS median_price
+            FROM ordered_prices
+            GROUP BY product_id
+            ),
+            mode_pre AS (
+            SELECT product_id, price, COUNT(*) AS c
+            FROM prices
+            GROUP BY product_id, price
+            ),
+            mode_ranked AS (
+            SELECT
+                product_id, price, c,
+                RANK() OVER (PARTITION BY product_id ORDER BY c DESC, price ASC) AS rnk
+            FROM mode_pre
+            ),
+            mode_stats AS (
+            SELECT product_id, price AS mode_price, c AS mode_count
+            FROM mode_ranked
+            WHERE rnk = 1
+            ),
+            date_series AS (
+            SELECT DATE('{data['dateFrom']}') AS d
+            UNION ALL
+            SELECT d + INTERVAL 1 DAY FROM date_series WHERE d < DATE('{data['dateTo']}')
+            ),
+            daily_presence AS (
+            SELECT
+                bpp.product_id,
+                ds.d AS date,
+                CASE WHEN EXISTS (
+                SELECT 1 FROM prices p
+                WHERE p.product_id = bpp.product_id AND p.date = ds.d
+                ) THEN 1 ELSE 0 END AS has_price
+            FROM bp_products bpp
+            CROSS JOIN date_series ds
+            ),
+            missing_days AS (
+            SELECT
+                product_id,
+                SUM(CASE WHEN has_price = 0 THEN 1 ELSE 0 END) AS days_without_price
+            FROM daily_presence
+            GROUP BY product_id
+            )
+            SELECT
+            bpp.product_id id,
+            ROUND(a.avg_price, 2)                                  AS Pp,
+            ROUND(med.median_price, 2)                             AS Pmed,
+            ROUND(mo.mode_price, 2)                                AS Pmode,
+            mo.mode_count Nmode,
+            md.days_without_price T0
+            FROM bp_products bpp
+            LEFT JOIN avg_stats    a   USING (product_id)
+            LEFT JOIN median_stats med USING (product_id)
+            LEFT JOIN mode_stats   mo  USING (product_id)
+            LEFT JOIN missing_days md  USING (product_id)
+            ORDER BY bpp.product_id
+    """
+
+
+# ======= POMOCNÉ =======
+def load_fixture(cur):
+    """Tabulky bp a price se vzorkem v novém schématu FIXTURE_SCHEMA (to se nastaví jako aktuální)."""
+    cur.execute(f"DROP DATABASE IF EXISTS {FIXTURE_SCHEMA}")
+    cur.execute(f"CREATE DATABASE {FIXTURE_SCHEMA}")
+    cur.execute(f"USE {FIXTURE_SCHEMA}")
+    cur.execute("CREATE TABLE bp (basket_id INT, product_id INT, PRIMARY KEY (basket_id, product_id))")
+    cur.execute("CREATE TABLE price (product_id INT, date DATE, price DECIMAL(10,2), invalid TINYINT)")
+    cur.executemany("INSERT INTO bp VALUES (%s, %s)", FIXTURE_BP)
+    cur.executemany("INSERT INTO price VALUES (%s, %s, %s, %s)", FIXTURE_PRICES)
+
+
+def normalize(rows):
+    """Číselné hodnoty na float, aby nevadil rozdíl DECIMAL vs. BIGINT."""
+    return [tuple(None if v is None else float(v) for v in row) for row in rows]
+
+
+def main():
+    if not os.environ.get("ANALYZY_DB_HOST"):
+        print("Chyba: zadejte testovací server v ANALYZY_DB_HOST "
+              "(+ ANALYZY_DB_PORT/USER/PASSWORD) – ostrá DB se nepoužívá.")
+        sys.exit(1)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        load_fixture(cur)
+        cur.execute(legacy_a_desc2_select(FIXTURE_DATA))
+        expected = normalize(cur.fetchall())
+        cur.execute(a_desc2_select(FIXTURE_DATA))
+        actual = normalize(cur.fetchall())
+    finally:
+        cur.execute(f"DROP DATABASE IF EXISTS {FIXTURE_SCHEMA}")
+        cur.close()
+        conn.close()
+
+    if actual != expected:
+        print("CHYBA: a_desc2 se liší od původní verze.")
+        print(f"  očekáváno: {expected}")
+        print(f"  nyní:      {actual}")
+        sys.exit(1)
+    print(f"OK: a_desc2 odpovídá původní verzi ({len(actual)} produktů).")
+
+
+if __name__ == "__main__":
+    main()
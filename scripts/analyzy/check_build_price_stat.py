@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Regresní kontrola build_price_stat.py na malém vzorku: po plném i inkrementálním
+běhu musí price_stat_i1 obsahovat právě ty (produkt, den), ke kterým existuje
+platná cena – i když produktu v okně zneplatní všechny ceny a do žádné dávky
+výpočtu se tak nedostane.
+
+Vzorek se nahraje do tabulek price a price_stat_i1 ve zvláštním schématu
+(FIXTURE_SCHEMA), build_price_stat.py běží jako samostatný proces přesměrovaný
+na něj (ANALYZY_DB_DATABASE) a schéma se nakonec smaže. Ostrá DB se nepoužije:
+server se musí zadat explicitně v ANALYZY_DB_HOST (+ ANALYZY_DB_PORT/USER/PASSWORD).
+
+Použití: python check_build_price_stat.py
+Návratový kód 0 = shoda, 1 = rozdíl.
+
+Závislosti: mysql-connector-python (+ závislosti build_price_stat.py)
+"""
+
+import os
+import subprocess
+import sys
+
+# ======= TESTOVACÍ VZOREK =======
+
+FIXTURE_SCHEMA = "rpa_check_price_stat"
+
+# (product_id, date, price, invalid)
+FIXTURE_PRICES = [
+    # 1: víc cen denně po celé období
+    *[(1, f'2025-01-{d:02d}', p, 0) for d in range(1, 11) for p in (10.00, 10.00, 12.50)],
+    # 2: neplatné ceny mezi platnými
+    *[(2, f'2025-01-{d:02d}', 5.00 + d % 2, 0) for d in range(1, 11)],
+    (2, '2025-01-10', 99.00, 1),
+    # 3: ceny jen na konci období – později se v okně zneplatní všechny
+    (3, '2025-01-03', 7.00, 0), (3, '2025-01-09', 7.50, 0), (3, '2025-01-10', 7.00, 0),
+    (3, '2025-01-10', 8.00, 0),
+    # 4: jen neplatné ceny
+    (4, '2025-01-05', 3.00, 1),
+    # 5: chybějící cena (NULL) se nepočítá – ani mezi platnými, ani sama
+    (5, '2025-01-04', 4.00, 0), (5, '2025-01-04', None, 0), (5, '2025-01-06', None, 0),
+]
+
+# po plném běhu (watermark 2025-01-10, okno od 2025-01-09 s --lookback 1):
+# zneplatnit všechny ceny produktu 3 v okně a jednu cenu produktu 2
+INVALIDATE_SQL = [
+    "UPDATE price SET invalid = 1 WHERE product_id = 3 AND date >= '2025-01-09'",
+    "UPDATE price SET invalid = 1 WHERE product_id = 2 AND date = '2025-01-10'",
+]
+
+TABLES_DDL = [
+    "CREATE TABLE price (product_id INT, date DATE, price DECIMAL(10,2), invalid TINYINT)",
+    """CREATE TABLE price_stat_i1 (
+        product_id INT, date DATE, seller_count INT,
+        min_price DECIMAL(10,2), mode_price DECIMAL(10,2), avg_price DECIMAL(12,4),
+        on_par DOUBLE, diB DOUBLE, PRIMARY KEY (product_id, date))""",
+]
+
+# (produkt, den) navíc / chybějící oproti platným cenám
+MISMATCH_SQL = """
+SELECT 'navíc', s.product_id, s.date FROM price_stat_i1 s
+WHERE NOT EXISTS (SELECT 1 FROM price p
+                  WHERE p.product_id = s.product_id AND p.date = s.date
+                    AND p.invalid = 0 AND p.price IS NOT NULL)
+UNION ALL
+SELECT DISTINCT 'chybí', p.product_id, p.date FROM price p
+WHERE p.invalid = 0 AND p.price IS NOT NULL AND NOT EXISTS (SELECT 1 FROM price_stat_i1 s
+                                    WHERE s.product_id = p.product_id AND s.date = p.date)
+ORDER BY 2, 3
+"""
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ======= POMOCNÉ =======
+def fixture_connection():
+    """Připojení k serveru bez schématu (to se teprve zakládá)."""
+    import mysql.connector
+    from dbsettings import DB_CONFIG
+    config = {k: v for k, v in DB_CONFIG.items() if k != "database"}
+    return mysql.connector.connect(**config)
+
+
+def load_fixture(cur):
+    cur.execute(f"DROP DATABASE IF EXISTS {FIXTURE_SCHEMA}")
+    cur.execute(f"CREATE DATABASE {FIXTURE_SCHEMA}")
+    cur.execute(f"USE {FIXTURE_SCHEMA}")
+    for ddl in TABLES_DDL:
+        cur.execute(ddl)
+    cur.executemany("INSERT INTO price VALUES (%s, %s, %s, %s)", FIXTURE_PRICES)
+
+
+def run_build(*args):
+    """build_price_stat.py nad schématem vzorku; vrací exit kód."""
+    env = dict(os.environ, ANALYZY_DB_DATABASE=FIXTURE_SCHEMA)
+    return subprocess.run([sys.executable, os.path.join(SCRIPT_DIR, "build_price_stat.py"), *args],
+                          cwd=SCRIPT_DIR, env=env).returncode
+
+
+def mismatches(cur):
+    cur.execute(MISMATCH_SQL)
+    return [(kind, pid, str(day)) for kind, pid, day in cur.fetchall()]
+
+
+def main():
+    if not os.environ.get("ANALYZY_DB_HOST"):
+        print("Chyba: zadejte testovací server v ANALYZY_DB_HOST "
+              "(+ ANALYZY_DB_PORT/USER/PASSWORD) – ostrá DB se nepoužívá.")
+        sys.exit(1)
+
+    conn = fixture_connection()
+    cur = conn.cursor()
+    failed = []
+    try:
+        load_fixture(cur)
+        for name, setup, args in (
+            ("plný běh", [], ["--full"]),
+            ("inkrementální běh po zneplatnění", INVALIDATE_SQL, []),
+        ):
+            for sql in setup:
+                cur.execute(sql)
+            code = run_build(*args)
+            diff = mismatches(cur)
+            if code != 0 or diff:
+                failed.append(name)
+                print(f"CHYBA: {name} (exit {code}): {diff}")
+            else:
+                print(f"OK: {name}")
+    finally:
+        cur.execute(f"DROP DATABASE IF EXISTS {FIXTURE_SCHEMA}")
+        cur.close()
+        conn.close()
+
+    if failed:
+        sys.exit(1)
+    print("OK: price_stat_i1 odpovídá platným cenám.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Regresní kontrola histogramů: agregovaný fetch (ceny s vahami) musí dát
+stejnou tabulku statistik i stejné obrázky jako jednotlivá pozorování –
+i s histBins jako názvem odhadu ("auto" …), který numpy s vahami neumí.
+
+Vzorek cen je přímo ve skriptu, agregace (produkt, cena, počet) se spočítá
+stejně jako AGG_SQL; DB se nepoužívá.
+
+Použití: python check_histogram_bins.py
+Návratový kód 0 = shoda, 1 = rozdíl.
+
+Závislosti: numpy, pandas, matplotlib
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import histogram
+
+# ======= TESTOVACÍ VZOREK =======
+
+FIXTURE_DATA = {
+    'basketId': 1,
+    'dateFrom': '2025-01-01',
+    'dateTo': '2025-01-31',
+    'imageFormat': 'png',
+}
+
+FIXTURE_BINS = ["auto", "fd", "sturges", 30, 7]
+
+# (product_id, product_name, price)
+_rng = np.random.default_rng(7)
+FIXTURE_PRICES = [
+    # 1: málo různých cen, hodně opakování
+    *[(1, "Mléko", p) for p in (19.90,) * 12 + (21.50,) * 5 + (18.90,) * 3],
+    # 2: široké rozpětí, ceny na haléře
+    *[(2, "Káva", round(float(p), 2)) for p in _rng.normal(150, 25, 300)],
+    # 3: jediná cena
+    (3, "Sůl", 9.90),
+    # 4: dvě ceny se shodnou četností
+    *[(4, "Chléb", p) for p in (35.0, 35.0, 39.0, 39.0)],
+]
+
+
+# ======= POMOCNÉ =======
+def aggregate(df):
+    """(produkt, cena v haléřích, počet) jako AGG_SQL."""
+    agg = (df.assign(price_cents=np.rint(df["price"] * 100).astype("int64"))
+             .groupby(["product_id", "product_name", "price_cents"], as_index=False)
+             .size().rename(columns={"size": "cnt"}))
+    return {col: agg[col].to_numpy() for col in ("product_id", "product_name", "price_cents", "cnt")}
+
+
+def render(jobs, stats_parts, out_dir):
+    """Obrázky (cesty z úloh, tj. histogram.OUTPUT_DIR) a CSV statistik; vrací {soubor: obsah}."""
+    os.makedirs(out_dir)
+    for job in jobs:
+        histogram.render_histogram(job)
+    histogram.save_stats(stats_parts, os.path.join(out_dir, "histogram_stats.csv"))
+    files = {}
+    for name in sorted(os.listdir(out_dir)):
+        with open(os.path.join(out_dir, name), "rb") as f:
+            files[name] = f.read()
+    return files
+
+
+def compare(bins, df, tmp_dir):
+    histogram.data = {**FIXTURE_DATA, 'histBins': bins}
+    raw_parts, agg_parts = [], []
+
+    raw_dir = os.path.join(tmp_dir, f"raw_{bins}")
+    histogram.OUTPUT_DIR = raw_dir
+    raw = render(histogram.dataframe_jobs(df, raw_parts), raw_parts, raw_dir)
+
+    agg_dir = os.path.join(tmp_dir, f"agg_{bins}")
+    histogram.OUTPUT_DIR = agg_dir
+    agg = render(histogram.weighted_jobs(aggregate(df), agg_parts), agg_parts, agg_dir)
+    return [name for name in sorted(set(raw) | set(agg)) if raw.get(name) != agg.get(name)]
+
+
+def main():
+    df = pd.DataFrame(FIXTURE_PRICES, columns=["product_id", "product_name", "price"])
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for bins in FIXTURE_BINS:
+            diff = compare(bins, df, tmp_dir)
+            if diff:
+                failed = True
+                print(f"CHYBA: histBins={bins!r} – agregovaný fetch se liší: {', '.join(diff)}")
+            else:
+                print(f"OK: histBins={bins!r}")
+    if failed:
+        sys.exit(1)
+    print("OK: agregovaný fetch odpovídá jednotlivým pozorováním.")
+
+
+if __name__ == "__main__":
+    main()
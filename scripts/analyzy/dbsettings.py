@@ -1,7 +1,10 @@
 # dbsettings.py
+import os
 import sys
 import json
-import mysql.connector
+import threading
+
+import timings
 
 # Jedno místo pro DB konfiguraci
 DB_CONFIG = {
@@ -13,12 +16,106 @@ DB_CONFIG = {
     "autocommit": True,
 }
 
+# Jiný server / schéma (benchmark, lokální vývoj): ANALYZY_DB_HOST, ANALYZY_DB_PORT,
+# ANALYZY_DB_USER, ANALYZY_DB_PASSWORD, ANALYZY_DB_DATABASE. Vlastní prefix, protože
+# runScript předává skriptům prostředí serveru včetně DB_* z .env.
+for _key in ("host", "port", "user", "password", "database"):
+    _value = os.environ.get(f"ANALYZY_DB_{_key.upper()}")
+    if _value:
+        DB_CONFIG[_key] = int(_value) if _key == "port" else _value
+
+# Backend dotazů analýz: "mysql" (server výše) nebo "duckdb" – lokální Parquet
+# kopie tabulek z local_mirror.py přes vestavěný DuckDB (duckdb_backend), bez
+# sahání na server. Kopie je v ANALYZY_MIRROR_DIR, jinak v common/mirror.
+DB_BACKENDS = ("mysql", "duckdb")
+DB_BACKEND = os.environ.get("ANALYZY_DB_BACKEND") or "mysql"
+if DB_BACKEND not in DB_BACKENDS:
+    raise ValueError(f"Neznámý ANALYZY_DB_BACKEND '{DB_BACKEND}' (povolené: {', '.join(DB_BACKENDS)})")
+MIRROR_DIR = os.environ.get("ANALYZY_MIRROR_DIR") or os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "common", "mirror"))
+
+# Pool připojení v rámci procesu – skript s více dotazy (nebo víc kroků v jednom
+# procesu) neplatí za každý dotaz nový handshake se vzdáleným serverem.
+# Pool se plní líně (MySQLConnectionPool s konfigurací by hned otevřel všech
+# POOL_SIZE připojení). ANALYZY_DB_POOL_SIZE=0 pooling vypne (prefix jako výše –
+# proměnné DB_* z prostředí patří Node serveru).
+# mysql.connector se importuje až s prvním připojením – skripty, které čtou
+# jen data.json nebo cache, ho nenačítají.
+POOL_SIZE = int(os.environ.get("ANALYZY_DB_POOL_SIZE", 4))
+POOL_NAME = "analyzy"
+
+_pool = None
+_pool_pid = None
+_pool_opened = 0
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    """Pool tohoto procesu; po forku (render_pool apod.) se zakládá znovu."""
+    global _pool, _pool_pid, _pool_opened
+    from mysql.connector import pooling
+    if POOL_SIZE <= 0:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = pooling.MySQLConnectionPool(
+            pool_name=POOL_NAME,
+            pool_size=min(POOL_SIZE, pooling.CNX_POOL_MAXSIZE),
+            pool_reset_session=True,
+        )
+        _pool.set_config(**DB_CONFIG)
+        _pool_pid = os.getpid()
+        _pool_opened = 0
+    return _pool
+
 def get_connection():
-    """Vrátí nové připojení k MySQL."""
-    return mysql.connector.connect(**DB_CONFIG)
+    """
+    Vrátí připojení k MySQL z poolu – close() ho vrátí zpět do poolu.
+    Pool při výdeji ověří, že spojení žije (is_connected = ping), a mrtvé
+    (wait_timeout, restart serveru) znovu naváže. Když jsou všechna připojení
+    poolu půjčená (souběžné kroky), vrátí samostatné připojení místo čekání.
+    S ANALYZY_DB_BACKEND=duckdb vrací připojení k lokální kopii (jen čtení).
+    """
+    with timings.span("connect"):
+        if DB_BACKEND == "duckdb":
+            from duckdb_backend import connect
+            return connect(MIRROR_DIR)
+        return _connect()
+
+def mysql_connection():
+    """Připojení přímo k MySQL bez ohledu na DB_BACKEND (synchronizace kopie, správa tabulek)."""
+    with timings.span("connect"):
+        return _connect()
+
+def _connect():
+    global _pool_opened
+    import mysql.connector
+    from mysql.connector import pooling
+    with _pool_lock:
+        pool = _get_pool()
+        if pool is None:
+            return mysql.connector.connect(**DB_CONFIG)
+        try:
+            return pool.get_connection()
+        except pooling.PoolError:
+            if _pool_opened >= pool.pool_size:
+                return mysql.connector.connect(**DB_CONFIG)
+            pool.add_connection()
+            _pool_opened += 1
+            return pool.get_connection()
+
+def stats_table(data, base="a_desc"):
+    """
+    Název tabulky se statistikami pro daný výsledek (např. a_desc_123), aby si
+    souběžně běžící analýzy nepřepisovaly data. Bez resultId v data.json
+    (ruční spuštění) zůstává původní globální název.
+    """
+    result_id = data.get('resultId')
+    if result_id is None:
+        return base
+    return f"{base}_{int(result_id)}"
 
 def load_data_json(json_path, default_values):
-    """Načte data.json s defaultními hodnotami."""
+    """Načte data.json s defaultními hodnotami; zahájí měření kroku (timings.json vedle)."""
+    timings.start(os.path.dirname(os.path.abspath(json_path)))
     try:
         with open(json_path, 'r', encoding='utf-8') as f:
             loaded_data = json.load(f)
@@ -0,0 +1,155 @@
+# desc_cache.py
+"""
+Cache denních dílčích agregátů pro popisné statistiky (desc_stats).
+
+Pro každý produkt jeden soubor <cache_dir>/<product_id>.npz s denními řádky
+price_stat_i1, mapou cena → počet za den a seznamem dní, které už jsou
+spočtené (i dny bez dat). Při požadavku na (košík, období) se z DB čtou jen
+dny, které v cache chybí – opakovaný běh nebo posunutí dateTo o týden tedy
+sáhne jen na nová data.
+
+Posledních FRESH_DAYS dní (vůči dnešku) se do cache neukládá, protože do nich
+ještě mohou dotékat ceny ze scrapu. Opravy starších cen se do cache nepromítnou
+– pro přepočet celého období slouží data.json "statsCacheRefresh": true.
+
+Závislosti: numpy, pandas
+"""
+
+import os
+from datetime import date
+
+import numpy as np
+
+from desc_stats import PRICE_COLUMNS, STAT_COLUMNS, fetch_daily
+from timings import span
+
+# ======= KONFIGURACE =======
+
+FRESH_DAYS = 2   # dny od dneška zpět, které se neukládají
+
+
+# ======= POMOCNÉ =======
+def _empty(columns):
+    return {name: np.array([], dtype=dtype) for name, dtype in columns}
+
+
+def _take(cols, mask):
+    return {name: arr[mask] for name, arr in cols.items()}
+
+
+def _concat(a, b, columns):
+    return {name: np.concatenate((a[name], b[name])) for name, _ in columns}
+
+
+def _in_range(cols, days):
+    return (cols["day"] >= days[0]) & (cols["day"] <= days[-1])
+
+
+def _split_by_product(cols):
+    """{product_id: sloupce produktu} pro data seřazená podle product_id."""
+    ids = cols["product_id"]
+    if len(ids) == 0:
+        return {}
+    uniq, starts = np.unique(ids, return_index=True)
+    ends = np.concatenate((starts[1:], [len(ids)]))
+    return {
+        int(pid): {name: arr[start:end] for name, arr in cols.items()}
+        for pid, start, end in zip(uniq, starts, ends)
+    }
+
+
+# ======= SOUBOR =======
+def entry_path(cache_dir: str, product_id: int) -> str:
+    return os.path.join(cache_dir, f"{product_id}.npz")
+
+
+def empty_entry():
+    return np.array([], dtype="datetime64[D]"), _empty(STAT_COLUMNS), _empty(PRICE_COLUMNS)
+
+
+def read_entry(path: str):
+    """Záznam produktu (covered, stat, prices), nebo prázdný, pokud soubor není."""
+    if not os.path.exists(path):
+        return empty_entry()
+    with np.load(path, allow_pickle=False) as npz:
+        covered = npz["covered"]
+        stat = {name: npz[f"stat_{name}"] for name, _ in STAT_COLUMNS}
+        prices = {name: npz[f"prices_{name}"] for name, _ in PRICE_COLUMNS}
+    return covered, stat, prices
+
+
+def write_entry(path: str, covered, stat, prices):
+    """Zápis přes dočasný soubor – souběžný běh uvidí buď starou, nebo novou verzi."""
+    arrays = {"covered": covered}
+    arrays.update({f"stat_{name}": arr for name, arr in stat.items()})
+    arrays.update({f"prices_{name}": arr for name, arr in prices.items()})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+# ======= HLAVNÍ =======
+def load_daily(basket_id, product_ids, date_from, date_to, cache_dir, refresh=False):
+    """
+    Denní agregáty (stat, prices) produktů košíku za [date_from, date_to].
+    Chybějící dny se dočtou z DB jedním dotazem na rozsah od prvního
+    do posledního chybějícího dne a uloží do cache.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    days = np.arange(np.datetime64(date_from, "D"), np.datetime64(date_to, "D") + 1)
+    stable_until = np.datetime64(date.today(), "D") - FRESH_DAYS
+
+    entries = {}
+    missing = {}
+    with span("cache", what="read", products=len(product_ids)) as s:
+        for pid in product_ids:
+            pid = int(pid)
+            entry = empty_entry() if refresh else read_entry(entry_path(cache_dir, pid))
+            entries[pid] = entry
+            miss = np.setdiff1d(days, entry[0])
+            if len(miss):
+                missing[pid] = miss
+        s["hit"] = len(entries) - len(missing)
+
+    cached = len(entries) - len(missing)
+    if missing:
+        lo = min(m[0] for m in missing.values())
+        hi = max(m[-1] for m in missing.values())
+        print(f"Cache statistik: {cached} produktů kompletních, "
+              f"{len(missing)} doplňuji z DB ({lo} až {hi}) …")
+        stat, prices = fetch_daily(basket_id, lo, hi)
+        stat_by_pid = _split_by_product(stat)
+        prices_by_pid = _split_by_product(prices)
+
+        for pid, miss in missing.items():
+            covered, c_stat, c_prices = entries[pid]
+            new_stat = stat_by_pid.get(pid, _empty(STAT_COLUMNS))
+            new_prices = prices_by_pid.get(pid, _empty(PRICE_COLUMNS))
+            new_stat = _take(new_stat, np.isin(new_stat["day"], miss))
+            new_prices = _take(new_prices, np.isin(new_prices["day"], miss))
+
+            covered = np.union1d(covered, miss)
+            c_stat = _concat(c_stat, new_stat, STAT_COLUMNS)
+            c_prices = _concat(c_prices, new_prices, PRICE_COLUMNS)
+            entries[pid] = (covered, c_stat, c_prices)
+
+            # do souboru jen dny, které se už nezmění
+            write_entry(
+                entry_path(cache_dir, pid),
+                covered[covered <= stable_until],
+                _take(c_stat, c_stat["day"] <= stable_until),
+                _take(c_prices, c_prices["day"] <= stable_until),
+            )
+    else:
+        print(f"Cache statistik: všech {cached} produktů kompletních, DB se nečte.")
+
+    # výsledek jen pro požadované období
+    stat = _empty(STAT_COLUMNS)
+    prices = _empty(PRICE_COLUMNS)
+    stat_parts = [e[1] for e in entries.values()]
+    price_parts = [e[2] for e in entries.values()]
+    if stat_parts:
+        stat = {name: np.concatenate([p[name] for p in stat_parts]) for name, _ in STAT_COLUMNS}
+        prices = {name: np.concatenate([p[name] for p in price_parts]) for name, _ in PRICE_COLUMNS}
+    return _take(stat, _in_range(stat, days)), _take(prices, _in_range(prices, days))
@@ -0,0 +1,203 @@
+# desc_stats.py
+"""
+Popisné statistiky a_desc (jako prepare_stats.py) počítané v Pythonu
+z denních dílčích agregátů po produktech.
+
+Denní agregáty:
+  stat   – řádky price_stat_i1 (seller_count, min_price, mode_price, diB)
+  prices – mapa cena → počet pozorování za (produkt, den) z price (invalid = 0)
+
+Z nich se pro libovolné období odvodí N, Nmin, Nmax, Pmin, Pmax, Pmode,
+Pp, Pmed, PmodeAll, Nmode, T0 a determ se stejnou sémantikou jako SQL
+v prepare_stats.py (modus při shodě nižší cena, ROUND na 2 desetinná místa
+half-up, T0 = dny bez jediné ceny, determ = LN(podíl dní s diB > 1) + 1).
+
+Závislosti: mysql-connector-python, numpy, pandas
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from dbsettings import get_connection
+from grouped_stats import aggregate_sorted, weighted_price_stats
+from stream_fetch import fetch_columns
+from timings import span
+
+# ======= KONFIGURACE =======
+
+STAT_COLUMNS = [("product_id", "int64"), ("day", "datetime64[D]"),
+                ("seller_count", "float64"), ("min_price", "float64"),
+                ("mode_price", "float64"), ("diB", "float64")]
+PRICE_COLUMNS = [("product_id", "int64"), ("day", "datetime64[D]"),
+                 ("price_cents", "int64"), ("cnt", "int64")]
+
+DESC_COLUMNS = ["id", "name", "N", "Nmin", "Nmax", "Pmin", "Pmax", "Pmode",
+                "Pp", "Pmed", "PmodeAll", "Nmode", "T0", "determ"]
+
+# sloupce, které v tabulce a_desc z SQL cesty jsou DECIMAL – mysql2 je vrací jako
+# text s 2 desetinnými místy, v a_desc.json je zapisujeme stejně
+DECIMAL_COLUMNS = ["Pmin", "Pmax", "Pmode", "Pp", "Pmed", "PmodeAll"]
+INT_COLUMNS = ["Nmin", "Nmax", "Nmode", "T0"]
+
+# ======= SQL =======
+BASKET_SQL = """
+SELECT product.id, product.name
+FROM bp
+JOIN product ON product.id = bp.product_id
+WHERE bp.basket_id = %s
+ORDER BY product.id
+"""
+
+DAILY_STAT_SQL = """
+SELECT s.product_id, s.date, s.seller_count, s.min_price, s.mode_price, s.diB
+FROM bp b
+JOIN price_stat_i1 s
+  ON s.product_id = b.product_id
+  AND s.date BETWEEN %s AND %s
+WHERE b.basket_id = %s
+ORDER BY s.product_id, s.date
+"""
+
+DAILY_PRICE_SQL = """
+SELECT p.product_id, p.date, ROUND(p.price * 100) AS price_cents, COUNT(*) AS cnt
+FROM bp b
+JOIN price p
+  ON p.product_id = b.product_id
+  AND p.invalid = 0
+  AND p.price IS NOT NULL
+  AND p.date BETWEEN %s AND %s
+WHERE b.basket_id = %s
+GROUP BY p.product_id, p.date, price_cents
+ORDER BY p.product_id, p.date, price_cents
+"""
+
+
+# ======= DB =======
+def fetch_basket_products(basket_id) -> pd.DataFrame:
+    """Produkty košíku, které existují v tabulce product (id, name)."""
+    conn = get_connection()
+    cur = conn.cursor()
+    with span("execute"):
+        cur.execute(BASKET_SQL, (basket_id,))
+    with span("fetch") as s:
+        rows = cur.fetchall()
+        s["rows"] = len(rows)
+    cur.close()
+    conn.close()
+    return pd.DataFrame(rows, columns=["id", "name"])
+
+
+def fetch_daily_prices(basket_id, date_from, date_to):
+    """Mapy cena → počet za (produkt, den) pro produkty košíku za období."""
+    params = (str(date_from), str(date_to), basket_id)
+    return fetch_columns(DAILY_PRICE_SQL, params, PRICE_COLUMNS)
+
+
+def fetch_daily(basket_id, date_from, date_to):
+    """Denní agregáty (stat, prices) všech produktů košíku za období."""
+    params = (str(date_from), str(date_to), basket_id)
+    stat = fetch_columns(DAILY_STAT_SQL, params, STAT_COLUMNS)
+    return stat, fetch_daily_prices(basket_id, date_from, date_to)
+
+
+def stat_from_frame(df) -> dict:
+    """Denní řádky price_stat_i1 ze sdíleného řezu (shared_data) ve tvaru STAT_COLUMNS."""
+    return {
+        "product_id": df["product_id"].to_numpy(dtype="int64"),
+        "day": df["date"].to_numpy().astype("datetime64[D]"),
+        "seller_count": df["seller_count"].to_numpy(dtype="float64"),
+        "min_price": df["min_price"].to_numpy(dtype="float64"),
+        "mode_price": df["mode_price"].to_numpy(dtype="float64"),
+        "diB": df["diB"].to_numpy(dtype="float64"),
+    }
+
+
+# ======= VÝPOČET =======
+def _round_cents(values) -> np.ndarray:
+    """Haléře (i neceločíselné) → Kč se zaokrouhlením half-up jako ROUND(x, 2) v MySQL."""
+    return np.floor(np.asarray(values, dtype="float64") + 0.5) / 100
+
+
+def _determ(dib_gt1, days) -> list:
+    """IF(SUM(diB > 1) > 0, LN(SUM(diB > 1) / COUNT(*)) + 1, '-') – výsledek je text."""
+    return [
+        repr(float(np.log(g / d) + 1)) if g > 0 else "-"
+        for g, d in zip(dib_gt1, days)
+    ]
+
+
+def derive_desc(products: pd.DataFrame, stat, prices, date_from, date_to) -> pd.DataFrame:
+    """
+    a_desc pro produkty (id, name) z denních agregátů omezených na [date_from, date_to].
+    Jako JOIN a_desc1/2/3: jen produkty, které mají v období aspoň jeden řádek price_stat_i1.
+    """
+    date_from = np.datetime64(date_from, "D")
+    date_to = np.datetime64(date_to, "D")
+    total_days = int((date_to - date_from).astype(int)) + 1
+
+    # --- a_desc1 + a_desc3 z price_stat_i1
+    s = pd.DataFrame(stat)
+    s = s[(s["day"] >= date_from) & (s["day"] <= date_to)]
+    s = s.assign(dib_gt1=(s["diB"] > 1).astype("int64"))
+    g = s.groupby("product_id")
+    desc = pd.DataFrame({
+        "N": g["seller_count"].sum(min_count=1),
+        "Nmin": g["seller_count"].min(),
+        "Nmax": g["seller_count"].max(),
+        "Pmin": g["min_price"].min(),
+        "Pmax": g["min_price"].max(),
+        "Pmode": g["mode_price"].min(),
+        "dib_gt1": g["dib_gt1"].sum(),
+        "days": g.size(),
+    })
+    desc["determ"] = _determ(desc["dib_gt1"], desc["days"])
+    desc = desc.drop(columns=["dib_gt1", "days"])
+
+    # --- a_desc2 z map cena → počet
+    p_mask = (prices["day"] >= date_from) & (prices["day"] <= date_to)
+    p_pid = prices["product_id"][p_mask]
+    pid_u, cents_u, cnt_u, starts = aggregate_sorted(p_pid, prices["price_cents"][p_mask], prices["cnt"][p_mask])
+    ps = weighted_price_stats(pid_u, cents_u, cnt_u, starts).set_index("product_id")
+    price_desc = pd.DataFrame({
+        "Pp": _round_cents(ps["mean"]),
+        "Pmed": _round_cents(ps["median"]),
+        "PmodeAll": ps["mode"].to_numpy() / 100,
+        "Nmode": ps["mode_count"],
+    }, index=ps.index)
+
+    # T0: dny období bez jediné ceny
+    day_pairs = pd.DataFrame({"product_id": p_pid, "day": prices["day"][p_mask]}).drop_duplicates()
+    price_days = day_pairs.groupby("product_id").size()
+
+    out = products.set_index("id").join(desc, how="inner").join(price_desc, how="left")
+    out["T0"] = total_days - price_days.reindex(out.index, fill_value=0)
+    out.index.name = "id"
+    out = out.reset_index()
+    return out[DESC_COLUMNS].sort_values("id").reset_index(drop=True)
+
+
+# ======= ZÁPIS =======
+def _json_value(col, v):
+    """Hodnota pro a_desc.json ve stejném tvaru, jaký vrací mysql2 z tabulky a_desc."""
+    if v is None or (isinstance(v, float) and np.isnan(v)):
+        return None
+    if col in DECIMAL_COLUMNS:
+        return f"{v:.2f}"
+    if col == "N":
+        return str(int(v))
+    if col in INT_COLUMNS or col == "id":
+        return int(v)
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def save_desc_json(desc: pd.DataFrame, path: str):
+    """Uloží a_desc do souboru – prepareOutput.js ho pak použije místo tabulky."""
+    records = [
+        {col: _json_value(col, v) for col, v in zip(DESC_COLUMNS, row)}
+        for row in desc[DESC_COLUMNS].itertuples(index=False, name=None)
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    print(f"Uloženo: {path} ({len(records)} produktů)")
@@ -0,0 +1,112 @@
+# downsample.py
+"""
+Prořídnutí dlouhých časových řad před vykreslením (data.json "downsample").
+
+Čára široká lines.linewidth bodů zabere při dpi několik pixelů, takže body,
+které padnou do stejného „sloupce“ široké jako čára, od sebe na obrázku
+nerozlišíme. Počet sloupců (buckets) se odvodí z šířky os v pixelech
+a tloušťky čáry – viz target_buckets().
+
+  "minmax" – v každém sloupci první, poslední, nejnižší a nejvyšší bod
+             (M4); obrázek je prakticky totožný a žádný vrchol ani propad
+             se neztratí. Doporučeno pro posuzování sladění cen.
+  "lttb"   – Largest-Triangle-Three-Buckets: jeden tvarově nejvýznamnější
+             bod na sloupec, méně bodů; navíc se vždy ponechá první,
+             poslední, globální minimum a maximum každé řady.
+
+Řady jednoho grafu sdílejí osu x – vybrané indexy všech řad se sjednotí.
+NaN (dny bez dat) zůstávají, aby čára měla mezery na stejných místech.
+Řada, která se do počtu sloupců vejde, se nemění.
+
+Závislosti: numpy
+"""
+
+import numpy as np
+
+# ======= KONFIGURACE =======
+
+DOWNSAMPLE_MODES = ("none", "minmax", "lttb")
+MIN_BUCKETS = 16
+POINTS_PER_BUCKET = {"minmax": 4, "lttb": 1}
+
+
+# ======= POMOCNÉ =======
+def target_buckets(axes_width_in, dpi, linewidth_pt) -> int:
+    """Počet rozlišitelných sloupců: šířka os v px / tloušťka čáry v px."""
+    line_px = max(linewidth_pt * dpi / 72, 1.0)
+    return max(int(axes_width_in * dpi / line_px), MIN_BUCKETS)
+
+
+def _numeric_x(x) -> np.ndarray:
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype("int64").astype("float64")
+    return x.astype("float64")
+
+
+def _bucket_of(xn, buckets) -> np.ndarray:
+    span = xn[-1] - xn[0]
+    if span <= 0:
+        return np.zeros(len(xn), dtype="int64")
+    return np.minimum(((xn - xn[0]) * (buckets / span)).astype("int64"), buckets - 1)
+
+
+# ======= METODY =======
+def minmax_indices(xn, y, buckets) -> np.ndarray:
+    """Indexy prvního, posledního, minima a maxima v každém sloupci (platné body)."""
+    idx = np.flatnonzero(~np.isnan(y))
+    if len(idx) == 0:
+        return idx
+    b = _bucket_of(xn, buckets)[idx]
+    # idx je seřazené podle x → začátky/konce sloupců = první/poslední bod
+    starts = np.flatnonzero(np.concatenate(([True], b[1:] != b[:-1])))
+    ends = np.concatenate((starts[1:], [len(idx)])) - 1
+    # uvnitř sloupce podle y → první = minimum, poslední = maximum
+    by_y = np.lexsort((y[idx], b))
+    return np.concatenate((idx[starts], idx[ends], idx[by_y[starts]], idx[by_y[ends]]))
+
+
+def lttb_indices(xn, y, buckets) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets na platných bodech + první/poslední/min/max."""
+    idx = np.flatnonzero(~np.isnan(y))
+    n = len(idx)
+    if n <= buckets + 2:
+        return idx
+    px, py = xn[idx], y[idx]
+    # vnitřní body rozdělené do buckets skupin, první a poslední bod zůstávají
+    edges = np.linspace(1, n - 1, buckets + 1).astype("int64")
+    chosen = np.empty(buckets + 2, dtype="int64")
+    chosen[0], chosen[-1] = 0, n - 1
+    a = 0
+    for i in range(buckets):
+        lo, hi = edges[i], edges[i + 1]
+        if hi <= lo:
+            chosen[i + 1] = lo
+            continue
+        # průměr následující skupiny (u poslední skupiny poslední bod)
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 <= buckets else n
+        cx, cy = (px[nlo:nhi].mean(), py[nlo:nhi].mean()) if nhi > nlo else (px[-1], py[-1])
+        area = np.abs((px[a] - cx) * (py[lo:hi] - py[a]) - (px[a] - px[lo:hi]) * (cy - py[a]))
+        a = lo + int(np.argmax(area))
+        chosen[i + 1] = a
+    extremes = [0, n - 1, int(np.argmin(py)), int(np.argmax(py))]
+    return idx[np.concatenate((chosen, extremes))]
+
+
+def downsample(x, ys, buckets, mode="minmax"):
+    """
+    Prořídne řady ys (sdílená osa x, seřazená vzestupně) na body viditelné
+    v buckets sloupcích. Vrací (x, [y, …]) jako NumPy pole.
+    """
+    x = np.asarray(x)
+    ys = [np.asarray(y, dtype="float64") for y in ys]
+    if mode in (None, "none") or len(x) <= buckets * POINTS_PER_BUCKET[mode]:
+        return x, ys
+    xn = _numeric_x(x)
+    if np.any(np.diff(xn) < 0):
+        return x, ys   # neseřazená osa – raději beze změny
+    pick = minmax_indices if mode == "minmax" else lttb_indices
+    parts = [pick(xn, y, buckets) for y in ys]
+    parts += [np.flatnonzero(np.isnan(y)) for y in ys]
+    keep = np.unique(np.concatenate(parts))
+    return x[keep], [y[keep] for y in ys]
@@ -0,0 +1,131 @@
+# duckdb_backend.py
+"""
+Backend DB nad lokální Parquet kopií (local_mirror.py) přes vestavěný DuckDB.
+
+S ANALYZY_DB_BACKEND=duckdb vrací dbsettings.get_connection() místo připojení
+k MySQL tento adaptér. Tabulky kopie (price, price_stat_i1, product, bp) jsou
+pohledy nad jejich Parquet soubory; adaptér napodobuje tu část API
+mysql.connector, kterou skripty používají – cursor(dictionary=…, buffered=…),
+execute s parametry %s, fetchone/fetchmany/fetchall, commit, close – takže
+stávající dotazy běží beze změny. SQL v skriptech proto musí být společné
+oběma dialektům (např. CAST(… AS CHAR) místo implicitního převodu v COALESCE).
+
+Kopie je jen pro čtení: tabulky a_desc_* (statsEngine "sql") se s tímto
+backendem nezakládají, prepare_stats místo toho počítá v Pythonu.
+
+Databáze DuckDB (v paměti, jen pohledy) vzniká jednou na proces; každé
+připojení je její duplikát (DuckDB cursor), takže souběžné dotazy z vláken
+si nepřekážejí.
+
+Závislosti: duckdb (+ soubory z local_mirror.py)
+"""
+
+import os
+import re
+import threading
+
+# ======= KONFIGURACE =======
+
+_PARAM = re.compile(r"%(s|%)")
+
+_db = None
+_db_pid = None
+_db_lock = threading.Lock()
+
+
+# ======= POMOCNÉ =======
+def translate(sql):
+    """Parametry ve stylu mysql.connector (%s, %%) → DuckDB (?, %)."""
+    return _PARAM.sub(lambda m: "?" if m.group(1) == "s" else "%", sql)
+
+
+def open_database(mirror_dir):
+    """DuckDB v paměti s pohledy na tabulky kopie."""
+    import duckdb
+    from local_mirror import MIRROR_TABLES, table_glob
+
+    if not os.path.isdir(mirror_dir):
+        raise FileNotFoundError(
+            f"Lokální kopie DB {mirror_dir} neexistuje – nejdřív spusťte local_mirror.py")
+    db = duckdb.connect(":memory:")
+    for table in MIRROR_TABLES:
+        pattern = table_glob(mirror_dir, table)
+        if not os.path.isdir(os.path.dirname(pattern)):
+            continue   # nesynchronizovaná tabulka – dotaz na ni skončí chybou DuckDB
+        db.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{pattern.replace(chr(39), chr(39) * 2)}')")
+    return db
+
+
+def connect(mirror_dir):
+    """Připojení ke kopii (duplikát databáze tohoto procesu)."""
+    global _db, _db_pid
+    with _db_lock:
+        if _db is None or _db_pid != os.getpid():
+            _db = open_database(mirror_dir)
+            _db_pid = os.getpid()
+        return Connection(_db.cursor())
+
+
+# ======= ADAPTÉR =======
+class Cursor:
+    def __init__(self, con, dictionary=False):
+        self._con = con
+        self._dictionary = dictionary
+        self._names = None
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        self._con.execute(translate(sql), list(params) if params else None)
+        self.description = self._con.description
+        self._names = [d[0] for d in self.description] if self.description else None
+
+    def executemany(self, sql, seq_params):
+        self._con.executemany(translate(sql), [list(p) for p in seq_params])
+
+    def _rows(self, rows):
+        if self._dictionary and self._names:
+            return [dict(zip(self._names, r)) for r in rows]
+        return rows
+
+    def fetchall(self):
+        return self._rows(self._con.fetchall())
+
+    def fetchmany(self, size=1):
+        return self._rows(self._con.fetchmany(size))
+
+    def fetchone(self):
+        rows = self._rows(self._con.fetchmany(1))
+        return rows[0] if rows else None
+
+    def close(self):
+        self._con.close()
+
+
+class Connection:
+    unread_result = False   # DuckDB výsledek dočítat nemusíme
+
+    def __init__(self, con):
+        self._con = con
+
+    def cursor(self, dictionary=False, buffered=None, **kwargs):
+        return Cursor(self._con.cursor(), dictionary)
+
+    def is_connected(self):
+        return True
+
+    def consume_results(self):
+        pass
+
+    # kopie je jen pro čtení – transakce nemají co potvrzovat
+    def start_transaction(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self._con.close()
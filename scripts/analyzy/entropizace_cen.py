@@ -4,9 +4,15 @@
 import os
 import re
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
-from dbsettings import get_connection, load_data_json  # centrální DB nastavení
+from typing import TYPE_CHECKING
+from dbsettings import load_data_json  # centrální DB nastavení
+from image_output import image_format  # formát grafů z data.json
+from render_pool import render_products  # paralelní vykreslování
+from timings import span  # úseky do timings.json
+from series_renderer import render_series  # jedna figura pro všechny produkty
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ====== KONFIGURACE ======
 
@@ -19,75 +25,40 @@ def sanitize_filename(s: str) -> str:
     s = re.sub(r"[\\/:*?\"<>|]+", " ", s)
     return re.sub(r"\s+", " ", s).strip()
 
-# ====== SQL ======
-BASE_SQL = """
-SELECT
-  b.product_id,
-  COALESCE(p2.name, b.product_id) AS product_name,
-  s.date,
-  diB
-FROM bp b
-JOIN price_stat_i1 s
-  ON s.product_id = b.product_id
-LEFT JOIN product p2
-  ON p2.id = b.product_id
-WHERE b.basket_id = %s
-"""
-
-def build_sql_and_params():
-    sql = BASE_SQL
-    params = [data['basketId']]
-    
-    sql += " AND s.date >= %s"
-    params.append(data['dateFrom'])
-    sql += " AND s.date <= %s"
-    params.append(data['dateTo'])
-    sql += " ORDER BY b.product_id, s.date"
-    return sql, tuple(params)
+# ====== DATA ======
+def select_columns(df: "pd.DataFrame"):
+    """Sloupce grafu z řezu price_stat_i1 (celého i jednoho produktu – pipeline)."""
+    return df[["product_id","product_name","date","diB"]]
 
-def fetch_dataframe():
-    sql, params = build_sql_and_params()
-    conn = get_connection()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    if not rows:
-        return pd.DataFrame(columns=["product_id","product_name","date","min_price","mode_price","avg_price"])
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    df["diB"]  = pd.to_numeric(df["diB"], errors="coerce")
-    return df.sort_values(["product_id","date"])
+def fetch_dataframe(work_dir: str):
+    from shared_data import load_price_stats  # pandas až tady – chybné argv / data.json skončí dřív
+    return select_columns(load_price_stats(work_dir, data))
 
-def plot_for_each_product(df: pd.DataFrame, output_dir: str):
-    os.makedirs(output_dir, exist_ok=True)
-    
-    for (product_id, product_name), grp in df.groupby(["product_id","product_name"], dropna=False):
-        if grp.empty:
-            continue
+def render_product(job):
+    """Vykreslí a uloží graf jednoho produktu (běží i v procesu workeru, figura se sdílí)."""
+    title, grp, out_path = job
+    # červená čára na hodnotě 1
+    return render_series(title, grp["date"], [(grp["diB"], "diB")], out_path, ylabel="Index",
+                         hline=(1.0, "referenční 1"))
 
-        x = grp["date"]
-        y_on_par  = grp["diB"]
-
-        plt.figure()
-        plt.plot(x, y_on_par,  label="diB")
-        # červená čára na hodnotě 1
-        plt.axhline(y=1.0, color="red", linestyle="--", linewidth=1, label="referenční 1")
+def product_jobs(frames, output_dir: str):
+    """Úlohy po produktech z celého DataFrame nebo z proudu DataFrame po produktech."""
+    from shared_data import product_groups
+    for product_id, product_name, grp in product_groups(frames):
         title = f"{product_name} — index entropizace cen ({data['dateFrom']} až {data['dateTo']})"
-        plt.title(title)
-        plt.xlabel("Datum")
-        plt.ylabel("Index")
-        plt.legend()
-        plt.grid(True, linestyle=":", linewidth=0.5)
-        plt.xticks(rotation=90)  # otočení datumů
-        plt.tight_layout()
+        fname = f"{sanitize_filename(str(product_id))}.{image_format(data)}"
+        yield (title, grp[["date", "diB"]], os.path.join(output_dir, fname))
 
-        fname = f"{sanitize_filename(str(product_id))}.png"
-        out_path = os.path.join(output_dir, fname)
-        plt.savefig(out_path, dpi=150)
-        plt.close()
-        print(f"Uloženo: {out_path}")
+def plot_for_each_product(frames, output_dir: str, streamed: bool = False):
+    os.makedirs(output_dir, exist_ok=True)
+    if streamed:
+        # pipeline: úlohy vznikají, jak přicházejí produkty z DB, a hned se kreslí
+        render_products(render_product, product_jobs(frames, output_dir), data)
+        return
+    with span("transform", what="jobs") as s:
+        jobs = list(product_jobs(frames, output_dir))
+        s["products"] = len(jobs)
+    render_products(render_product, jobs, data)
 
 def main():
     global data
@@ -110,7 +81,12 @@ def main():
     output_dir = os.path.join(work_dir, "img/entropizace")
     
     print("Načítám data…")
-    df = fetch_dataframe()
+    if data.get('pipeline'):
+        from shared_data import iter_price_stats
+        plot_for_each_product(map(select_columns, iter_price_stats(work_dir, data)), output_dir, streamed=True)
+        print("Hotovo.")
+        return
+    df = fetch_dataframe(work_dir)
     if df.empty:
         print("Žádná data k vykreslení.")
         return
@@ -0,0 +1,150 @@
+# grouped_stats.py
+"""
+Vektorové statistiky cen po produktech (bez smyček v Pythonu).
+
+Ceny se převedou na celé haléře (int64), seřadí podle (product_id, cena)
+a ze seřazeného pole se v jednom průchodu spočítá pro všechny produkty
+n, průměr, medián, modus a jeho četnost. Vstupem mohou být i předagregované
+dvojice (cena, počet výskytů) – viz aggregate_sorted/weighted_price_stats.
+
+Modus: nejčastější cena, při shodě četností ta nižší – stejně jako
+mode_ranked v prepare_stats.py (RANK() ... ORDER BY c DESC, price ASC).
+
+Závislosti: numpy, pandas
+"""
+
+import numpy as np
+import pandas as pd
+
+STATS_COLUMNS = ["product_id", "n", "mean", "median", "mode", "mode_count"]
+
+
+def to_cents(prices) -> np.ndarray:
+    """Ceny → celé haléře (zaokrouhlení na 2 desetinná místa celočíselně)."""
+    return np.rint(np.asarray(prices, dtype="float64") * 100).astype("int64")
+
+
+def group_starts(pid_s) -> np.ndarray:
+    """Indexy začátků produktů v poli seřazeném podle product_id."""
+    if len(pid_s) == 0:
+        return np.array([], dtype="int64")
+    return np.flatnonzero(np.concatenate(([True], pid_s[1:] != pid_s[:-1])))
+
+
+def group_sorted(product_ids, values):
+    """
+    Seřadí hodnoty podle (product_id, hodnota).
+    Vrací (product_ids, values, starts) – starts jsou indexy začátků produktů.
+    Hodnoty nesmí obsahovat NaN.
+    """
+    product_ids = np.asarray(product_ids)
+    values = np.asarray(values)
+    order = np.lexsort((values, product_ids))
+    pid_s = product_ids[order]
+    val_s = values[order]
+    return pid_s, val_s, group_starts(pid_s)
+
+
+def aggregate_sorted(product_ids, values, counts):
+    """
+    Předagregovaná data (hodnota + počet výskytů) seřadí podle (product_id, hodnota)
+    a sloučí případné duplicitní dvojice. Vrací (product_ids, values, counts, starts).
+    """
+    product_ids = np.asarray(product_ids)
+    values = np.asarray(values)
+    order = np.lexsort((values, product_ids))
+    pid_s = product_ids[order]
+    val_s = values[order]
+    cnt_s = np.asarray(counts, dtype="int64")[order]
+    if len(pid_s) == 0:
+        return pid_s, val_s, cnt_s, group_starts(pid_s)
+
+    run_starts = _run_starts(pid_s, val_s)
+    pid_u = pid_s[run_starts]
+    return pid_u, val_s[run_starts], np.add.reduceat(cnt_s, run_starts), group_starts(pid_u)
+
+
+def _run_starts(pid_s, val_s) -> np.ndarray:
+    """Začátky běhů stejné dvojice (product_id, hodnota) v seřazených datech."""
+    return np.flatnonzero(np.concatenate((
+        [True], (pid_s[1:] != pid_s[:-1]) | (val_s[1:] != val_s[:-1])
+    )))
+
+
+def _empty_stats() -> pd.DataFrame:
+    return pd.DataFrame({col: [] for col in STATS_COLUMNS})
+
+
+def price_stats(pid_s, val_s, starts) -> pd.DataFrame:
+    """
+    Statistiky pro data seřazená funkcí group_sorted.
+    mean/median/mode jsou ve stejných jednotkách jako vstup (např. haléře).
+    """
+    if len(starts) == 0:
+        return _empty_stats()
+
+    # běhy stejných cen uvnitř produktu (díky řazení jdou za sebou vzestupně)
+    run_starts = _run_starts(pid_s, val_s)
+    run_counts = np.diff(np.concatenate((run_starts, [len(val_s)])))
+    run_pid = pid_s[run_starts]
+    return weighted_price_stats(run_pid, val_s[run_starts], run_counts, group_starts(run_pid))
+
+
+def weighted_price_stats(pid_u, val_u, cnt_u, starts) -> pd.DataFrame:
+    """
+    Statistiky z dvojic (hodnota, počet) seřazených a sloučených funkcí
+    aggregate_sorted – každá hodnota je v produktu nejvýš jednou.
+    """
+    if len(starts) == 0:
+        return _empty_stats()
+
+    n = np.add.reduceat(cnt_u, starts)
+    mean = np.add.reduceat(val_u.astype("float64") * cnt_u, starts) / n
+
+    # medián: prvky s pořadím (n-1)//2 a n//2 najdeme v kumulativních četnostech
+    cum = np.cumsum(cnt_u)
+    offset = np.concatenate(([0], cum))[starts]
+    lo = np.searchsorted(cum, offset + (n - 1) // 2, side="right")
+    hi = np.searchsorted(cum, offset + n // 2, side="right")
+    median = (val_u[lo] + val_u[hi]) / 2
+
+    # modus: první (= nejnižší) hodnota s maximální četností v produktu
+    mode_count = np.maximum.reduceat(cnt_u, starts)
+    sizes = np.diff(np.concatenate((starts, [len(val_u)])))
+    group = np.repeat(np.arange(len(starts)), sizes)
+    max_idx = np.flatnonzero(cnt_u == mode_count[group])
+    _, first_max = np.unique(group[max_idx], return_index=True)
+    mode = val_u[max_idx[first_max]]
+
+    return pd.DataFrame({
+        "product_id": pid_u[starts],
+        "n": n,
+        "mean": mean,
+        "median": median,
+        "mode": mode,
+        "mode_count": mode_count,
+    })
+
+
+def partition_price_stats(keys, cents):
+    """
+    Denní statistiky tabulky price_stat_i1 pro skupiny keys (např. den nebo
+    zakódovaná dvojice produkt+den) z platných cen v haléřích.
+    Vrací {key, seller_count, min_cents, mode_cents, avg_price, on_par, diB}
+    jako NumPy pole: on_par = podíl cen rovných minimu, diB = modus / minimum.
+    """
+    key_s, cents_s, starts = group_sorted(keys, cents)
+    stats = price_stats(key_s, cents_s, starts)
+    n = stats["n"].to_numpy().astype("int64")
+    min_cents = cents_s[starts]                     # ceny jsou ve skupině seřazené
+    at_min = np.add.reduceat((cents_s == np.repeat(min_cents, n)).astype("int64"), starts)
+    mode_cents = stats["mode"].to_numpy().astype("int64")
+    return {
+        "key": key_s[starts],
+        "seller_count": n,
+        "min_cents": min_cents,
+        "mode_cents": mode_cents,
+        "avg_price": stats["mean"].to_numpy() / 100,
+        "on_par": at_min / n,
+        "diB": mode_cents / min_cents,
+    }
@@ -5,21 +5,32 @@
 Vygeneruje histogramy cen pro každý produkt z košíku (basket_id),
 za dané období. Titulek = product.name (pokud existuje).
 
-Závislosti: mysql-connector-python, pandas, matplotlib
+Pokud už denní ceny košíku za období načetl jiný krok výsledku
+(<work_dir>/cache/daily_prices.npz – prepare_stats.py, batch_run.py)
+a histogram se smí kreslit s vahami ("aggregatedFetch" nebo číselné
+histBins), kreslí se z nich a z DB se čte jen seznam produktů.
+
+Závislosti: mysql-connector-python, numpy, pandas, matplotlib
 """
 
 import os
 import re
 import sys
-from collections import Counter
-from statistics import median
 from datetime import datetime
 
-import mysql.connector
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
 from dbsettings import get_connection, load_data_json  # <--- tady
+from image_output import image_format, save_figure  # formát a kódování grafů z data.json
+from render_pool import render_products  # paralelní vykreslování
+from shared_data import shared_daily_prices  # denní ceny sdílené s dalšími kroky
+from startup import pyplot  # matplotlib až při kreslení (Agg, trvalá font cache)
+from stream_fetch import fetch_columns, iter_product_groups, prefetch  # streamovaný fetch
+from timings import span  # úseky do timings.json
+from grouped_stats import (  # vektorové statistiky
+    aggregate_sorted, group_sorted, price_stats, to_cents, weighted_price_stats,
+)
 
 # ======= KONFIGURACE =======
 
@@ -33,6 +44,16 @@ HIST_BINS = 30        # počet intervalů (sloupců) "auto"
 # Zaokrouhlit ceny na 2 desetinná místa (doporučeno, pokud máš FLOAT)
 ROUND_TO_CENTS = True
 
+# Sloupce pro streamovaný fetch (data.json "streamFetch": true)
+STREAM_COLUMNS = [("product_id", "int64"), ("product_name", "object"), ("price", "float64")]
+
+# Sloupce pro agregovaný fetch (data.json "aggregatedFetch": true)
+AGG_COLUMNS = [("product_id", "int64"), ("product_name", "object"),
+               ("price_cents", "int64"), ("cnt", "int64")]
+
+# Sloupce seznamu produktů košíku pro úložiště cen (data.json "priceStore": true)
+STORE_BASKET_COLUMNS = [("product_id", "int64"), ("product_name", "object")]
+
 # Výstupní složka (automaticky zahrne období a košík)
 #OUTPUT_DIR = "img/histogram"
 
@@ -42,18 +63,12 @@ def sanitize_filename(s: str) -> str:
     s = re.sub(r"[\\/:*?\"<>|]+", " ", s)
     return re.sub(r"\s+", " ", s).strip()
 
-def round2(x) -> float:
-    try:
-        return round(float(x), 2)
-    except Exception:
-        return None
-
 
 # ======= SQL DOTAZ =======
 SQL = """
 SELECT
   b.product_id,
-  COALESCE(p2.name, b.product_id) AS product_name,
+  COALESCE(p2.name, CAST(b.product_id AS CHAR)) AS product_name,
   p.price
 FROM bp b
 JOIN price p
@@ -65,74 +80,236 @@ LEFT JOIN product p2
 WHERE b.basket_id = %s
 """
 
+# streamovaný fetch potřebuje řádky seřazené po produktech
+STREAM_SQL = SQL + "ORDER BY b.product_id\n"
+
+# agregovaný fetch: jeden řádek na (produkt, cena v haléřích) s počtem pozorování
+AGG_SQL = """
+SELECT
+  b.product_id,
+  COALESCE(p2.name, CAST(b.product_id AS CHAR)) AS product_name,
+  ROUND(p.price * 100) AS price_cents,
+  COUNT(*) AS cnt
+FROM bp b
+JOIN price p
+  ON p.product_id = b.product_id
+  AND p.invalid = 0
+  AND p.price IS NOT NULL
+  AND p.date BETWEEN %s AND %s
+LEFT JOIN product p2
+  ON p2.id = b.product_id
+WHERE b.basket_id = %s
+GROUP BY b.product_id, p2.name, price_cents
+ORDER BY b.product_id, price_cents
+"""
+
+# produkty košíku pro čtení z úložiště cen (data.json "priceStore": true)
+STORE_BASKET_SQL = """
+SELECT b.product_id, COALESCE(p2.name, CAST(b.product_id AS CHAR)) AS product_name
+FROM bp b
+LEFT JOIN product p2
+  ON p2.id = b.product_id
+WHERE b.basket_id = %s
+ORDER BY b.product_id
+"""
+
+
+def store_dataframe(work_dir):
+    """
+    Ceny z úložiště cen (data.json "priceStore": true) ve tvaru fetch_dataframe();
+    z DB se čte jen seznam produktů košíku.
+    """
+    from price_store import load_prices
+    basket = fetch_columns(STORE_BASKET_SQL, (data['basketId'],), STORE_BASKET_COLUMNS)
+    cols = load_prices(work_dir, data, basket["product_id"])
+    names = pd.Series(basket["product_name"], index=basket["product_id"])
+    return pd.DataFrame({
+        "product_id": cols["product_id"],
+        "product_name": names.reindex(cols["product_id"]).to_numpy(),
+        "price": cols["price_cents"] / 100,
+    })
+
 
 def fetch_dataframe():
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
     
     # Použijeme data z globálního objektu přímo
-    cur.execute(SQL, (data['dateFrom'], data['dateTo'], data['basketId']))
-    rows = cur.fetchall()
+    with span("execute"):
+        cur.execute(SQL, (data['dateFrom'], data['dateTo'], data['basketId']))
+    with span("fetch") as s:
+        rows = cur.fetchall()
+        s["rows"] = len(rows)
     cur.close()
     conn.close()
 
     if not rows:
         return pd.DataFrame(columns=["product_id", "product_name", "price"])
 
-    df = pd.DataFrame(rows)
-    # ceny jako float a volitelné zaokrouhlení
-    df["price"] = pd.to_numeric(df["price"], errors="coerce")
-    if ROUND_TO_CENTS:
-        df["price"] = df["price"].map(round2)
+    with span("transform", what="dataframe", rows=len(rows)):
+        df = pd.DataFrame(rows)
+        # ceny jako float, zaokrouhlení řeší compute_stats
+        df["price"] = pd.to_numeric(df["price"], errors="coerce").astype("float64")
     return df
 
 
-def save_histograms(df: pd.DataFrame):
+def render_histogram(job):
+    """Vykreslí a uloží histogram jednoho produktu (běží i v procesu workeru)."""
+    title, prices, weights, bins, out_path = job
+    plt = pyplot()
+    if weights is not None and isinstance(bins, str):
+        # odhad počtu intervalů ("auto" …) numpy s vahami neumí – hranice
+        # z rozvinutých pozorování, stejné jako bez agregace
+        bins = np.histogram_bin_edges(np.repeat(prices, weights), bins)
+
+    plt.figure()
+    plt.hist(prices, bins=bins, weights=weights)
+    plt.title(title)
+    plt.xlabel("Cena")
+    plt.ylabel("Frekvence")
+    plt.grid(True, linestyle=":", linewidth=0.5)
+    plt.tight_layout()
+    save_figure(plt.gcf(), out_path)
+    plt.close()
+    return out_path
+
+
+def compute_stats(product_ids, prices):
+    """
+    Statistiky všech produktů najednou (viz grouped_stats).
+    Vrací (stats, seřazené ceny, začátky produktů); ceny i statistiky v Kč.
+    """
+    prices = np.asarray(prices, dtype="float64")
+    mask = ~np.isnan(prices)
+    # zaokrouhlení na haléře celočíselně; bez něj se počítá přímo s float
+    values = to_cents(prices[mask]) if ROUND_TO_CENTS else prices[mask]
+    scale = 100 if ROUND_TO_CENTS else 1
+
+    pid_s, val_s, starts = group_sorted(np.asarray(product_ids)[mask], values)
+    stats = price_stats(pid_s, val_s, starts)
+    for col in ("mean", "median", "mode"):
+        stats[col] = stats[col] / scale
+    return stats, val_s / scale, starts
+
+
+def histogram_job(row, prices, weights=None):
+    """
+    Úloha pro vykreslení jednoho produktu; titulek z řádku tabulky statistik.
+    weights = počty pozorování jednotlivých cen (agregovaný fetch), jinak None.
+    """
+    title = f"{row.product_name} — histogram cen ({data['dateFrom']} až {data['dateTo']})\n" \
+            f"n={row.n}, avg={row.mean:.2f}, median={row.median:.2f}, " \
+            f"mode={row.mode:.2f} (×{row.mode_count})"
+
+    # Kreslení histogramu (jedna figura per produkt, případně v procesu workeru)
+    fname = f"{sanitize_filename(str(row.product_id))}.{image_format(data)}"
+    path = os.path.join(OUTPUT_DIR, fname)
+    return title, prices, weights, data['histBins'], path
+
+
+def dataframe_jobs(df: pd.DataFrame, stats_parts: list):
+    """Úlohy pro celý DataFrame – statistiky všech produktů v jednom průchodu."""
+    with span("transform", what="stats", rows=len(df)):
+        stats, prices_s, starts = compute_stats(df["product_id"].to_numpy(), df["price"].to_numpy())
+        names = df.drop_duplicates("product_id").set_index("product_id")["product_name"]
+        stats.insert(1, "product_name", stats["product_id"].map(names))
+    stats_parts.append(stats)
+
+    ends = np.concatenate((starts[1:], [len(prices_s)]))
+    return [
+        histogram_job(row, prices_s[start:end])
+        for row, start, end in zip(stats.itertuples(index=False), starts, ends)
+    ]
+
+
+def stream_jobs(stats_parts: list):
+    """
+    Streamovaný fetch: vydává úlohy po produktech, jakmile jsou řádky
+    produktu kompletní. Paměť ~ největší produkt.
+    S "pipeline": true se čte z DB ve vlákně, takže přenos a kreslení se překrývají.
+    """
+    params = (data['dateFrom'], data['dateTo'], data['basketId'])
+    groups = iter_product_groups(STREAM_SQL, params, STREAM_COLUMNS)
+    if data['pipeline']:
+        # fetch běží ve vlákně a plní frontu, mezitím se počítá a kreslí
+        groups = prefetch(groups)
+    for grp in groups:
+        stats, prices_s, _ = compute_stats(grp["product_id"], grp["price"])
+        if stats.empty:
+            continue
+        stats.insert(1, "product_name", grp["product_name"][0])
+        stats_parts.append(stats)
+        yield histogram_job(next(stats.itertuples(index=False)), prices_s)
+
+
+def aggregated_jobs(stats_parts: list):
+    """
+    Agregovaný fetch: DB vrátí jen (produkt, cena, počet) a histogram se kreslí
+    s vahami – přenáší se jeden řádek na různou cenu místo jednoho na pozorování.
+    """
+    params = (data['dateFrom'], data['dateTo'], data['basketId'])
+    return weighted_jobs(fetch_columns(AGG_SQL, params, AGG_COLUMNS), stats_parts)
+
+
+def uses_shared_prices(data) -> bool:
+    """
+    Smí se kreslit ze sdílených denních cen (s vahami)? Jen s "aggregatedFetch"
+    nebo číselným histBins – jinak zůstává cesta s jednotlivými pozorováními.
+    """
+    return not data.get('priceStore') and (
+        bool(data.get('aggregatedFetch')) or not isinstance(data.get('histBins', HIST_BINS), str))
+
+
+def shared_jobs(daily, stats_parts: list):
+    """
+    Úlohy ze sdílených denních map cen (shared_data, např. z batch_run.py):
+    počty za dny se sečtou jako v AGG_SQL, z DB se čte jen seznam produktů košíku.
+    """
+    basket = fetch_columns(STORE_BASKET_SQL, (data['basketId'],), STORE_BASKET_COLUMNS)
+    names = pd.Series(basket["product_name"], index=basket["product_id"])
+    cols = {
+        "product_id": daily["product_id"],
+        "product_name": names.reindex(daily["product_id"]).to_numpy(),
+        "price_cents": daily["price_cents"],
+        "cnt": daily["cnt"],
+    }
+    return weighted_jobs(cols, stats_parts)
+
+
+def weighted_jobs(cols, stats_parts: list):
+    """Úlohy z dvojic (cena v haléřích, počet) po produktech – histogram s vahami."""
+    if len(cols["product_id"]) == 0:
+        return []
+
+    with span("transform", what="stats", rows=len(cols["product_id"])):
+        pid_u, cents_u, cnt_u, starts = aggregate_sorted(cols["product_id"], cols["price_cents"], cols["cnt"])
+        stats = weighted_price_stats(pid_u, cents_u, cnt_u, starts)
+        for col in ("mean", "median", "mode"):
+            stats[col] = stats[col] / 100
+        names = pd.Series(cols["product_name"], index=cols["product_id"])
+        stats.insert(1, "product_name", stats["product_id"].map(names[~names.index.duplicated()]))
+    stats_parts.append(stats)
+    print(f"Načteno {len(pid_u)} různých cen ({int(cnt_u.sum())} pozorování) pro {len(starts)} produktů.")
+
+    ends = np.concatenate((starts[1:], [len(cents_u)]))
+    return [
+        histogram_job(row, cents_u[start:end] / 100, cnt_u[start:end])
+        for row, start, end in zip(stats.itertuples(index=False), starts, ends)
+    ]
+
+
+def save_histograms(jobs):
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    render_products(render_histogram, jobs, data)
 
-    for (product_id, product_name), grp in df.groupby(["product_id", "product_name"], dropna=False):
-        prices = grp["price"].dropna().to_list()
-        if not prices:
-            continue
 
-        # Statistika do titulku
-        n = len(prices)
-        avg = sum(prices) / n if n else None
-        try:
-            med = median(prices)
-        except Exception:
-            med = None
-
-        mode_val = mode_count = None
-        if n:
-            c = Counter(prices)
-            max_c = max(c.values())
-            # při shodě zvolíme nižší cenu
-            mode_val = min([v for v, cnt in c.items() if cnt == max_c])
-            mode_count = max_c
-
-        # Kreslení histogramu (jedna figura per produkt)
-        plt.figure()
-        plt.hist(prices, bins=data['histBins'])  # použijeme přímo z data
-        title = f"{product_name} — histogram cen ({data['dateFrom']} až {data['dateTo']})\n" \
-                f"n={n}"
-        if avg is not None:
-            title += f", avg={avg:.2f}"
-        if med is not None:
-            title += f", median={med:.2f}"
-        if mode_val is not None:
-            title += f", mode={mode_val:.2f} (×{mode_count})"
-        plt.title(title)
-        plt.xlabel("Cena")
-        plt.ylabel("Frekvence")
-        plt.grid(True, linestyle=":", linewidth=0.5)
-        plt.tight_layout()
-
-        fname = f"{sanitize_filename(str(product_id))}.png"
-        path = os.path.join(OUTPUT_DIR, fname)
-        plt.savefig(path, dpi=150)
-        plt.close()
-        print(f"Uloženo: {path}")
+def save_stats(stats_parts: list, path: str):
+    """Tabulka statistik (stejná čísla jako v titulcích) do CSV."""
+    if not stats_parts:
+        return
+    stats = pd.concat(stats_parts, ignore_index=True).rename(columns={"mean": "avg"})
+    stats.to_csv(path, index=False, float_format="%.2f")
+    print(f"Uloženo: {path}")
 
 
 def main():
@@ -153,18 +330,62 @@ def main():
     
     # Načteme konfiguraci pomocí funkce z dbsettings
     default_values = {
-        'histBins': 30
+        'histBins': 30,
+        'streamFetch': False,
+        'aggregatedFetch': False,
+        'priceStore': False,
+        'pipeline': False
     }
     data = load_data_json(json_path, default_values)
     OUTPUT_DIR = os.path.join(work_dir, "img/histogram")
+    stats_path = os.path.join(work_dir, "histogram_stats.csv")
+    stats_parts = []
     
+    if data['priceStore']:
+        # ceny z memmap úložiště (price_store.py), DB jen pro seznam produktů
+        print(f"Načítám data z úložiště cen …")
+        df = store_dataframe(work_dir)
+        if df.empty:
+            print("Žádná data pro zadané období/košík.")
+            return
+        print(f"Načteno {len(df)} řádků pro {df['product_id'].nunique()} produktů.")
+        save_histograms(dataframe_jobs(df, stats_parts))
+        save_stats(stats_parts, stats_path)
+        print("Hotovo.")
+        return
+
+    daily = shared_daily_prices(work_dir, data) if uses_shared_prices(data) else None
+    if daily is not None or data['aggregatedFetch']:
+        # sdílené denní ceny (batch_run.py, prepare_stats) dávají stejná čísla jako AGG_SQL
+        if daily is not None:
+            jobs = shared_jobs(daily, stats_parts)
+        else:
+            print(f"Načítám agregovaná data z DB …")
+            jobs = aggregated_jobs(stats_parts)
+        if not jobs:
+            print("Žádná data pro zadané období/košík.")
+            return
+        save_histograms(jobs)
+        save_stats(stats_parts, stats_path)
+        print("Hotovo.")
+        return
+
+    if data['streamFetch'] or data['pipeline']:
+        # histogramy se kreslí průběžně, jak chodí produkty z DB
+        print(f"Načítám data z DB (streamovaně{', fetch ve vlákně' if data['pipeline'] else ''}) …")
+        save_histograms(stream_jobs(stats_parts))
+        save_stats(stats_parts, stats_path)
+        print("Hotovo.")
+        return
+
     print(f"Načítám data z DB …")
     df = fetch_dataframe()
     if df.empty:
         print("Žádná data pro zadané období/košík.")
         return
     print(f"Načteno {len(df)} řádků pro {df['product_id'].nunique()} produktů.")
-    save_histograms(df)
+    save_histograms(dataframe_jobs(df, stats_parts))
+    save_stats(stats_parts, stats_path)
     print("Hotovo.")
 
 
@@ -0,0 +1,279 @@
+# image_output.py
+"""
+Výstup grafů jedné metriky do jednoho souboru místo PNG na produkt.
+
+data.json "imageOutput":
+  "files" (výchozí) – img/<metrika>/<product_id>.png, jak je čte reporter.js
+  "pdf"             – img/<metrika>.pdf, jedna strana na produkt
+  "atlas"           – img/<metrika>.atlas-<k>.png, dlaždice atlasColumns × atlasRows
+                      (výchozí 4 × 5) na list
+
+U "pdf" a "atlas" vzniká i img/<metrika>.index.json (product_id → strana /
+list a obdélník dlaždice). Grafy se do souboru přidávají průběžně v pořadí
+úloh, jak je render_pool vykreslí; celý atlas list ani PDF se v paměti
+nedrží. Pro report (reporter.js) je potřeba "files" – dokument potřebuje
+obrázky po produktech.
+
+Kódování obrázků (data.json, platí pro všechny skripty s grafy):
+  "imageFormat"    "png" (výchozí) | "svg" | "webp" – jen pro "files";
+                   "pdf" / "atlas" skládají vždy z PNG
+  "imageDpi"       výchozí 150 (IMAGE_DPI)
+  "pngCompression" 0–9, výchozí 6 (zlib; 1 je několikanásobně rychlejší,
+                   soubor o něco větší)
+  "imageFast"      náhled: FAST_DPI a FAST_PNG_COMPRESSION, pokud nejsou
+                   imageDpi / pngCompression zadané výslovně
+  "downsample"     "none" (výchozí) | "minmax" | "lttb" – prořídnutí časových
+                   řad podle rozlišení grafu (viz downsample, series_renderer)
+
+reporter.js vkládá do dokumentu jen PNG/JPG, proto se u "svg" a "webp"
+vedle grafu uloží i <id>.png v rozlišení REPORT_DPI (report ho vkládá
+v 500 × 400 px). Bez WebP v Pillow se místo "webp" použije "png".
+
+Závislosti: matplotlib (PdfPages), Pillow (závislost matplotlibu), numpy
+"""
+
+import io
+import json
+import os
+from functools import lru_cache
+
+# ======= KONFIGURACE =======
+
+OUTPUT_MODES = ("files", "pdf", "atlas")
+ATLAS_COLUMNS = 4
+ATLAS_ROWS = 5
+
+IMAGE_FORMATS = ("png", "svg", "webp")
+IMAGE_DPI = 150
+PNG_COMPRESSION = 6       # výchozí úroveň Pillow
+FAST_DPI = 80
+FAST_PNG_COMPRESSION = 1
+FAST_WEBP_QUALITY = 70    # náhled ztrátově; jinak bezeztrátově (u grafů i menší)
+REPORT_DPI = 80           # PNG pro reporter.js u "svg" / "webp"
+REPORT_FORMATS = (".png", ".jpg")   # co umí vložit reporter.js
+
+# nastavení kódování v tomto procesu (render_pool ho nastaví i ve workerech)
+_settings = None
+
+
+# ======= POMOCNÉ =======
+def output_mode(data) -> str:
+    mode = data.get('imageOutput') or "files"
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Neznámý imageOutput '{mode}' (povolené: {', '.join(OUTPUT_MODES)})")
+    return mode
+
+
+@lru_cache(maxsize=None)
+def _webp_available() -> bool:
+    from PIL import features
+    return bool(features.check("webp"))
+
+
+def image_format(data) -> str:
+    """Formát souborů grafů (přípona bez tečky); "pdf" / "atlas" skládají z PNG."""
+    fmt = str(data.get('imageFormat') or "png").lower()
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"Neznámý imageFormat '{fmt}' (povolené: {', '.join(IMAGE_FORMATS)})")
+    if output_mode(data) != "files":
+        return "png"
+    if fmt == "webp" and not _webp_available():
+        return "png"
+    return fmt
+
+
+def image_settings(data) -> dict:
+    """Kódování obrázků z data.json (viz hlavička modulu)."""
+    fast = bool(data.get('imageFast'))
+    dpi = data.get('imageDpi') or (FAST_DPI if fast else IMAGE_DPI)
+    compression = data.get('pngCompression')
+    if compression is None:
+        compression = FAST_PNG_COMPRESSION if fast else PNG_COMPRESSION
+    if not 0 <= int(compression) <= 9:
+        raise ValueError(f"pngCompression musí být 0–9, ne {compression}")
+    from downsample import DOWNSAMPLE_MODES
+    reduce = data.get('downsample') or "none"
+    if reduce not in DOWNSAMPLE_MODES:
+        raise ValueError(f"Neznámý downsample '{reduce}' (povolené: {', '.join(DOWNSAMPLE_MODES)})")
+    return {
+        "format": image_format(data),
+        "dpi": int(dpi),
+        "png_compression": int(compression),
+        "webp": {"quality": FAST_WEBP_QUALITY, "method": 0} if fast else {"lossless": True},
+        "downsample": reduce,
+    }
+
+
+def configure(settings):
+    global _settings
+    _settings = settings
+
+
+def current_settings() -> dict:
+    """Nastavení procesu; bez configure() výchozí (ruční volání render funkcí)."""
+    if _settings is None:
+        configure(image_settings({}))
+    return _settings
+
+
+def report_copy_path(out_path):
+    """PNG pro reporter.js vedle grafu ve formátu, který report nevloží, jinak None."""
+    stem, ext = os.path.splitext(out_path)
+    return None if ext.lower() in REPORT_FORMATS else stem + ".png"
+
+
+def output_files(out_path):
+    """Všechny soubory, které save_figure pro out_path zapíše."""
+    report_path = report_copy_path(out_path)
+    return [out_path] if report_path is None else [out_path, report_path]
+
+
+def save_figure(fig, out):
+    """
+    savefig podle nastavení procesu. out je cesta (formát podle přípony)
+    nebo BytesIO – to je vždy PNG (pdf / atlas).
+    """
+    s = current_settings()
+    png_kwargs = {"format": "png", "dpi": s["dpi"], "pil_kwargs": {"compress_level": s["png_compression"]}}
+    if not isinstance(out, str):
+        fig.savefig(out, **png_kwargs)
+        return
+    fmt = os.path.splitext(out)[1].lstrip(".").lower()
+    if fmt == "png":
+        fig.savefig(out, **png_kwargs)
+    elif fmt == "webp":
+        fig.savefig(out, format="webp", dpi=s["dpi"], pil_kwargs=s["webp"])
+    else:
+        fig.savefig(out, format=fmt, dpi=s["dpi"])
+    report_path = report_copy_path(out)
+    if report_path is not None:
+        fig.savefig(report_path, format="png", dpi=REPORT_DPI,
+                    pil_kwargs={"compress_level": FAST_PNG_COMPRESSION})
+
+
+def split_out_path(out_path):
+    """img/<metrika>/<id>.png → (img/<metrika>, <id>)."""
+    metric_dir, fname = os.path.split(out_path)
+    return metric_dir, os.path.splitext(fname)[0]
+
+
+def _write_index(path, index):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+
+def _remove_if_empty(directory):
+    """Složka metriky zůstane prázdná (skripty ji zakládají předem) – pryč s ní."""
+    try:
+        os.rmdir(directory)
+    except OSError:
+        pass
+
+
+# ======= VÝSTUPY =======
+class PdfOutput:
+    """Vícestránkové PDF – každý obrázek jedna strana v původní velikosti."""
+
+    def __init__(self, metric_dir, dpi=IMAGE_DPI):
+        from matplotlib.backends.backend_pdf import PdfPages
+        self.metric_dir = metric_dir
+        self.dpi = dpi
+        self.path = metric_dir + ".pdf"
+        self.index_path = metric_dir + ".index.json"
+        self.pdf = PdfPages(self.path)
+        self.index = {}
+
+    def add(self, product_key, png: bytes):
+        import numpy as np
+        from matplotlib.figure import Figure
+        from PIL import Image
+
+        img = np.asarray(Image.open(io.BytesIO(png)).convert("RGBA"))
+        height, width = img.shape[:2]
+        fig = Figure(figsize=(width / self.dpi, height / self.dpi), dpi=self.dpi)
+        fig.figimage(img, origin="upper")
+        self.pdf.savefig(fig)
+        self.index[product_key] = {"page": len(self.index) + 1}
+
+    def close(self):
+        self.pdf.close()
+        _write_index(self.index_path, {"file": os.path.basename(self.path), "products": self.index})
+        _remove_if_empty(self.metric_dir)
+        print(f"Uloženo: {self.path} ({len(self.index)} stran), index {self.index_path}")
+
+
+class AtlasOutput:
+    """Listy PNG s dlaždicemi; plný list se hned zapíše a zahodí z paměti."""
+
+    def __init__(self, metric_dir, columns=ATLAS_COLUMNS, rows=ATLAS_ROWS):
+        self.metric_dir = metric_dir
+        self.index_path = metric_dir + ".index.json"
+        self.columns = columns
+        self.rows = rows
+        self.sheet = None
+        self.sheet_no = 0
+        self.slot = 0
+        self.tile_size = None
+        self.sheets = []
+        self.index = {}
+
+    def _sheet_path(self):
+        return f"{self.metric_dir}.atlas-{self.sheet_no}.png"
+
+    def add(self, product_key, png: bytes):
+        from PIL import Image
+
+        tile = Image.open(io.BytesIO(png)).convert("RGBA")
+        if self.tile_size is None:
+            self.tile_size = tile.size
+        elif tile.size != self.tile_size:
+            tile = tile.resize(self.tile_size)
+        if self.sheet is None:
+            w, h = self.tile_size
+            self.sheet = Image.new("RGBA", (w * self.columns, h * self.rows), "white")
+
+        w, h = self.tile_size
+        x, y = (self.slot % self.columns) * w, (self.slot // self.columns) * h
+        self.sheet.paste(tile, (x, y))
+        self.index[product_key] = {
+            "sheet": os.path.basename(self._sheet_path()), "x": x, "y": y, "w": w, "h": h,
+        }
+        self.slot += 1
+        if self.slot == self.columns * self.rows:
+            self._flush()
+
+    def _flush(self):
+        if self.sheet is None:
+            return
+        if self.slot < self.columns * self.rows:
+            # poslední list jen na výšku obsazených řádků
+            w, h = self.tile_size
+            used_rows = -(-self.slot // self.columns)
+            self.sheet = self.sheet.crop((0, 0, w * self.columns, h * used_rows))
+        self.sheet.save(self._sheet_path())
+        self.sheets.append(self._sheet_path())
+        self.sheet = None
+        self.slot = 0
+        self.sheet_no += 1
+
+    def close(self):
+        self._flush()
+        _write_index(self.index_path, {
+            "sheets": [os.path.basename(p) for p in self.sheets],
+            "columns": self.columns, "rows": self.rows, "products": self.index,
+        })
+        _remove_if_empty(self.metric_dir)
+        print(f"Uloženo: {len(self.sheets)} listů atlasu {self.metric_dir}.atlas-*.png "
+              f"({len(self.index)} produktů), index {self.index_path}")
+
+
+def open_output(data, metric_dir):
+    """Výstup pro režim "pdf" / "atlas" (pro "files" None – každý graf do svého souboru)."""
+    mode = output_mode(data)
+    if mode == "pdf":
+        # strana má fyzický rozměr grafu při jeho dpi
+        return PdfOutput(metric_dir, image_settings(data)["dpi"])
+    if mode == "atlas":
+        return AtlasOutput(metric_dir, int(data.get('atlasColumns') or ATLAS_COLUMNS),
+                           int(data.get('atlasRows') or ATLAS_ROWS))
+    return None
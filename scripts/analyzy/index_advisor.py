@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Index advisor pro dotazy analýz.
+
+Pro zadání z <work_dir>/data.json (basketId, dateFrom, dateTo) spustí
+EXPLAIN na všechny dotazy, které posílají prepare_stats.py (SQL i Python
+engine), histogram.py (všechny režimy fetch) a plot skripty (shared_data),
+vypíše plné průchody tabulek (type ALL), filesort a dočasné tabulky
+a změří čas každého dotazu (medián z --repeat běhů, výsledek se dočte celý).
+
+S --apply doplní chybějící indexy z verzované sady INDEX_MIGRATIONS
+(online: ALGORITHM=INPLACE, LOCK=NONE), aktualizuje statistiky tabulek
+a vše změří znovu – report pak obsahuje časy před/po a velikost indexů,
+aby bylo vidět, co index stojí na disku a co přinese.
+
+Použité verze se evidují v tabulce INDEX_VERSION_TABLE; index, který už
+pokrývá existující index (stejné úvodní sloupce), se nezakládá znovu.
+
+Výsledek: výpis na stdout a <work_dir>/index_advisor.json.
+
+Použití:
+  python index_advisor.py <work_dir> [--apply] [--repeat 3] [--no-timing]
+
+Závislosti: mysql-connector-python (+ závislosti histogram.py / shared_data)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from dbsettings import DB_CONFIG, load_data_json, mysql_connection
+
+# ======= KONFIGURACE =======
+
+INDEX_VERSION_TABLE = "analyzy_index_version"
+REPORT_FILE = "index_advisor.json"
+BASE_TABLES = ("price", "price_stat_i1", "bp", "product")
+
+# (verze, tabulka, název indexu, sloupce) – rovnostní podmínky před rozsahem
+# na date; price navíc s cenou, aby dotazy na ceny nesahaly do řádků tabulky
+INDEX_MIGRATIONS = [
+    (1, "price", "ix_price_product_invalid_date_price", ("product_id", "invalid", "date", "price")),
+    (2, "price_stat_i1", "ix_price_stat_i1_product_date", ("product_id", "date")),
+    (3, "bp", "ix_bp_basket_product", ("basket_id", "product_id")),
+    # okno build_price_stat.py – čtení od watermarku bez průchodu celou historií
+    (4, "price", "ix_price_invalid_date_product_price", ("invalid", "date", "product_id", "price")),
+]
+
+
+# ======= DOTAZY =======
+def analysis_queries(data):
+    """(název, SQL, parametry) všech dotazů analýz pro zadání data.json."""
+    import build_price_stat
+    import desc_stats
+    import histogram
+    import shared_data
+    from prepare_stats import a_desc1_select, a_desc2_select, a_desc3_select
+
+    period_basket = (data['dateFrom'], data['dateTo'], data['basketId'])
+    return [
+        ("prepare_stats a_desc1", a_desc1_select(data), None),
+        ("prepare_stats a_desc2", a_desc2_select(data), None),
+        ("prepare_stats a_desc3", a_desc3_select(data), None),
+        ("prepare_stats[python] košík", desc_stats.BASKET_SQL, (data['basketId'],)),
+        ("prepare_stats[python] denní ceny", desc_stats.DAILY_PRICE_SQL, period_basket),
+        ("prepare_stats[cache] denní statistiky", desc_stats.DAILY_STAT_SQL, period_basket),
+        ("histogram", histogram.SQL, period_basket),
+        ("histogram[stream]", histogram.STREAM_SQL, period_basket),
+        ("histogram[aggregated]", histogram.AGG_SQL, period_basket),
+        ("plot skripty (shared_data)", shared_data.PRICE_STAT_SQL,
+         (data['basketId'], data['dateFrom'], data['dateTo'])),
+        ("build_price_stat (okno od dateTo)", build_price_stat.price_sql(data['dateTo']), (data['dateTo'],)),
+        ("build_price_stat (dny bez ceny)", build_price_stat.orphan_sql(data['dateTo']), (data['dateTo'],)),
+    ]
+
+
+# ======= EXPLAIN / ČASY =======
+def explain(cur, sql, params):
+    """Řádky EXPLAIN a z nich zjištěné problémy (plný průchod, filesort, temporary)."""
+    cur.execute("EXPLAIN " + sql, params)
+    rows = cur.fetchall()
+    plan, issues = [], []
+    for r in rows:
+        table, access, extra = r.get("table"), r.get("type"), r.get("Extra") or ""
+        plan.append({"table": table, "type": access, "key": r.get("key"),
+                     "rows": r.get("rows"), "extra": extra})
+        if access == "ALL" and table in BASE_TABLES:
+            issues.append(f"plný průchod {table} (~{r.get('rows')} řádků)")
+        if "filesort" in extra:
+            issues.append(f"filesort ({table})")
+        if "temporary" in extra:
+            issues.append(f"dočasná tabulka ({table})")
+    return plan, issues
+
+
+def time_query(cur, sql, params, repeat):
+    """Medián času dotazu v ms včetně dočtení výsledku; vrací (ms, počet řádků)."""
+    times = []
+    n = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(sql, params)
+        n = len(cur.fetchall())
+        times.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(times), 1), n
+
+
+def measure(conn, queries, repeat, timing):
+    cur = conn.cursor(dictionary=True)
+    results = {}
+    try:
+        for name, sql, params in queries:
+            plan, issues = explain(cur, sql, params)
+            result = {"issues": issues, "plan": plan}
+            if timing:
+                result["ms"], result["rows"] = time_query(cur, sql, params, repeat)
+            results[name] = result
+    finally:
+        cur.close()
+    return results
+
+
+# ======= INDEXY =======
+def existing_indexes(cur, table):
+    """{název indexu: [sloupce v pořadí]} tabulky v aktuálním schématu."""
+    cur.execute(
+        "SELECT index_name, column_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s "
+        "ORDER BY index_name, seq_in_index", (table,))
+    indexes = {}
+    for index_name, column_name in cur.fetchall():
+        indexes.setdefault(index_name, []).append(column_name.lower())
+    return indexes
+
+
+def covering_index(indexes, columns):
+    """Název existujícího indexu, který začíná stejnými sloupci, nebo None."""
+    for name, cols in indexes.items():
+        if tuple(cols[:len(columns)]) == tuple(columns):
+            return name
+    return None
+
+
+def applied_versions(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {INDEX_VERSION_TABLE} (
+            version INT PRIMARY KEY,
+            table_name VARCHAR(64) NOT NULL,
+            index_name VARCHAR(64) NOT NULL,
+            note VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""")
+    cur.execute(f"SELECT version FROM {INDEX_VERSION_TABLE}")
+    return {v for (v,) in cur.fetchall()}
+
+
+def apply_migrations(conn):
+    """Založí chybějící indexy z INDEX_MIGRATIONS; vrací seznam provedených kroků."""
+    cur = conn.cursor()
+    steps = []
+    try:
+        done = applied_versions(cur)
+        for version, table, index_name, columns in INDEX_MIGRATIONS:
+            if version in done:
+                continue
+            covered_by = covering_index(existing_indexes(cur, table), columns)
+            if covered_by:
+                note = f"pokryto existujícím indexem {covered_by}"
+                print(f"  v{version} {table}: {note}")
+            else:
+                print(f"  v{version} {table}: zakládám {index_name} ({', '.join(columns)}) …")
+                started = time.perf_counter()
+                cur.execute(f"ALTER TABLE {table} ADD INDEX {index_name} ({', '.join(columns)}), "
+                            f"ALGORITHM=INPLACE, LOCK=NONE")
+                note = f"založen za {time.perf_counter() - started:.1f} s"
+            cur.execute(f"INSERT INTO {INDEX_VERSION_TABLE} (version, table_name, index_name, note) "
+                        f"VALUES (%s, %s, %s, %s)", (version, table, covered_by or index_name, note))
+            conn.commit()
+            steps.append({"version": version, "table": table, "index": covered_by or index_name, "note": note})
+        if steps:
+            cur.execute(f"ANALYZE TABLE {', '.join(BASE_TABLES)}")
+            cur.fetchall()
+    finally:
+        cur.close()
+    return steps
+
+
+def index_sizes(conn):
+    """Velikost indexů hlídaných tabulek v MB (mysql.innodb_index_stats), nebo None."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT table_name, index_name, stat_value * @@innodb_page_size / 1048576 "
+            "FROM mysql.innodb_index_stats "
+            f"WHERE database_name = %s AND stat_name = 'size' AND table_name IN ({', '.join(['%s'] * len(BASE_TABLES))})",
+            (DB_CONFIG["database"], *BASE_TABLES))
+        return {f"{t}.{i}": round(float(mb), 1) for t, i, mb in cur.fetchall()}
+    except Exception as e:
+        print(f"Velikost indexů nezjištěna: {e}")
+        return None
+    finally:
+        cur.close()
+
+
+# ======= VÝPIS =======
+def print_results(title, results):
+    print(f"\n{title}")
+    for name, r in results.items():
+        ms = f"{r['ms']:9.1f} ms" if "ms" in r else ""
+        print(f"  {name:40s}{ms}  {'; '.join(r['issues']) or 'OK'}")
+
+
+def print_comparison(before, after):
+    print("\nPorovnání (medián):")
+    for name in before:
+        b, a = before[name].get("ms"), after[name].get("ms")
+        if b is None or a is None:
+            continue
+        ratio = f"×{b / a:.1f}" if a else ""
+        print(f"  {name:40s}{b:9.1f} → {a:9.1f} ms  {ratio}")
+
+
+# ======= HLAVNÍ =======
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN a indexy pro dotazy analýz.")
+    parser.add_argument("work_dir")
+    parser.add_argument("--apply", action="store_true", help="založit chybějící indexy a změřit znovu")
+    parser.add_argument("--repeat", type=int, default=3, help="počet běhů každého dotazu pro medián")
+    parser.add_argument("--no-timing", action="store_true", help="jen EXPLAIN, dotazy nespouštět")
+    args = parser.parse_args()
+
+    json_path = os.path.join(args.work_dir, "data.json")
+    if not os.path.exists(json_path):
+        print(f"Chyba: Soubor {json_path} neexistuje.")
+        sys.exit(1)
+    data = load_data_json(json_path, {})
+
+    queries = analysis_queries(data)
+    timing = not args.no_timing
+    conn = mysql_connection()
+    report = {"data": {k: data.get(k) for k in ("basketId", "dateFrom", "dateTo")}}
+    try:
+        print(f"Analyzuji {len(queries)} dotazů …")
+        report["before"] = measure(conn, queries, args.repeat, timing)
+        report["index_sizes_before"] = index_sizes(conn)
+        print_results("Současný stav:", report["before"])
+
+        if args.apply:
+            print("\nIndexy:")
+            report["migrations"] = apply_migrations(conn)
+            if not report["migrations"]:
+                print("  vše již použito")
+            report["after"] = measure(conn, queries, args.repeat, timing)
+            report["index_sizes_after"] = index_sizes(conn)
+            print_results("Po doplnění indexů:", report["after"])
+            if timing:
+                print_comparison(report["before"], report["after"])
+    finally:
+        conn.close()
+
+    sizes = report.get("index_sizes_after") or report.get("index_sizes_before")
+    if sizes:
+        print("\nVelikost indexů:")
+        for name, mb in sorted(sizes.items()):
+            print(f"  {name:55s}{mb:9.1f} MB")
+
+    out_path = os.path.join(args.work_dir, REPORT_FILE)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"Uloženo: {out_path}")
+    print("Hotovo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lokální sloupcová kopie tabulek price, price_stat_i1, product a bp.
+
+Tabulky s datem (price, price_stat_i1) se ukládají jako Parquet po měsících
+(<mirror>/<tabulka>/YYYY-MM.parquet, uvnitř seřazené podle product_id, date).
+Synchronizace je inkrementální podle watermarku max(date) z minulého běhu
+(<mirror>/_mirror_state.json): starší měsíce zůstávají, znovu se stáhnou jen
+měsíce od watermarku minus --lookback dní (dokončený import posledních dní,
+přepočet build_price_stat.py) a nové měsíce se připíšou. Změny ve starších
+měsících se přenesou jen s --since / --full. Soubory měsíců v přepisovaném
+rozsahu (s --full všech), které běh nezapsal, se smažou – jejich data už
+v DB nejsou (např. po promazání staré historie).
+
+product a bp jsou malé – stahují se pokaždé celé (<mirror>/<tabulka>/data.parquet).
+
+Soubory se zapisují přes tmp + os.replace, takže běžící analýza nikdy nečte
+rozepsaný soubor. Kopii čte backend duckdb v dbsettings
+(ANALYZY_DB_BACKEND=duckdb, viz duckdb_backend.py).
+
+Čte se vždy z MySQL (dbsettings.DB_CONFIG / ANALYZY_DB_*), bez ohledu na backend.
+
+Použití:
+  python local_mirror.py [--dir common/mirror] [--tables price,bp] [--lookback 1]
+                         [--since 2025-01-01] [--full]
+
+Závislosti: mysql-connector-python, numpy, pyarrow
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from dbsettings import MIRROR_DIR, mysql_connection
+from stream_fetch import iter_chunks
+
+# ======= KONFIGURACE =======
+
+STATE_FILE = "_mirror_state.json"
+DEFAULT_LOOKBACK_DAYS = 1
+ROW_GROUP_SIZE = 100_000     # menší skupiny řádků = lepší přeskakování podle min/max statistik
+
+# tabulka: ([(sloupec, dtype při čtení, typ v Parquetu)], sloupec s datem nebo None)
+# NULL se při čtení u float převede na NaN a při zápisu zpět na null
+MIRROR_TABLES = {
+    "price": ([
+        ("product_id", "int64", "int64"),
+        ("date", "datetime64[D]", "date32"),
+        ("price", "float64", "float64"),
+        ("invalid", "float64", "int8"),
+    ], "date"),
+    "price_stat_i1": ([
+        ("product_id", "int64", "int64"),
+        ("date", "datetime64[D]", "date32"),
+        ("seller_count", "float64", "int64"),
+        ("min_price", "float64", "float64"),
+        ("mode_price", "float64", "float64"),
+        ("avg_price", "float64", "float64"),
+        ("on_par", "float64", "float64"),
+        ("diB", "float64", "float64"),
+    ], "date"),
+    "product": ([
+        ("id", "int64", "int64"),
+        ("name", "object", "string"),
+        ("brand", "object", "string"),
+        ("category", "object", "string"),
+    ], None),
+    "bp": ([
+        ("basket_id", "int64", "int64"),
+        ("product_id", "int64", "int64"),
+    ], None),
+}
+
+
+# ======= POMOCNÉ =======
+def table_glob(mirror_dir, table):
+    """Vzor souborů tabulky v kopii (pro read_parquet)."""
+    return os.path.join(mirror_dir, table, "*.parquet")
+
+
+def read_state(mirror_dir):
+    path = os.path.join(mirror_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_state(mirror_dir, state):
+    path = os.path.join(mirror_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def write_parquet(path, columns, spec):
+    """Sloupce {název: np.ndarray} → Parquet (přes tmp soubor, atomicky)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.table({
+        name: pa.array(columns[name], from_pandas=True).cast(arrow_type)
+        for name, _, arrow_type in spec
+    })
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".tmp", compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(path + ".tmp", path)
+    return table.num_rows
+
+
+def fetch_all(sql, params, spec):
+    """Výsledek dotazu jako {sloupec: np.ndarray} (čte se blokově z MySQL)."""
+    columns = [(name, dtype) for name, dtype, _ in spec]
+    parts = list(iter_chunks(sql, params, columns, connect=mysql_connection))
+    if not parts:
+        return {name: np.array([], dtype=dtype) for name, dtype in columns}
+    return {name: np.concatenate([p[name] for p in parts]) for name, _ in columns}
+
+
+def date_range(cur, table, date_col, since):
+    where, params = (f"WHERE {date_col} >= %s", (since,)) if since else ("", None)
+    cur.execute(f"SELECT MIN({date_col}), MAX({date_col}) FROM {table} {where}", params)
+    return cur.fetchone()
+
+
+def remove_stale_months(mirror_dir, table, since, written):
+    """Smaže měsíční soubory od since (None = všechny), které běh nezapsal; vrací jejich počet."""
+    table_dir = os.path.join(mirror_dir, table)
+    if not os.path.isdir(table_dir):
+        return 0
+    first = None if since is None else f"{since:%Y-%m}"
+    removed = 0
+    for name in sorted(os.listdir(table_dir)):
+        month, ext = os.path.splitext(name)
+        if ext != ".parquet" or name in written or (first is not None and month < first):
+            continue
+        os.remove(os.path.join(table_dir, name))
+        removed += 1
+        print(f"  {table} {month}: už není v DB – smazáno")
+    return removed
+
+
+# ======= SYNCHRONIZACE =======
+def sync_snapshot(mirror_dir, table, spec):
+    """Malá tabulka celá do <tabulka>/data.parquet."""
+    cols = fetch_all(f"SELECT {', '.join(name for name, _, _ in spec)} FROM {table}", None, spec)
+    path = os.path.join(mirror_dir, table, "data.parquet")
+    rows = write_parquet(path, cols, spec)
+    print(f"  {table}: {rows} řádků → {path}")
+    return {"rows": rows}
+
+
+def sync_dated(mirror_dir, table, spec, date_col, since):
+    """Měsíce od since (None = vše) znovu stáhne a přepíše, ostatní v rozsahu smaže; vrací stav tabulky."""
+    conn = mysql_connection()
+    try:
+        cur = conn.cursor()
+        first, last = date_range(cur, table, date_col, since)
+        cur.close()
+    finally:
+        conn.close()
+    if last is None:
+        print(f"  {table}: {f'od {since} ' if since else ''}žádná data")
+        remove_stale_months(mirror_dir, table, since, set())
+        return None
+
+    select = (f"SELECT {', '.join(name for name, _, _ in spec)} FROM {table} "
+              f"WHERE {date_col} >= %s AND {date_col} < %s")
+    rows_total = 0
+    written = set()
+    for month in np.arange(np.datetime64(first, "M"), np.datetime64(last, "M") + 1):
+        start, end = str(month.astype("datetime64[D]")), str((month + 1).astype("datetime64[D]"))
+        cols = fetch_all(select, (start, end), spec)
+        if len(cols[date_col]) == 0:
+            continue
+        path = os.path.join(mirror_dir, table, f"{month}.parquet")
+        order = np.lexsort((cols[date_col], cols["product_id"]))
+        rows = write_parquet(path, {name: arr[order] for name, arr in cols.items()}, spec)
+        written.add(os.path.basename(path))
+        rows_total += rows
+        print(f"  {table} {month}: {rows} řádků")
+    remove_stale_months(mirror_dir, table, since, written)
+    return {"max_date": str(last), "rows": rows_total}
+
+
+def sync(mirror_dir, tables, lookback, since=None, full=False):
+    """Synchronizuje vybrané tabulky a uloží nový stav (watermarky)."""
+    os.makedirs(mirror_dir, exist_ok=True)
+    state = read_state(mirror_dir)
+    for table in tables:
+        spec, date_col = MIRROR_TABLES[table]
+        started = time.perf_counter()
+        if date_col is None:
+            print(f"Synchronizuji {table} (celá tabulka) …")
+            result = sync_snapshot(mirror_dir, table, spec)
+        else:
+            watermark = state.get(table, {}).get("max_date")
+            if full:
+                table_since = None
+            elif since:
+                table_since = since
+            elif watermark:
+                table_since = date.fromisoformat(watermark) - timedelta(days=lookback)
+            else:
+                table_since = None
+            # měsíc se přepisuje vždy celý
+            if table_since is not None:
+                table_since = table_since.replace(day=1)
+            print(f"Synchronizuji {table} {'celou' if table_since is None else f'od {table_since}'} "
+                  f"(watermark: {watermark or 'žádný'}) …")
+            result = sync_dated(mirror_dir, table, spec, date_col, table_since)
+            if result is None:
+                continue
+            if watermark and not full:
+                result["max_date"] = max(result["max_date"], watermark)
+        result["synced_at"] = datetime.now().isoformat(timespec="seconds")
+        result["seconds"] = round(time.perf_counter() - started, 1)
+        state[table] = result
+        write_state(mirror_dir, state)
+    return state
+
+
+# ======= HLAVNÍ =======
+def main():
+    parser = argparse.ArgumentParser(description="Lokální Parquet kopie tabulek pro analýzy.")
+    parser.add_argument("--dir", default=MIRROR_DIR, help="adresář kopie (výchozí ANALYZY_MIRROR_DIR / common/mirror)")
+    parser.add_argument("--tables", default=",".join(MIRROR_TABLES), help="tabulky oddělené čárkou")
+    parser.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK_DAYS,
+                        help="kolik dní před watermarkem stáhnout znovu")
+    parser.add_argument("--since", type=date.fromisoformat, help="stáhnout znovu od tohoto dne (YYYY-MM-DD)")
+    parser.add_argument("--full", action="store_true", help="stáhnout vše znovu")
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = [t for t in tables if t not in MIRROR_TABLES]
+    if unknown:
+        parser.error(f"neznámé tabulky: {', '.join(unknown)} (povolené: {', '.join(MIRROR_TABLES)})")
+
+    sync(args.dir, tables, args.lookback, args.since, args.full)
+    print(f"Uloženo: {args.dir}")
+    print("Hotovo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -39,22 +39,37 @@ try {
   process.exit(1);
 }
 
+// Tabulka se statistikami z prepare_stats.py – pojmenovaná podle výsledku
+// (a_desc_<resultId>), bez resultId (ruční spuštění) globální a_desc
+const statsTable = data.resultId != null ? `a_desc_${Number.parseInt(data.resultId, 10)}` : 'a_desc';
+
+// Statistiky spočtené v Pythonu (statsEngine "python" nebo statsCache) jsou
+// místo tabulky v souboru pracovního adresáře
+const statsFile = path.join(workingDir, 'a_desc.json');
+
 // --- Databázové funkce ---
 
+// Jeden pool pro všechny dotazy skriptu – připojení se naváže jen jednou
+const pool = mysql.createPool({
+    host: DB_HOST, user: DB_USER, password: DB_PASSWORD, database: DB_NAME,
+    connectionLimit: 2,
+});
+
 async function fetchProducts() {
-    const conn = await mysql.createConnection({
-        host: DB_HOST, user: DB_USER, password: DB_PASSWORD, database: DB_NAME,
-    });
+    if (fs.existsSync(statsFile)) {
+        console.log(`Statistiky ze souboru ${statsFile}`);
+        return JSON.parse(fs.readFileSync(statsFile, 'utf-8'));
+    }
 
     // Uprav si SELECT tak, aby obsahoval všechny sloupce, které chceš v souhrnné tabulce + „hezké“ názvy
-    const [rows] = await conn.execute(`
+    const [rows] = await pool.execute(`
 
     select *
-    from a_desc
+    from ${statsTable}
     
     ORDER BY id
   `);
-    await conn.end();
+    // tabulku výsledku maže až runAnalysis po posledním kroku workflow
     return rows;
 }
 
@@ -62,12 +77,8 @@ async function fetchProducts() {
 
 async function fetchAdditionalData() {
     
-  const conn = await mysql.createConnection({
-    host: DB_HOST, user: DB_USER, password: DB_PASSWORD, database: DB_NAME,
-  });
-
   // Zde můžete přidat další dotazy podle potřeby
-  const [statisticsRows] = await conn.execute(`
+  const [statisticsRows] = await pool.execute(`
             
         SELECT 
             COUNT(CASE WHEN price.invalid = 0 THEN 1 END) AS priceCount,
@@ -81,7 +92,6 @@ async function fetchAdditionalData() {
         WHERE bp.basket_id = ${data.basketId} AND price.date BETWEEN '${data.dateFrom}' AND '${data.dateTo}';
   `);
 
-  await conn.end();
   return statisticsRows[0];
 }
 
@@ -132,6 +142,8 @@ async function main() {
   } catch (error) {
     console.error('Kritická chyba:', error.message);
     process.exit(1);
+  } finally {
+    await pool.end();
   }
 }
 
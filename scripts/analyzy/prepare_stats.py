@@ -5,15 +5,27 @@
 Provede sekvenci SQL dotazů pro přípravu statistik.
 SQL dotazy jsou definované přímo v poli SQL_QUERIES.
 
-Závislosti: mysql-connector-python
+S data.json "statsEngine": "python" se a_desc místo toho spočítá v Pythonu:
+z DB se jednou načtou řádky price_stat_i1 košíku (sdílený řez shared_data,
+stejný jako pro grafy) a mapy cena → počet za den z price, medián, modus atd.
+se dopočítají na pracovním stroji. Výsledek se zapíše do <work_dir>/a_desc.json,
+odkud ho čte prepareOutput.js – na DB serveru se nevytváří žádné tabulky.
+Tak se počítá i s lokální kopií DB (ANALYZY_DB_BACKEND=duckdb).
+
+S "priceStore": true (opět Python výpočet) se mapy cen berou z memmap
+úložiště (price_store.py) místo dotazu přes bp a price; "statsCache" má přednost.
+
+S "statsCache": true se denní agregáty berou z cache (desc_cache) a z DB se
+čtou jen dny, které v cache ještě nejsou (výsledek opět do a_desc.json).
+
+Závislosti: mysql-connector-python (+ numpy, pandas pro statsEngine "python")
 """
 
 import os
 import sys
 
-import mysql.connector
-
-from dbsettings import get_connection, load_data_json
+from dbsettings import DB_BACKEND, get_connection, load_data_json, stats_table
+from timings import span
 
 # ======= KONFIGURACE =======
 
@@ -22,56 +34,15 @@ data = {}
 
 SQL_QUERIES = []  # globální prázdné pole
 
-def execute_sql_queries():
-
-    """Provede všechny SQL dotazy ze sekvence jeden po druhém."""
-    global SQL_QUERIES
-    
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    try:
-        for i, query in enumerate(SQL_QUERIES, 1):
-            print(f"Provádím dotaz {i}/{len(SQL_QUERIES)}: {query[:80]}...")
-            cursor.execute(query)
-            print(f"  → Ovlivněno {cursor.rowcount} řádků")
-            
-            # Commit po každém dotazu pro zajištění sekvenčního provádění
-            conn.commit()
-            
-    except mysql.connector.Error as e:
-        print(f"Chyba při provádění SQL dotazu {i}: {e}")
-        conn.rollback()
-        raise
-    finally:
-        cursor.close()
-        conn.close()
+# Sdílená cache denních agregátů (relativně k work_dir = results/<id>)
+STATS_CACHE_DIR = "../../common/cache/desc_stats"
 
+STATS_ENGINES = ("sql", "python")
+STATS_FILE = "a_desc.json"   # výstup Python výpočtu, čte ho prepareOutput.js
 
-def main():
-    global data
-    
-    # Vyžadujeme povinný parametr work_dir
-    if len(sys.argv) != 2:
-        print("Použití: python prepare_stats.py <work_dir>")
-        sys.exit(1)
-    
-    work_dir = sys.argv[1]
-    json_path = os.path.join(work_dir, "data.json")
-    
-    # data.json musí existovat
-    if not os.path.exists(json_path):
-        print(f"Chyba: Soubor {json_path} neexistuje.")
-        sys.exit(1)
-    
-    # Načteme konfiguraci pomocí funkce z dbsettings
-    default_values = {}  # Zatím žádné defaultní hodnoty
-    data = load_data_json(json_path, default_values)
-    # Sekvence SQL dotazů k provedení
-    global SQL_QUERIES
-    SQL_QUERIES = [
-        """DROP TABLE IF EXISTS a_desc1""",
-        f""" create table a_desc1 as
+def a_desc1_select(data):
+    """SELECT pro a_desc1 (N, Nmin, Nmax, Pmin, Pmax, Pmode) z price_stat_i1."""
+    return f"""
             select product.id,product.name, sum(price_stat_i1.seller_count) N,
             min(price_stat_i1.seller_count) Nmin,
             max(price_stat_i1.seller_count) Nmax,
@@ -83,11 +54,28 @@ def main():
             join product on product.id=price_stat_i1.product_id
             where price_stat_i1.date BETWEEN '{data['dateFrom']}' and '{data['dateTo']}'
             group by product.id
-        """,
-        """DROP TABLE IF EXISTS a_desc2""",
-        f"""
-        CREATE TABLE a_desc2
-            WITH RECURSIVE
+        """
+
+def a_desc3_select(data):
+    """SELECT pro a_desc3 (determ) z price_stat_i1."""
+    return f"""
+            select product.id,
+            if(sum(price_stat_i1.dib>1)>0, log(sum(price_stat_i1.dib>1)/count(*))+1,'-' ) determ
+            from price_stat_i1
+            join bp on bp.basket_id={data['basketId']} and bp.product_id=price_stat_i1.product_id
+            join product on product.id=price_stat_i1.product_id
+            where price_stat_i1.date BETWEEN '{data['dateFrom']}' and '{data['dateTo']}'
+            group by product.id
+        """
+
+def a_desc2_select(data):
+    """
+    SELECT pro a_desc2 (Pp, Pmed, Pmode, Nmode, T0) – samostatně, aby ho šlo
+    porovnat se starší verzí (check_a_desc2.py).
+    T0 = počet dní období mínus počet různých dní s aspoň jednou cenou.
+    """
+    return f"""
+            WITH
             -- 1) seznam produktů v košíku
             bp_products AS (
             SELECT DISTINCT bp.product_id
@@ -157,33 +145,12 @@ def main():
             WHERE rnk = 1
             ),
 
-            -- 6) kalendář dní v období
-            date_series AS (
-            SELECT DATE('{data['dateFrom']}') AS d
-            UNION ALL
-            SELECT d + INTERVAL 1 DAY FROM date_series WHERE d < DATE('{data['dateTo']}')
-            ),
-
-            -- 7) přítomnost alespoň jedné ceny v daný den
-            daily_presence AS (
-            SELECT
-                bpp.product_id,
-                ds.d AS date,
-                -- 1 pokud existuje aspoň jedna cena toho dne, jinak 0
-                CASE WHEN EXISTS (
-                SELECT 1 FROM prices p
-                WHERE p.product_id = bpp.product_id AND p.date = ds.d
-                ) THEN 1 ELSE 0 END AS has_price
-            FROM bp_products bpp
-            CROSS JOIN date_series ds
-            ),
-
-            -- 8) počet dní bez ceny
-            missing_days AS (
+            -- 6) počet dní s alespoň jednou cenou (bez kalendáře a EXISTS na každý den)
+            price_days AS (
             SELECT
                 product_id,
-                SUM(CASE WHEN has_price = 0 THEN 1 ELSE 0 END) AS days_without_price
-            FROM daily_presence
+                COUNT(DISTINCT date) AS days_with_price
+            FROM prices
             GROUP BY product_id
             )
 
@@ -194,35 +161,154 @@ def main():
             ROUND(med.median_price, 2)                             AS Pmed,
             ROUND(mo.mode_price, 2)                                AS Pmode,
             mo.mode_count Nmode,
-            md.days_without_price T0
+            DATEDIFF('{data['dateTo']}', '{data['dateFrom']}') + 1
+                - COALESCE(pd.days_with_price, 0)                  AS T0
             FROM bp_products bpp
             LEFT JOIN avg_stats    a   USING (product_id)
             LEFT JOIN median_stats med USING (product_id)
             LEFT JOIN mode_stats   mo  USING (product_id)
-            LEFT JOIN missing_days md  USING (product_id)
-            ORDER BY bpp.product_id;
+            LEFT JOIN price_days   pd  USING (product_id)
+            ORDER BY bpp.product_id
+    """
 
-        """,
-        """DROP TABLE IF EXISTS a_desc3""",
-        f"""                    
-            CREATE TABLE a_desc3 as
-            select product.id,
-            if(sum(price_stat_i1.dib>1)>0, log(sum(price_stat_i1.dib>1)/count(*))+1,'-' ) determ
-            from price_stat_i1
-            join bp on bp.basket_id={data['basketId']} and bp.product_id=price_stat_i1.product_id
-            join product on product.id=price_stat_i1.product_id
-            where price_stat_i1.date BETWEEN '{data['dateFrom']}' and '{data['dateTo']}'
-            group by product.id
-        """ ,
-        """DROP TABLE IF EXISTS a_desc""",
-        """          
-            CREATE TABLE a_desc AS
-            SELECT a_desc1.*, a_desc2.Pp,a_desc2.Pmed,a_desc2.Pmode PmodeAll, a_desc2.Nmode, a_desc2.T0
-            , a_desc3.determ
-            FROM a_desc1
-            JOIN a_desc2 ON a_desc1.id=a_desc2.id
-            JOIN a_desc3 ON a_desc1.id=a_desc3.id"""     
+
+def execute_sql_queries():
+
+    """Provede všechny SQL dotazy ze sekvence jeden po druhém."""
+    import mysql.connector
+    global SQL_QUERIES
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    try:
+        for i, query in enumerate(SQL_QUERIES, 1):
+            print(f"Provádím dotaz {i}/{len(SQL_QUERIES)}: {query[:80]}...")
+            with span("execute", query=i) as s:
+                cursor.execute(query)
+                s["rows"] = cursor.rowcount
+            print(f"  → Ovlivněno {cursor.rowcount} řádků")
+            
+            # Commit po každém dotazu pro zajištění sekvenčního provádění
+            conn.commit()
+            
+    except mysql.connector.Error as e:
+        print(f"Chyba při provádění SQL dotazu {i}: {e}")
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def load_daily_extract(work_dir, products):
+    """
+    Denní agregáty (stat, prices) jedním řezem z DB, bez cache; ceny případně
+    z úložiště cen. Oba řezy se sdílí přes <work_dir>/cache (shared_data).
+    """
+    from desc_stats import stat_from_frame
+    from shared_data import load_daily_prices, load_price_stats
+    stat = stat_from_frame(load_price_stats(work_dir, data))
+    if data['priceStore']:
+        from price_store import daily_prices, load_prices
+        prices = daily_prices(load_prices(work_dir, data, products["id"].to_numpy()))
+    else:
+        prices = load_daily_prices(work_dir, data)
+    return stat, prices
+
+
+def load_daily_cached(work_dir, products):
+    """Denní agregáty z cache – z DB se dočtou jen chybějící dny."""
+    from desc_cache import load_daily
+    cache_dir = os.path.normpath(os.path.join(work_dir, data['statsCacheDir'] or STATS_CACHE_DIR))
+    return load_daily(
+        data['basketId'], products["id"], data['dateFrom'], data['dateTo'],
+        cache_dir, refresh=data['statsCacheRefresh'],
+    )
+
+
+def run_python_stats(work_dir):
+    """a_desc spočtené v Pythonu do <work_dir>/a_desc.json (numpy/pandas až tady)."""
+    from desc_stats import derive_desc, fetch_basket_products, save_desc_json
+    products = fetch_basket_products(data['basketId'])
+    if data['statsCache']:
+        stat, prices = load_daily_cached(work_dir, products)
+    else:
+        stat, prices = load_daily_extract(work_dir, products)
+    with span("transform", what="a_desc", products=len(products)):
+        desc = derive_desc(products, stat, prices, data['dateFrom'], data['dateTo'])
+    save_desc_json(desc, os.path.join(work_dir, STATS_FILE))
+
+
+def main():
+    global data
+    
+    # Vyžadujeme povinný parametr work_dir
+    if len(sys.argv) != 2:
+        print("Použití: python prepare_stats.py <work_dir>")
+        sys.exit(1)
+    
+    work_dir = sys.argv[1]
+    json_path = os.path.join(work_dir, "data.json")
+    
+    # data.json musí existovat
+    if not os.path.exists(json_path):
+        print(f"Chyba: Soubor {json_path} neexistuje.")
+        sys.exit(1)
+    
+    # Načteme konfiguraci pomocí funkce z dbsettings
+    default_values = {
+        'statsEngine': 'sql',
+        'statsCache': False,
+        'statsCacheDir': None,
+        'statsCacheRefresh': False,
+        'priceStore': False
+    }
+    data = load_data_json(json_path, default_values)
+
+    if data['statsEngine'] not in STATS_ENGINES:
+        print(f"Chyba: neznámý statsEngine '{data['statsEngine']}' (povolené: {', '.join(STATS_ENGINES)}).")
+        sys.exit(1)
+
+    if DB_BACKEND == "duckdb" and data['statsEngine'] == 'sql':
+        # lokální kopie je jen pro čtení – tabulky a_desc_* nemá kam založit
+        print("Lokální kopie DB (ANALYZY_DB_BACKEND=duckdb): a_desc počítám v Pythonu.")
+        data['statsEngine'] = 'python'
+
+    if data['statsEngine'] == 'python' or data['statsCache'] or data['priceStore']:
+        source = ("cache denních agregátů" if data['statsCache'] else
+                  "úložiště cen" if data['priceStore'] else "jednoho řezu z DB")
+        print(f"Počítám statistiky v Pythonu z {source} …")
+        run_python_stats(work_dir)
+        print("Hotovo.")
+        return
+
+    # Tabulky jsou pojmenované podle výsledku (a_desc_<resultId>), aby šlo
+    # pouštět víc analýz souběžně.
+    t_desc = stats_table(data)
+    t_desc1, t_desc2, t_desc3 = (stats_table(data, f"a_desc{i}") for i in (1, 2, 3))
+
+    # Sekvence SQL dotazů k provedení
+    global SQL_QUERIES
+    SQL_QUERIES = [
+        f"""DROP TABLE IF EXISTS {t_desc1}""",
+        f"create table {t_desc1} as\n" + a_desc1_select(data),
+        f"""DROP TABLE IF EXISTS {t_desc2}""",
+        f"CREATE TABLE {t_desc2}\n" + a_desc2_select(data),
+        f"""DROP TABLE IF EXISTS {t_desc3}""",
+        f"CREATE TABLE {t_desc3} as\n" + a_desc3_select(data),
+        f"""DROP TABLE IF EXISTS {t_desc}""",
+        f"""          
+            CREATE TABLE {t_desc} AS
+            SELECT d1.*, d2.Pp,d2.Pmed,d2.Pmode PmodeAll, d2.Nmode, d2.T0
+            , d3.determ
+            FROM {t_desc1} d1
+            JOIN {t_desc2} d2 ON d1.id=d2.id
+            JOIN {t_desc3} d3 ON d1.id=d3.id"""
     ]
+    if t_desc != "a_desc":
+        # mezivýsledky konkrétního výsledku už nikdo číst nebude
+        SQL_QUERIES.append(f"""DROP TABLE IF EXISTS {t_desc1}, {t_desc2}, {t_desc3}""")
 
 
     if not SQL_QUERIES:
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Úložiště platných cen po produktech pro rychlé čtení libovolného košíku.
+
+Z tabulky price (invalid = 0, cena není NULL) se sestaví verze úložiště
+(podadresář v<čas>-<pid>):
+
+  cents.i32     – ceny v haléřích (int32)
+  days.i16      – den jako posun od base_date (int16)
+  products.npy  – seřazená product_id (int64)
+  offsets.npy   – začátky segmentů produktů v cents/days, poslední = počet cen
+  meta.json     – base_date, max_date, počty, čas sestavení
+
+Aktuální verzi určuje symlink "current" v adresáři úložiště. Ceny jednoho
+produktu leží za sebou, seřazené podle (den, cena). Soubory se
+otevírají přes numpy.memmap, takže výběr produktů košíku je jen řez
+segmentu (bez kopie) a binární hledání období – bez SQL joinů přes bp.
+
+Čtou ho histogram.py a prepare_stats.py (statsEngine "python") s data.json
+"priceStore": true; adresář je "priceStoreDir" (relativně k work_dir,
+výchozí ../../common/price_store). Úložiště se sestavuje celé znovu
+(po importu cen, případně z lokální kopie DB – ANALYZY_DB_BACKEND=duckdb)
+do nové verze a zveřejní se atomickým os.replace symlinku. Čtenář odkaz
+přečte jednou a všechny soubory otevře z téže verze; předchozí verze se
+nechává pro čtenáře, kteří ji právě otevírají, starší se mažou.
+
+Použití:
+  python price_store.py [--dir common/price_store]
+
+Závislosti: numpy (+ mysql-connector-python / duckdb pro sestavení)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+
+from dbsettings import get_connection
+from stream_fetch import iter_chunks
+from timings import span
+
+# ======= KONFIGURACE =======
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = "../../common/price_store"   # relativně k work_dir (results/<id>)
+DEFAULT_BUILD_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "..", "..", "common", "price_store"))
+
+CENTS_FILE = "cents.i32"
+DAYS_FILE = "days.i16"
+PRODUCTS_FILE = "products.npy"
+OFFSETS_FILE = "offsets.npy"
+META_FILE = "meta.json"
+CURRENT_LINK = "current"   # symlink na adresář aktuální verze
+
+CENTS_DTYPE = np.dtype("<i4")
+DAYS_DTYPE = np.dtype("<i2")
+
+BUILD_COLUMNS = [("product_id", "int64"), ("date", "datetime64[D]"), ("price_cents", "int64")]
+
+# ======= SQL =======
+
+RANGE_SQL = """
+SELECT MIN(date), MAX(date)
+FROM price
+WHERE invalid = 0 AND price IS NOT NULL
+"""
+
+BUILD_SQL = """
+SELECT product_id, date, ROUND(price * 100) AS price_cents
+FROM price
+WHERE invalid = 0 AND price IS NOT NULL
+ORDER BY product_id, date, price
+"""
+
+
+# ======= SESTAVENÍ =======
+def _date_range():
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(RANGE_SQL)
+        first, last = cur.fetchone()
+        cur.close()
+    finally:
+        conn.close()
+    return first, last
+
+
+def _check_range(cents, offsets):
+    if len(cents) and (cents.min() < np.iinfo(CENTS_DTYPE).min or cents.max() > np.iinfo(CENTS_DTYPE).max):
+        raise ValueError("Cena mimo rozsah int32 haléřů – úložiště cen ji neumí uložit.")
+    if len(offsets) and offsets.max() > np.iinfo(DAYS_DTYPE).max:
+        raise ValueError("Období cen je delší než rozsah int16 dní od base_date.")
+
+
+def _publish(store_dir, version):
+    """Přepne symlink CURRENT_LINK na verzi (atomicky) a smaže verze starší než předchozí."""
+    link = os.path.join(store_dir, CURRENT_LINK)
+    try:
+        previous = os.readlink(link)
+    except OSError:
+        previous = None
+    tmp_link = f"{link}.{os.getpid()}.tmp"
+    if os.path.lexists(tmp_link):
+        os.unlink(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, link)
+
+    for entry in os.scandir(store_dir):
+        if entry.name in (version, previous, CURRENT_LINK) or entry.name.endswith(".tmp"):
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        elif entry.name in (CENTS_FILE, DAYS_FILE, PRODUCTS_FILE, OFFSETS_FILE, META_FILE):
+            os.unlink(entry.path)   # soubory úložiště z doby před verzemi
+
+
+def _write_version(tmp_dir, base, last):
+    """Soubory jedné verze úložiště do tmp_dir; vrací meta."""
+    product_ids, starts = [], []
+    n = 0
+    last_pid = None
+    with open(os.path.join(tmp_dir, CENTS_FILE), "wb") as f_cents, \
+            open(os.path.join(tmp_dir, DAYS_FILE), "wb") as f_days:
+        for chunk in iter_chunks(BUILD_SQL, None, BUILD_COLUMNS):
+            pids, cents = chunk["product_id"], chunk["price_cents"]
+            offsets = (chunk["date"] - base).astype("int64")
+            _check_range(cents, offsets)
+            f_cents.write(cents.astype(CENTS_DTYPE).tobytes())
+            f_days.write(offsets.astype(DAYS_DTYPE).tobytes())
+
+            # začátky produktů v bloku (produkt může pokračovat z minulého bloku)
+            new = np.concatenate(([pids[0] != last_pid], pids[1:] != pids[:-1]))
+            idx = np.flatnonzero(new)
+            product_ids.extend(pids[idx].tolist())
+            starts.extend((idx + n).tolist())
+            n += len(pids)
+            last_pid = pids[-1]
+
+    np.save(os.path.join(tmp_dir, PRODUCTS_FILE), np.array(product_ids, dtype="int64"))
+    np.save(os.path.join(tmp_dir, OFFSETS_FILE), np.array(starts + [n], dtype="int64"))
+    meta = {
+        "base_date": str(base),
+        "max_date": str(last) if last else None,
+        "rows": n,
+        "products": len(product_ids),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def build(store_dir):
+    """Sestaví novou verzi úložiště z tabulky price a zveřejní ji v store_dir; vrací meta."""
+    first, last = _date_range()
+    base = np.datetime64(first or "1970-01-01", "D")
+    version = f"v{datetime.now():%Y%m%dT%H%M%S%f}-{os.getpid()}"
+    tmp_dir = os.path.join(store_dir, version + ".tmp")
+    os.makedirs(tmp_dir)
+    try:
+        meta = _write_version(tmp_dir, base, last)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # zveřejnění – otevřené memmapy čtenářů starých verzí zůstávají platné
+    os.rename(tmp_dir, os.path.join(store_dir, version))
+    _publish(store_dir, version)
+    return meta
+
+
+# ======= ČTENÍ =======
+def store_path(work_dir, data) -> str:
+    return os.path.normpath(os.path.join(work_dir, data.get('priceStoreDir') or STORE_DIR))
+
+
+def current_version(store_dir) -> str:
+    """Adresář aktuální verze úložiště (odkaz CURRENT_LINK přečtený jednou)."""
+    try:
+        version = os.readlink(os.path.join(store_dir, CURRENT_LINK))
+    except OSError:
+        raise FileNotFoundError(f"Úložiště cen {store_dir} neexistuje – nejdřív spusťte price_store.py")
+    return os.path.join(store_dir, version)
+
+
+class PriceStore:
+    """Úložiště otevřené přes memmap; segment()/select() vrací pohledy do souborů."""
+
+    def __init__(self, store_dir):
+        # všechny soubory z jedné verze – přestavba mezi nimi nic nepromíchá
+        self.version_dir = current_version(store_dir)
+        with open(os.path.join(self.version_dir, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.base = np.datetime64(self.meta["base_date"], "D")
+        self.product_ids = np.load(os.path.join(self.version_dir, PRODUCTS_FILE))
+        self.offsets = np.load(os.path.join(self.version_dir, OFFSETS_FILE))
+        if self.meta["rows"]:
+            self.cents = np.memmap(os.path.join(self.version_dir, CENTS_FILE), dtype=CENTS_DTYPE, mode="r")
+            self.days = np.memmap(os.path.join(self.version_dir, DAYS_FILE), dtype=DAYS_DTYPE, mode="r")
+        else:   # prázdný soubor memmap neotevře
+            self.cents = np.array([], dtype=CENTS_DTYPE)
+            self.days = np.array([], dtype=DAYS_DTYPE)
+
+    def segment(self, product_id):
+        """(dny, haléře) jednoho produktu – pohledy do souborů, prázdné pro neznámý produkt."""
+        i = np.searchsorted(self.product_ids, product_id)
+        if i == len(self.product_ids) or self.product_ids[i] != product_id:
+            return self.days[:0], self.cents[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.days[start:end], self.cents[start:end]
+
+    def _day(self, value, default):
+        if value is None:
+            return default
+        offset = int((np.datetime64(value, "D") - self.base).astype("int64"))
+        return min(max(offset, np.iinfo(DAYS_DTYPE).min), np.iinfo(DAYS_DTYPE).max)
+
+    def select(self, product_ids, date_from=None, date_to=None) -> dict:
+        """
+        Ceny produktů za období [date_from, date_to] jako
+        {product_id, date, price_cents}, seřazené podle (produkt, den, cena).
+        """
+        lo = self._day(date_from, np.iinfo(DAYS_DTYPE).min)
+        hi = self._day(date_to, np.iinfo(DAYS_DTYPE).max)
+        pids, days, cents = [], [], []
+        for pid in np.unique(np.asarray(product_ids, dtype="int64")):
+            d, c = self.segment(pid)
+            a, b = np.searchsorted(d, lo, side="left"), np.searchsorted(d, hi, side="right")
+            if b > a:
+                pids.append(np.full(b - a, pid, dtype="int64"))
+                days.append(d[a:b])
+                cents.append(c[a:b])
+        if not pids:
+            return {"product_id": np.array([], dtype="int64"),
+                    "date": np.array([], dtype="datetime64[D]"),
+                    "price_cents": np.array([], dtype="int64")}
+        return {
+            "product_id": np.concatenate(pids),
+            "date": self.base + np.concatenate(days).astype("int64"),
+            "price_cents": np.concatenate(cents).astype("int64"),
+        }
+
+    def warn_if_stale(self, date_to):
+        max_date = self.meta.get("max_date")
+        if max_date and str(date_to) > max_date:
+            print(f"Pozor: úložiště cen končí {max_date} – pozdější ceny v něm nejsou "
+                  f"(sestaveno {self.meta['built_at']}, přestavte ho price_store.py).")
+
+
+def load_prices(work_dir, data, product_ids) -> dict:
+    """Ceny košíku za období z data.json (viz PriceStore.select)."""
+    with span("price_store") as s:
+        store = PriceStore(store_path(work_dir, data))
+        store.warn_if_stale(data['dateTo'])
+        cols = store.select(product_ids, data['dateFrom'], data['dateTo'])
+        s["products"], s["rows"] = len(np.unique(product_ids)), len(cols["product_id"])
+    return cols
+
+
+def daily_prices(cols) -> dict:
+    """Mapy cena → počet za (produkt, den) ve tvaru desc_stats.PRICE_COLUMNS."""
+    pid, day, cents = cols["product_id"], cols["date"], cols["price_cents"]
+    if len(pid) == 0:
+        return {"product_id": pid, "day": day, "price_cents": cents, "cnt": np.array([], dtype="int64")}
+    # data jsou seřazená podle (produkt, den, cena) → stačí najít běhy
+    runs = np.flatnonzero(np.concatenate((
+        [True], (pid[1:] != pid[:-1]) | (day[1:] != day[:-1]) | (cents[1:] != cents[:-1])
+    )))
+    return {
+        "product_id": pid[runs],
+        "day": day[runs],
+        "price_cents": cents[runs],
+        "cnt": np.diff(np.concatenate((runs, [len(pid)]))),
+    }
+
+
+# ======= HLAVNÍ =======
+def main():
+    parser = argparse.ArgumentParser(description="Sestaví úložiště cen po produktech (memmap).")
+    parser.add_argument("--dir", default=DEFAULT_BUILD_DIR, help="cílový adresář (výchozí common/price_store)")
+    args = parser.parse_args()
+
+    print("Sestavuji úložiště cen …")
+    started = time.perf_counter()
+    meta = build(args.dir)
+    print(f"{meta['rows']} cen, {meta['products']} produktů, {meta['base_date']} až {meta['max_date']} "
+          f"({time.perf_counter() - started:.1f} s)")
+    print(f"Uloženo: {args.dir}")
+    print("Hotovo.")
+
+
+if __name__ == "__main__":
+    main()
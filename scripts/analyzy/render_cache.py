@@ -0,0 +1,203 @@
+# render_cache.py
+"""
+Sdílená cache vykreslených grafů (data.json "renderCache": true).
+
+Klíč grafu je SHA-256 ze vstupu vykreslení – celé úlohy kromě cílové cesty
+(titulek s produktem a obdobím, řady / ceny, histBins …), z metriky (modul
+a název render funkce), přípony výstupu, kódování obrázku (dpi, komprese –
+image_output.image_settings) a ze zdrojového kódu, který graf kreslí
+(skript metriky + RENDER_SOURCES) a verze matplotlibu. Stejný klíč = stejný
+obrázek, takže se do img/ nového výsledku jen připojí hardlinkem (na jiném
+svazku kopií) místo nového vykreslení – i s PNG pro report u "svg" / "webp".
+Pro "pdf" / "atlas" se z cache čtou přímo bajty PNG.
+
+Cache leží ve společné složce (výchozí ../../common/cache/render vůči
+work_dir, data.json "renderCacheDir"), soubory <klíč[:2]>/<klíč>.<přípona>.
+Velikost hlídá LRU podle mtime (zásah cache mtime obnoví): po běhu se nad
+"renderCacheMaxMb" (výchozí 1024) mažou nejdéle nepoužité grafy.
+
+Výsledky sdílejí s cache inode – obrázky ve výsledku se nemají upravovat
+na místě (přepsání novým souborem je v pořádku).
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+
+from image_output import output_files
+
+# ======= KONFIGURACE =======
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RENDER_CACHE_DIR = "../../common/cache/render"   # vůči work_dir jako statsCacheDir
+RENDER_CACHE_MAX_MB = 1024
+EVICT_TO = 0.9            # po překročení limitu uklidit na 90 % (ne při každém běhu)
+RENDER_CACHE_VERSION = 3  # zvýšit při změně tvaru klíče
+
+# společný kód vykreslení (figura, decimace řad, ukládání a kódování obrázků)
+# – jeho změna zneplatní všechny grafy
+RENDER_SOURCES = ("series_renderer.py", "startup.py", "image_output.py", "downsample.py")
+
+
+# ======= KLÍČ =======
+def _feed(h, obj):
+    """Deterministicky přidá obsah úlohy do hashe; nepodporovaný typ → TypeError."""
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        h.update(repr((type(obj).__name__, obj)).encode())
+    elif isinstance(obj, (tuple, list)):
+        h.update(b"(%d" % len(obj))
+        for item in obj:
+            _feed(h, item)
+        h.update(b")")
+    elif hasattr(obj, "columns") and hasattr(obj, "to_numpy"):       # DataFrame
+        h.update(b"df")
+        _feed(h, [str(c) for c in obj.columns])
+        for col in obj.columns:
+            _feed(h, obj[col].to_numpy())
+    elif hasattr(obj, "to_numpy"):                                   # Series
+        h.update(b"series")
+        _feed(h, str(obj.name))
+        _feed(h, obj.to_numpy())
+    elif hasattr(obj, "dtype") and hasattr(obj, "shape"):
+        import numpy as np
+        if obj.shape == ():                                          # numpy skalár
+            _feed(h, obj.item())
+            return
+        h.update(f"nd{obj.dtype.str}{obj.shape}".encode())
+        if obj.dtype == object:
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    else:
+        raise TypeError(f"nelze hashovat {type(obj).__name__}")
+
+
+def _source_digest(render_fn) -> str:
+    """Hash kódu, který kreslí – skript metriky a společné moduly vykreslení."""
+    from importlib.metadata import version
+    h = hashlib.sha256(f"v{RENDER_CACHE_VERSION}|mpl{version('matplotlib')}".encode())
+    module = sys.modules.get(render_fn.__module__)
+    paths = [getattr(module, "__file__", None)] + [os.path.join(SCRIPT_DIR, f) for f in RENDER_SOURCES]
+    for path in paths:
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+
+# ======= CACHE =======
+class RenderCache:
+    def __init__(self, cache_dir, render_fn, max_bytes, settings):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.metric = f"{render_fn.__module__}.{render_fn.__qualname__}|{sorted(settings.items())}"
+        self.source = _source_digest(render_fn)
+        self.stored = 0
+
+    def key(self, job):
+        """Klíč úlohy (bez cílové cesty), nebo None, když úloha nejde hashovat."""
+        h = hashlib.sha256(f"{self.metric}|{self.source}|{os.path.splitext(job[-1])[1]}".encode())
+        try:
+            _feed(h, job[:-1])
+        except TypeError:
+            return None
+        return h.hexdigest()
+
+    def _entry(self, key, path=".png"):
+        return os.path.join(self.cache_dir, key[:2], key + os.path.splitext(path)[1])
+
+    def restore(self, key, out_path, to_file):
+        """
+        Graf z cache: do souboru out_path (vrací out_path), nebo jako bajty
+        (vrací (out_path, png)). Bez záznamu None.
+        """
+        if key is None:
+            return None
+        try:
+            if to_file:
+                for path in output_files(out_path):
+                    entry = self._entry(key, path)
+                    if os.path.lexists(path):
+                        os.unlink(path)
+                    try:
+                        os.link(entry, path)
+                    except FileNotFoundError:
+                        raise
+                    except OSError:
+                        shutil.copyfile(entry, path)   # jiný svazek / bez hardlinků
+                    os.utime(entry)   # LRU
+                return out_path
+            entry = self._entry(key)
+            with open(entry, "rb") as f:
+                result = (out_path, f.read())
+            os.utime(entry)
+            return result
+        except FileNotFoundError:
+            return None
+
+    def store(self, key, result, from_file):
+        """Uloží nově vykreslený graf (soubory out_path nebo bajty PNG)."""
+        if key is None:
+            return
+        try:
+            if from_file:
+                for path in output_files(result):
+                    self._store_file(self._entry(key, path), path, None)
+            else:
+                self._store_file(self._entry(key), None, result[1])
+            self.stored += 1
+        except OSError as e:
+            # plný disk apod. – graf ve výsledku je, jen se neuloží do cache
+            print(f"Varování: graf se nepodařilo uložit do cache: {e}", file=sys.stderr)
+
+    def _store_file(self, entry, path, content):
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        if path is not None:
+            try:
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+        os.replace(tmp_path, entry)
+
+    def evict(self):
+        """Nad limitem smaže nejdéle nepoužité grafy (podle mtime)."""
+        entries = []
+        total = 0
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for f in os.scandir(sub.path):
+                st = f.stat()
+                entries.append((st.st_mtime, st.st_size, f.path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        print(f"Cache grafů: odstraněno {removed} nejdéle nepoužitých, zbývá {total / 2**20:.0f} MB")
+
+
+def open_render_cache(data, render_fn, out_path, settings):
+    """Cache pro render_products, nebo None (vypnutá). out_path první úlohy určí work_dir."""
+    if not data.get('renderCache'):
+        return None
+    # úlohy míří do <work_dir>/img/<metrika>/<soubor>
+    work_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(out_path))))
+    cache_dir = os.path.normpath(os.path.join(work_dir, data.get('renderCacheDir') or RENDER_CACHE_DIR))
+    os.makedirs(cache_dir, exist_ok=True)
+    max_mb = data.get('renderCacheMaxMb') or RENDER_CACHE_MAX_MB
+    return RenderCache(cache_dir, render_fn, int(max_mb * 2**20), settings)
@@ -0,0 +1,158 @@
+# render_pool.py
+"""
+Paralelní vykreslování grafů po produktech.
+
+Skript si připraví seznam úloh (jedna úloha = jeden produkt, vše potřebné
+včetně titulku a cílové cesty je přímo v úloze) a funkci, která z úlohy
+vykreslí a uloží obrázek. render_products je rozdělí do procesů; každý
+worker má vlastní neinteraktivní backend Agg. Výpisy "Uloženo: …" jdou
+v pořadí úloh bez ohledu na to, který worker doběhl dřív.
+
+Počet workerů: data.json "renderWorkers" (1 = sériově), jinak počet CPU.
+
+S data.json "imageOutput": "pdf" / "atlas" (viz image_output) vykreslí
+render_fn obrázek do paměti a rodič ho v pořadí úloh přidá do společného
+souboru metriky. Poslední prvek úlohy je vždy cílová cesta – z ní se
+odvodí metrika (složka) a product_id (název souboru).
+
+Čas vykreslení každého produktu (změřený v procesu, který kreslil) jde do
+timings.json jako úsek "render".
+
+S data.json "renderCache": true se graf, jehož vstup se od minula nezměnil,
+vezme z cache (viz render_cache) místo nového vykreslení.
+"""
+
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from image_output import configure, image_settings, open_output, output_mode, split_out_path
+from render_cache import open_render_cache
+from timings import record, timed
+
+# ======= KONFIGURACE =======
+
+MAX_PENDING_PER_WORKER = 4   # kolik úloh může čekat ve frontě na jeden worker
+
+
+def _init_worker(settings):
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+    configure(settings)   # kódování obrázků (image_output.save_figure)
+
+
+def _preload_pyplot():
+    """pyplot v rodiči před forkem – workery ho zdědí a nenačítají každý zvlášť."""
+    from startup import pyplot
+    pyplot()
+
+
+def _render_png(render_fn, job):
+    """render_fn do paměti místo na disk – vrací (cílová cesta, PNG)."""
+    buf = io.BytesIO()
+    render_fn(job[:-1] + (buf,))
+    return job[-1], buf.getvalue()
+
+
+class _Cached:
+    """Graf z cache ve frontě vedle futures – výpisy a výstup zůstanou v pořadí úloh."""
+
+    def __init__(self, timed_result):
+        self._timed_result = timed_result
+
+    def result(self):
+        return self._timed_result
+
+
+def render_workers(data, job_count=None) -> int:
+    """Počet procesů pro vykreslení – nikdy víc než úloh (je-li jejich počet znám)."""
+    workers = data.get('renderWorkers') or os.cpu_count() or 1
+    if job_count is not None:
+        workers = min(int(workers), job_count)
+    return max(1, int(workers))
+
+
+def render_products(render_fn, jobs, data):
+    """
+    Zavolá render_fn(job) pro každou úlohu a vypíše uložené cesty.
+    render_fn musí být funkce na úrovni modulu (kvůli předání do workeru)
+    a vracet cestu k uloženému souboru.
+
+    jobs může být i generátor (streamovaný fetch) – úlohy se z něj berou
+    postupně a rozpracovaných je nejvýš MAX_PENDING_PER_WORKER na worker.
+    """
+    job_count = len(jobs) if isinstance(jobs, (list, tuple)) else None
+    if job_count == 0:
+        return
+
+    # "pdf" / "atlas": výstup metriky se otevře s první úlohou
+    to_files = output_mode(data) == "files"
+    settings = image_settings(data)
+    configure(settings)
+    output = None
+    cache = None
+    cache_fn = render_fn
+    if not to_files:
+        render_fn = partial(_render_png, render_fn)
+    render_fn = partial(timed, render_fn)
+    hits = 0
+
+    def from_cache(job):
+        """(klíč, výsledek z cache jako od timed, nebo None)."""
+        nonlocal cache
+        if not data.get('renderCache'):
+            return None, None
+        if cache is None:
+            cache = open_render_cache(data, cache_fn, job[-1], settings)
+        key = cache.key(job)
+        result, restore_ms = timed(cache.restore, key, job[-1], to_files)
+        return key, None if result is None else (result, restore_ms)
+
+    def done(job, key, timed_result, cached):
+        nonlocal output, hits
+        result, render_ms = timed_result
+        record("render", render_ms, product=split_out_path(job[-1])[1], **({"cached": True} if cached else {}))
+        if cached:
+            hits += 1
+        elif cache is not None:
+            cache.store(key, result, to_files)
+        if to_files:
+            print(f"Uloženo: {result}" + (" (z cache)" if cached else ""))
+            return
+        out_path, png = result
+        metric_dir, product_key = split_out_path(out_path)
+        if output is None:
+            output = open_output(data, metric_dir)
+        output.add(product_key, png)
+
+    workers = render_workers(data, job_count)
+    try:
+        if workers == 1:
+            for job in jobs:
+                key, hit = from_cache(job)
+                done(job, key, hit or render_fn(job), hit is not None)
+            return
+
+        print(f"Vykresluji grafy v {workers} procesech …")
+        _preload_pyplot()
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(settings,)) as pool:
+            for job in jobs:
+                key, hit = from_cache(job)
+                future = _Cached(hit) if hit is not None else pool.submit(render_fn, job)
+                pending.append((job, key, future))
+                if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                    job, key, future = pending.popleft()
+                    done(job, key, future.result(), isinstance(future, _Cached))
+            while pending:
+                job, key, future = pending.popleft()
+                done(job, key, future.result(), isinstance(future, _Cached))
+    finally:
+        if output is not None:
+            output.close()
+        if cache is not None:
+            print(f"Cache grafů: {hits} beze změny, {cache.stored} nově vykresleno")
+            cache.evict()
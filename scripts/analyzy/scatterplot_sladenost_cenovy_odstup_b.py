@@ -3,113 +3,110 @@
 
 import os
 import re
-import pandas as pd
-import matplotlib.pyplot as plt
-from dbsettings import get_connection  # tvoje centrální DB nastavení
+import sys
+from typing import TYPE_CHECKING
+from dbsettings import load_data_json  # centrální DB nastavení
+from image_output import image_format, save_figure  # formát a kódování grafů z data.json
+from render_pool import render_products  # paralelní vykreslování
+from timings import span  # úseky do timings.json
+from startup import pyplot  # matplotlib až při kreslení (Agg, trvalá font cache)
 
-# ====== PARAMETRY ======
-BASKET_ID = 7
-DATE_FROM =  "2025-05-01" #nebo None
-DATE_TO   = "2025-06-30"
-OUTPUT_DIR = "img/scatter_sladenost_odstup_b"
+if TYPE_CHECKING:
+    import pandas as pd
+
+# ====== KONFIGURACE ======
+
+# Globální objekt pro data z JSON
+data = {}
 
 # ====== POMOCNÉ ======
 def sanitize_filename(s: str) -> str:
     s = re.sub(r"[\\/:*?\"<>|]+", " ", s)
     return re.sub(r"\s+", " ", s).strip()
 
-# ====== SQL ======
-BASE_SQL = """
-SELECT
-  b.product_id,
-  COALESCE(p2.name, b.product_id) AS product_name,
-  s.date,
-  s.on_par,
-  s.min_price,
-  s.mode_price
-FROM bp b
-JOIN price_stat_i1 s
-  ON s.product_id = b.product_id
-LEFT JOIN product p2
-  ON p2.id = b.product_id
-WHERE b.basket_id = %s
-"""
-
-def build_sql_and_params():
-    sql = BASE_SQL
-    params = [BASKET_ID]
-    if DATE_FROM is not None:
-        sql += " AND s.date >= %s"
-        params.append(DATE_FROM)
-    if DATE_TO is not None:
-        sql += " AND s.date <= %s"
-        params.append(DATE_TO)
-    sql += " ORDER BY b.product_id, s.date"
-    return sql, tuple(params)
-
-def fetch_dataframe():
-    sql, params = build_sql_and_params()
-    conn = get_connection()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    if not rows:
-        return pd.DataFrame(columns=["product_id","product_name","date","on_par","min_price","mode_price"])
-
-    df = pd.DataFrame(rows)
-    df["date"]       = pd.to_datetime(df["date"], errors="coerce")
-    df["on_par"]     = pd.to_numeric(df["on_par"], errors="coerce")
-    df["min_price"]  = pd.to_numeric(df["min_price"], errors="coerce")
-    df["mode_price"] = pd.to_numeric(df["mode_price"], errors="coerce")
-
-    # vypočítáme podíl min/mode (pokud mode_price > 0)
-    df["min_mode_ratio"] = df.apply(
-        lambda r: r["min_price"]/r["mode_price"] if (pd.notna(r["min_price"]) and pd.notna(r["mode_price"]) and r["mode_price"] != 0) else None,
-        axis=1
+# ====== DATA ======
+def select_columns(df: "pd.DataFrame"):
+    """Sloupce grafu z řezu price_stat_i1 (celého i jednoho produktu – pipeline)."""
+    from shared_data import safe_ratio
+    # podíl min/mode (NaN, pokud mode_price chybí nebo je 0)
+    return df[["product_id","product_name","date","on_par","min_price","mode_price"]].assign(
+        min_mode_ratio=safe_ratio(df["min_price"], df["mode_price"])
     )
 
-    return df
-
-def plot_for_each_product(df: pd.DataFrame):
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    for (product_id, product_name), grp in df.groupby(["product_id","product_name"], dropna=False):
-        if grp.empty:
-            continue
-
-        x = grp["on_par"]
-        y = grp["min_mode_ratio"]
-
-        if y.dropna().empty:
+def fetch_dataframe(work_dir: str):
+    from shared_data import load_price_stats  # pandas až tady – chybné argv / data.json skončí dřív
+    return select_columns(load_price_stats(work_dir, data))
+
+def render_product(job):
+    """Vykreslí a uloží graf jednoho produktu (běží i v procesu workeru)."""
+    title, grp, out_path = job
+    plt = pyplot()
+
+    plt.figure()
+    plt.scatter(grp["on_par"], grp["min_mode_ratio"], alpha=0.7)
+    plt.title(title)
+    plt.xlabel("podil sladenosti")
+    plt.ylabel("cenový odstup B")
+    plt.grid(True, linestyle=":", linewidth=0.5)
+    plt.tight_layout()
+    save_figure(plt.gcf(), out_path)
+    plt.close()
+    return out_path
+
+def product_jobs(frames, output_dir: str):
+    """Úlohy po produktech z celého DataFrame nebo z proudu DataFrame po produktech."""
+    from shared_data import product_groups
+    for product_id, product_name, grp in product_groups(frames):
+        if grp["min_mode_ratio"].dropna().empty:
             continue
 
-        plt.figure()
-        plt.scatter(x, y, alpha=0.7)
-        title = f"{product_name} — scatter on_par vs. min/mode"
-        if DATE_FROM or DATE_TO:
-            title += f" ({DATE_FROM or '...'} až {DATE_TO or '...'})"
-        plt.title(title)
-        plt.xlabel("podil sladenosti")
-        plt.ylabel("cenový odstup B")
-        plt.grid(True, linestyle=":", linewidth=0.5)
-        plt.tight_layout()
+        title = f"{product_name} — scatter on_par vs. min/mode ({data['dateFrom']} až {data['dateTo']})"
+        fname = f"{sanitize_filename(str(product_id))}.{image_format(data)}"
+        yield (title, grp[["on_par", "min_mode_ratio"]], os.path.join(output_dir, fname))
 
-        fname = f"{sanitize_filename(str(product_id))}.png"
-        out_path = os.path.join(OUTPUT_DIR, fname)
-        plt.savefig(out_path, dpi=150)
-        plt.close()
-        print(f"Uloženo: {out_path}")
+def plot_for_each_product(frames, output_dir: str, streamed: bool = False):
+    os.makedirs(output_dir, exist_ok=True)
+    if streamed:
+        # pipeline: úlohy vznikají, jak přicházejí produkty z DB, a hned se kreslí
+        render_products(render_product, product_jobs(frames, output_dir), data)
+        return
+    with span("transform", what="jobs") as s:
+        jobs = list(product_jobs(frames, output_dir))
+        s["products"] = len(jobs)
+    render_products(render_product, jobs, data)
 
 def main():
+    global data
+    
+    # Vyžadujeme povinný parametr work_dir
+    if len(sys.argv) != 2:
+        print("Použití: python scatterplot_sladenost_cenovy_odstup_b.py <work_dir>")
+        sys.exit(1)
+    
+    work_dir = sys.argv[1]
+    json_path = os.path.join(work_dir, "data.json")
+    
+    # data.json musí existovat
+    if not os.path.exists(json_path):
+        print(f"Chyba: Soubor {json_path} neexistuje.")
+        sys.exit(1)
+    
+    # Načteme konfiguraci z data.json (bez fallback hodnot)
+    data = load_data_json(json_path, {})
+    output_dir = os.path.join(work_dir, "img/scatter_sladenost_odstup_b")
+    
     print("Načítám data…")
-    df = fetch_dataframe()
+    if data.get('pipeline'):
+        from shared_data import iter_price_stats
+        plot_for_each_product(map(select_columns, iter_price_stats(work_dir, data)), output_dir, streamed=True)
+        print("Hotovo.")
+        return
+    df = fetch_dataframe(work_dir)
     if df.empty:
         print("Žádná data k vykreslení.")
         return
     print(f"Načteno {len(df)} řádků pro {df['product_id'].nunique()} produktů.")
-    plot_for_each_product(df)
+    plot_for_each_product(df, output_dir)
     print("Hotovo.")
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# series_renderer.py
+"""
+Sdílené vykreslování časových řad po produktech (plot_min_mode_avg,
+plot_sladenost, plot_index_sladeni, plot_cenovy_odstup_a/b, entropizace_cen).
+
+Místo plt.figure() … tight_layout() … plt.close() pro každý produkt si proces
+(i každý worker render_pool) postaví jednu Figure/Axes s popisky, legendou,
+mřížkou a otočenými daty na ose x. Pro další produkty se jen vymění data
+čar, titulek a meze os. Rozvržení (tight_layout) se počítá vždy z výchozích
+okrajů jako u nové figury, a to jen když se změní něco, co ho ovlivní (viz
+SeriesRenderer._layout: popisky os – formát dat závisí na rozpětí období –,
+krajní popisky u okraje, výška titulku); jinak se použijí okraje minulého
+produktu. Obrázky jsou tak stejné jako při figuře pro každý produkt.
+
+S data.json "downsample" se řady před vykreslením prořídnou na počet bodů,
+který je při šířce os, dpi a tloušťce čáry vidět (viz downsample).
+
+Porovnání rychlosti a obrázků s původním postupem (graf po grafu):
+  python series_renderer.py [počet_produktů]
+
+Závislosti: matplotlib, numpy
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from downsample import downsample, target_buckets
+from image_output import current_settings, save_figure
+from startup import pyplot
+
+# ======= KONFIGURACE =======
+
+XLABEL = "Datum"
+SUBPLOT_SIDES = ("left", "right", "bottom", "top")
+
+# Renderery tohoto procesu podle podoby grafu (popisky řad, osy, referenční čára)
+_RENDERERS = {}
+
+
+# ======= RENDERER =======
+class SeriesRenderer:
+    """Jedna Figure/Axes pro všechny produkty se stejnou podobou grafu."""
+
+    def __init__(self, labels, ylabel, xlabel=XLABEL, hline=None):
+        plt = pyplot()
+        self.labels = labels
+        self.ylabel = ylabel
+        self.xlabel = xlabel
+        self.hline = hline
+        self.fig, self.ax = plt.subplots()
+        self.lines = None
+        self._layout_key = None
+        self._layout_params = None
+
+    def _build(self, x, ys):
+        """Čáry, popisky a legenda – až s prvními daty, aby osa x převzala jednotky (datum)."""
+        ax = self.ax
+        self.lines = [ax.plot(x, y, label=label)[0] for y, label in zip(ys, self.labels)]
+        if self.hline is not None:
+            # červená čára na referenční hodnotě
+            value, label = self.hline
+            ax.axhline(y=value, color="red", linestyle="--", linewidth=1, label=label)
+        self.title = ax.set_title("")
+        ax.set_xlabel(self.xlabel)
+        ax.set_ylabel(self.ylabel)
+        ax.legend()
+        ax.grid(True, linestyle=":", linewidth=0.5)
+        ax.tick_params(axis="x", labelrotation=90)  # otočení datumů
+
+    def _layout(self):
+        """
+        Co z proměnlivého obsahu ovlivní tight_layout: texty viditelných popisků
+        os (s offsetem), vzdálenost krajních popisků od okraje os (blíž než
+        velikost písma mohou přečnívat) a výška titulku – jeho šířku tight_layout
+        nepočítá. Stejný klíč při stejných výchozích okrajích = stejné rozvržení.
+        """
+        renderer = self.fig.canvas.get_renderer()
+        box = self.ax.get_window_extent(renderer)
+        key = [self.title.get_window_extent(renderer).height]
+        for i, (axis, edges) in enumerate(((self.ax.xaxis, (box.x0, box.x1)), (self.ax.yaxis, (box.y0, box.y1)))):
+            lo, hi = sorted(axis.get_view_interval())
+            locs = [loc for loc in axis.get_majorticklocs() if lo <= loc <= hi]
+            formatter = axis.get_major_formatter()
+            key.append((tuple(formatter.format_ticks(locs)), formatter.get_offset()))
+            if locs:
+                reach = axis.get_major_ticks()[0].label1.get_size() * self.fig.dpi / 72
+                first, last = self.ax.transData.transform([(locs[0], locs[0]), (locs[-1], locs[-1])])[:, i]
+                key.append((min(first - edges[0], reach), min(edges[1] - last, reach)))
+        return tuple(key)
+
+    def _downsample(self, x, ys):
+        mode = current_settings()["downsample"]
+        if mode == "none":
+            return x, ys
+        axes_width = self.fig.get_figwidth() * self.ax.get_position().width
+        linewidth = pyplot().rcParams["lines.linewidth"]
+        buckets = target_buckets(axes_width, current_settings()["dpi"], linewidth)
+        return downsample(x, ys, buckets, mode)
+
+    def render(self, title, x, ys, out_path):
+        x, ys = self._downsample(x, ys)
+        if self.lines is None:
+            self._build(x, ys)
+        else:
+            for line, y in zip(self.lines, ys):
+                line.set_data(x, y)
+            self.ax.relim()
+            self.ax.autoscale_view()
+        self.title.set_text(title)
+
+        # rozvržení jen když se změní popisky os nebo rozměr titulku (jinak by se ořízly);
+        # vždy z výchozích okrajů jako u nové figury – tight_layout na nich závisí
+        rc = pyplot().rcParams
+        self.fig.subplots_adjust(**{side: rc[f"figure.subplot.{side}"] for side in SUBPLOT_SIDES})
+        key = self._layout()
+        if key != self._layout_key:
+            self.fig.tight_layout()
+            self._layout_key = key
+            self._layout_params = {side: getattr(self.fig.subplotpars, side) for side in SUBPLOT_SIDES}
+        else:
+            self.fig.subplots_adjust(**self._layout_params)
+
+        save_figure(self.fig, out_path)
+        return out_path
+
+
+def render_series(title, x, series, out_path, ylabel, xlabel=XLABEL, hline=None):
+    """
+    Vykreslí časové řady jednoho produktu do out_path.
+    series = [(hodnoty, popisek), …]; hline = (hodnota, popisek) referenční čáry nebo None.
+    """
+    labels = tuple(label for _, label in series)
+    key = (labels, ylabel, xlabel, hline)
+    renderer = _RENDERERS.get(key)
+    if renderer is None:
+        renderer = _RENDERERS[key] = SeriesRenderer(labels, ylabel, xlabel, hline)
+    return renderer.render(title, x, [values for values, _ in series], out_path)
+
+
+def render_series_per_figure(title, x, series, out_path, ylabel, xlabel=XLABEL, hline=None):
+    """Původní postup – nová figura pro každý produkt (pro porovnání)."""
+    plt = pyplot()
+    plt.figure()
+    for values, label in series:
+        plt.plot(x, values, label=label)
+    if hline is not None:
+        plt.axhline(y=hline[0], color="red", linestyle="--", linewidth=1, label=hline[1])
+    plt.title(title)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.legend()
+    plt.grid(True, linestyle=":", linewidth=0.5)
+    plt.xticks(rotation=90)  # otočení datumů
+    plt.tight_layout()
+    save_figure(plt.gcf(), out_path)
+    plt.close()
+    return out_path
+
+
+# ======= POROVNÁNÍ =======
+def synthetic_products(count, days=90, seed=1):
+    """Náhodné řady min/mode/avg ceny pro count produktů (každý desátý s kratším obdobím)."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        span = days if i % 10 else int(rng.integers(5, days))
+        dates = np.arange(np.datetime64("2025-01-01"), np.datetime64("2025-01-01") + span)
+        base = rng.uniform(5, 5000)
+        walk = base * (1 + np.cumsum(rng.normal(0, 0.01, (3, span)), axis=1))
+        yield f"Produkt {i} — min/mode/avg price", dates, walk
+
+
+def benchmark(count):
+    """Časy obou postupů a počet produktů, jejichž obrázky se liší."""
+    series_labels = ("min_price", "mode_price", "avg_price")
+    timings = {}
+    images = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, fn in (("graf po grafu", render_series_per_figure), ("sdílená figura", render_series)):
+            started = time.perf_counter()
+            for i, (title, dates, walk) in enumerate(synthetic_products(count)):
+                fn(title, dates, list(zip(walk, series_labels)), os.path.join(tmp, f"{i}.png"), "Cena")
+            timings[name] = time.perf_counter() - started
+            for i in range(count):
+                with open(os.path.join(tmp, f"{i}.png"), "rb") as f:
+                    images.setdefault(i, []).append(f.read())
+    return timings, sum(a != b for a, b in images.values())
+
+
+def main():
+    if len(sys.argv) > 2:
+        print("Použití: python series_renderer.py [počet_produktů]")
+        sys.exit(1)
+    count = int(sys.argv[1]) if len(sys.argv) == 2 else 200
+
+    print(f"Vykresluji {count} produktů oběma způsoby …")
+    timings, different = benchmark(count)
+    base = timings["graf po grafu"]
+    for name, seconds in timings.items():
+        print(f"  {name:15s} {seconds:7.2f} s  {seconds / count * 1000:6.1f} ms/produkt  ×{base / seconds:.2f}")
+    print(f"Rozdílné obrázky: {different}/{count}")
+    print("Hotovo.")
+    if different:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
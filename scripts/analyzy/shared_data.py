@@ -0,0 +1,268 @@
+# shared_data.py
+"""
+Sdílený loader řezu price_stat_i1 pro plot skripty.
+
+První skript workflow načte pro (basketId, dateFrom, dateTo) všechny sloupce
+price_stat_i1 jedním dotazem a uloží je sloupcově do
+<work_dir>/cache/price_stat_i1.npz. Další skripty stejného výsledku už čtou
+jen tento soubor a do DB nesahají.
+
+S data.json "pipeline": true čte skript řez po produktech (iter_price_stats):
+z DB ve vlákně (stream_fetch.prefetch), takže první produkty se kreslí,
+zatímco se další ještě načítají; soubor se uloží po posledním produktu.
+
+Stejně se sdílí denní mapy cena → počet z price (<work_dir>/cache/daily_prices.npz,
+load_daily_prices) – čte je prepare_stats.py (statsEngine "python") a histogram.py,
+pokud soubor pro zadání existuje. Dávkové spuštění (batch_run.py) načte oba
+soubory jednou pro všechny výsledky se stejným košíkem a obdobím.
+
+Závislosti: mysql-connector-python, numpy, pandas
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from stream_fetch import fetch_columns, iter_product_groups, prefetch
+from timings import span
+
+# ======= KONFIGURACE =======
+
+CACHE_DIR = "cache"
+PRICE_STAT_FILE = "price_stat_i1.npz"
+DAILY_PRICE_FILE = "daily_prices.npz"
+
+# číselné sloupce price_stat_i1 (NULL → NaN)
+NUMERIC_COLUMNS = ["seller_count", "min_price", "mode_price", "avg_price", "on_par", "diB"]
+PRICE_STAT_DTYPES = (
+    [("product_id", "int64"), ("product_name", "object"), ("date", "datetime64[D]")]
+    + [(col, "float64") for col in NUMERIC_COLUMNS]
+)
+
+# ======= SQL =======
+PRICE_STAT_SQL = """
+SELECT
+  b.product_id,
+  COALESCE(p2.name, CAST(b.product_id AS CHAR)) AS product_name,
+  s.date,
+  s.seller_count,
+  s.min_price,
+  s.mode_price,
+  s.avg_price,
+  s.on_par,
+  s.diB
+FROM bp b
+JOIN price_stat_i1 s
+  ON s.product_id = b.product_id
+LEFT JOIN product p2
+  ON p2.id = b.product_id
+WHERE b.basket_id = %s
+  AND s.date >= %s
+  AND s.date <= %s
+ORDER BY b.product_id, s.date
+"""
+
+
+# ======= POMOCNÉ =======
+def cache_key(data) -> str:
+    """Klíč, pro který byl řez načten – při změně data.json se soubor zahodí."""
+    return f"{data['basketId']}|{data['dateFrom']}|{data['dateTo']}"
+
+
+def price_stat_path(work_dir: str) -> str:
+    return os.path.join(work_dir, CACHE_DIR, PRICE_STAT_FILE)
+
+
+def daily_price_path(work_dir: str) -> str:
+    return os.path.join(work_dir, CACHE_DIR, DAILY_PRICE_FILE)
+
+
+def safe_ratio(num: pd.Series, den: pd.Series) -> pd.Series:
+    """Podíl jako v MySQL – dělení nulou dává NULL (NaN), ne inf."""
+    return num / den.where(den != 0)
+
+
+def empty_frame() -> pd.DataFrame:
+    df = pd.DataFrame({
+        "product_id": pd.Series(dtype="int64"),
+        "product_name": pd.Series(dtype="object"),
+        "date": pd.Series(dtype="datetime64[ns]"),
+    })
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.Series(dtype="float64")
+    return df
+
+
+# ======= DB =======
+def fetch_price_stats(data) -> pd.DataFrame:
+    """Načte celý řez price_stat_i1 košíku za období z DB (streamovaně, po sloupcích)."""
+    params = (data['basketId'], data['dateFrom'], data['dateTo'])
+    cols = fetch_columns(PRICE_STAT_SQL, params, PRICE_STAT_DTYPES)
+    if len(cols["product_id"]) == 0:
+        return empty_frame()
+
+    with span("transform", what="dataframe", rows=len(cols["product_id"])):
+        return frame_from_columns(cols)
+
+
+def frame_from_columns(cols) -> pd.DataFrame:
+    """Sloupce PRICE_STAT_DTYPES → DataFrame ve tvaru load_price_stats."""
+    df = pd.DataFrame(cols)
+    df["product_name"] = df["product_name"].astype(str)
+    df["date"] = df["date"].astype("datetime64[ns]")
+    return df
+
+
+# ======= SOUBOR =======
+def save_price_stats(df: pd.DataFrame, path: str, key: str):
+    """Uloží sloupce do .npz (zápis přes dočasný soubor, aby souběžný čtenář neviděl polovinu)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = {
+        "product_id": df["product_id"].to_numpy(dtype="int64"),
+        "product_name": df["product_name"].to_numpy(dtype=str),
+        "date": df["date"].to_numpy(dtype="datetime64[D]"),
+    }
+    for col in NUMERIC_COLUMNS:
+        columns[col] = df[col].to_numpy(dtype="float64")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, key=np.array(key), **columns)
+    os.replace(tmp_path, path)
+
+
+def read_price_stats(path: str, key: str):
+    """Vrátí DataFrame ze souboru, nebo None, pokud soubor chybí či patří k jinému zadání."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        if str(npz["key"]) != key:
+            return None
+        df = pd.DataFrame({
+            "product_id": npz["product_id"],
+            "product_name": npz["product_name"].astype(object),
+            "date": npz["date"].astype("datetime64[ns]"),
+        })
+        for col in NUMERIC_COLUMNS:
+            df[col] = npz[col]
+    return df
+
+
+def load_price_stats(work_dir: str, data) -> pd.DataFrame:
+    """
+    Vrátí řez price_stat_i1 pro data.json výsledku.
+    Z DB se čte jen jednou za výsledek, další volání čtou soubor v work_dir.
+    """
+    path = price_stat_path(work_dir)
+    key = cache_key(data)
+
+    with span("cache", what="read", file=PRICE_STAT_FILE) as s:
+        df = read_price_stats(path, key)
+        s["hit"] = df is not None
+    if df is not None:
+        print(f"Používám sdílená data z {path}")
+        return df
+
+    print("Načítám price_stat_i1 z DB …")
+    df = fetch_price_stats(data)
+    with span("cache", what="write", file=PRICE_STAT_FILE, rows=len(df)):
+        save_price_stats(df, path, key)
+    print(f"Uloženo: {path}")
+    return df
+
+
+def iter_price_stats(work_dir: str, data):
+    """
+    Řez price_stat_i1 jako DataFrame po produktech (seřazené podle product_id).
+    Bez souboru ve work_dir se čte z DB ve vlákně a produkt se vydá, jakmile
+    je načtený; po posledním se řez uloží jako u load_price_stats.
+    """
+    path = price_stat_path(work_dir)
+    key = cache_key(data)
+
+    with span("cache", what="read", file=PRICE_STAT_FILE) as s:
+        df = read_price_stats(path, key)
+        s["hit"] = df is not None
+    if df is not None:
+        print(f"Používám sdílená data z {path}")
+        for _, grp in df.groupby("product_id", sort=True):
+            yield grp
+        return
+
+    print("Načítám price_stat_i1 z DB (pipeline) …")
+    params = (data['basketId'], data['dateFrom'], data['dateTo'])
+    parts = []
+    for cols in prefetch(iter_product_groups(PRICE_STAT_SQL, params, PRICE_STAT_DTYPES)):
+        parts.append(cols)
+        yield frame_from_columns(cols)
+
+    df = frame_from_columns({name: np.concatenate([p[name] for p in parts]) for name, _ in PRICE_STAT_DTYPES}) \
+        if parts else empty_frame()
+    with span("cache", what="write", file=PRICE_STAT_FILE, rows=len(df)):
+        save_price_stats(df, path, key)
+    print(f"Uloženo: {path}")
+
+
+def read_daily_prices(path: str, key: str):
+    """Denní mapy cen ze souboru ({sloupec: np.ndarray}), nebo None (chybí / jiné zadání)."""
+    from desc_stats import PRICE_COLUMNS
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as npz:
+        if str(npz["key"]) != key:
+            return None
+        return {name: npz[name] for name, _ in PRICE_COLUMNS}
+
+
+def save_daily_prices(cols, path: str, key: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, key=np.array(key), **cols)
+    os.replace(tmp_path, path)
+
+
+def shared_daily_prices(work_dir: str, data):
+    """Denní mapy cen, pokud už je pro zadání načetl jiný krok (nebo batch_run.py), jinak None."""
+    path = daily_price_path(work_dir)
+    with span("cache", what="read", file=DAILY_PRICE_FILE) as s:
+        cols = read_daily_prices(path, cache_key(data))
+        s["hit"] = cols is not None
+    if cols is not None:
+        print(f"Používám sdílená data z {path}")
+    return cols
+
+
+def load_daily_prices(work_dir: str, data):
+    """
+    Mapy cena → počet za (produkt, den) pro košík a období z data.json
+    (desc_stats.PRICE_COLUMNS). Z DB se čtou jen jednou za výsledek.
+    """
+    from desc_stats import fetch_daily_prices
+    cols = shared_daily_prices(work_dir, data)
+    if cols is not None:
+        return cols
+
+    print("Načítám denní ceny z DB …")
+    path = daily_price_path(work_dir)
+    cols = fetch_daily_prices(data['basketId'], data['dateFrom'], data['dateTo'])
+    with span("cache", what="write", file=DAILY_PRICE_FILE, rows=len(cols["product_id"])):
+        save_daily_prices(cols, path, cache_key(data))
+    print(f"Uloženo: {path}")
+    return cols
+
+
+def product_groups(frames):
+    """
+    (product_id, product_name, DataFrame produktu) z celého řezu (groupby)
+    nebo z proudu DataFrame po produktech (iter_price_stats).
+    """
+    if isinstance(frames, pd.DataFrame):
+        for (product_id, product_name), grp in frames.groupby(["product_id", "product_name"], dropna=False):
+            if not grp.empty:
+                yield product_id, product_name, grp
+        return
+    for grp in frames:
+        if not grp.empty:
+            yield grp["product_id"].iat[0], grp["product_name"].iat[0], grp
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# startup.py
+"""
+Rychlý start analytických skriptů.
+
+Skripty importují pandas / matplotlib / mysql.connector až tam, kde je
+opravdu potřebují (chybné argv, chybějící data.json nebo prázdná data
+skončí dřív, než se těžké knihovny načtou). Matplotlib se bere přes
+pyplot(), které předtím vynutí neinteraktivní backend Agg a trvalé umístění
+konfigurace a font cache (MPLCONFIGDIR) – jinak si ji matplotlib bez
+zapisovatelného HOME staví při každém běhu znovu v dočasném adresáři.
+
+Režim reportu (sledování regresí startu):
+  python startup.py [--budget MS] [skript.py ...]
+Bez seznamu skriptů se měří kroky workflow (WORKFLOW_STEPS). Každý skript
+se spustí bez argumentů pod `python -X importtime` (skončí hned po importech
+na chybě použití) a vypíše se čas importů, nejtěžší balíčky a zda se vešel
+do limitu. Návratový kód 1 = některý skript je přes limit.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+# ======= KONFIGURACE =======
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Trvalá konfigurace / font cache matplotlibu (backend/common/cache/matplotlib)
+MPL_CONFIG_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, "../../common/cache/matplotlib"))
+
+STARTUP_BUDGET_MS = 300   # limit pro importy na úrovni modulu
+# Výjimky z limitu: histogram.py potřebuje numpy/pandas na každé cestě,
+# která něco počítá, takže je importuje rovnou (líně jen matplotlib)
+SCRIPT_BUDGETS_MS = {"histogram.py": 700}
+TOP_IMPORTS = 3           # kolik nejtěžších balíčků vypsat
+
+# Kroky workflow, jejichž start report hlídá (pomocné moduly a nástroje sem nepatří)
+WORKFLOW_STEPS = (
+    "prepare_stats.py", "histogram.py",
+    "plot_min_mode_avg.py", "plot_sladenost.py", "plot_index_sladeni.py",
+    "plot_cenovy_odstup_a.py", "plot_cenovy_odstup_b.py", "entropizace_cen.py",
+    "scatterplot_sladenost_cenovy_odstup_b.py",
+)
+
+
+# ======= MATPLOTLIB =======
+def configure_matplotlib():
+    """Agg + trvalá font cache; musí proběhnout před prvním importem matplotlibu."""
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    if "MPLCONFIGDIR" not in os.environ:
+        try:
+            os.makedirs(MPL_CONFIG_DIR, exist_ok=True)
+            os.environ["MPLCONFIGDIR"] = MPL_CONFIG_DIR
+        except OSError:
+            pass  # nezapisovatelné – matplotlib si poradí sám (dočasný adresář)
+
+
+def pyplot():
+    """matplotlib.pyplot načtený až při prvním kreslení."""
+    configure_matplotlib()
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# ======= REPORT =======
+def parse_importtime(stderr: str):
+    """Importy nejvyšší úrovně z výstupu -X importtime: [(balíček, kumulativně µs)]."""
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if name.startswith("  "):
+            continue  # vnořený import – je už v kumulativním čase rodiče
+        top.append((name.strip(), int(cumulative)))
+    return top
+
+
+def run_importtime(*args):
+    """(importy nejvyšší úrovně, čas procesu v ms) pro python -X importtime <args>."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=SCRIPT_DIR, capture_output=True, text=True,
+    )
+    return parse_importtime(proc.stderr), (time.perf_counter() - started) * 1000
+
+
+def measure(script: str, baseline: set):
+    """(čas importů v ms, celkový čas procesu v ms, nejtěžší importy)."""
+    top, wall_ms = run_importtime(script)
+    # jen importy skriptu, ne start interpretru (site, encodings, …)
+    script_imports = [(n, us) for n, us in top if n not in baseline]
+    import_ms = sum(us for _, us in script_imports) / 1000
+    heaviest = sorted(script_imports, key=lambda x: -x[1])[:TOP_IMPORTS]
+    return import_ms, wall_ms, heaviest
+
+
+def main():
+    args = sys.argv[1:]
+    budget = None
+    if args[:1] == ["--budget"]:
+        if len(args) < 2:
+            print("Použití: python startup.py [--budget MS] [skript.py ...]")
+            sys.exit(1)
+        budget = float(args[1])
+        args = args[2:]
+    scripts = args or list(WORKFLOW_STEPS)
+
+    baseline = {name for name, _ in run_importtime("-c", "pass")[0]}
+    over = []
+    print(f"Start skriptů (limit importů {budget or STARTUP_BUDGET_MS:.0f} ms):")
+    for script in scripts:
+        limit = budget or SCRIPT_BUDGETS_MS.get(os.path.basename(script), STARTUP_BUDGET_MS)
+        import_ms, wall_ms, heaviest = measure(script, baseline)
+        status = "OK" if import_ms <= limit else f"PŘES LIMIT {limit:.0f} ms"
+        if import_ms > limit:
+            over.append(script)
+        heavy = ", ".join(f"{n} {us / 1000:.0f} ms" for n, us in heaviest)
+        print(f"  {script:45s} importy {import_ms:7.1f} ms  proces {wall_ms:7.1f} ms  {status}  [{heavy}]")
+
+    if over:
+        print(f"Přes limit: {', '.join(over)}")
+        sys.exit(1)
+    print("Hotovo.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# stream_fetch.py
+"""
+Streamované čtení výsledku dotazu bez fetchall().
+
+Dotaz běží přes nebufferovaný kurzor (řádky zůstávají na serveru), čte se po
+blocích fetchmany() jako tuple a každý blok se rovnou převede na typová NumPy
+pole po sloupcích – žádné slovníky na řádek.
+
+  fetch_columns()       – celý výsledek jako {sloupec: np.ndarray}
+  iter_product_groups() – po produktech; dotaz musí být ORDER BY product_id,
+                          produkt se vydá, jakmile jsou všechny jeho řádky
+                          načteny (paměť ~ největší produkt + jeden blok)
+  prefetch()            – producent/konzument: libovolný z generátorů výše
+                          běží ve vlákně a plní omezenou frontu, volající
+                          mezitím zpracovává (kreslí) předchozí položky
+
+Sloupce se zadávají jako seznam (název, dtype), např.
+[("product_id", "int64"), ("date", "datetime64[D]"), ("price", "float64")].
+NULL se u float převede na NaN, u datetime na NaT; dtype object ponechá
+hodnoty tak, jak je vrátil konektor (např. názvy produktů).
+
+Do timings.json jde execute, součet času fetchmany() (fetch, rows) a součet
+převodů bloků na pole (transform) – čas, kdy volající blok zpracovává, se
+nepočítá.
+"""
+
+import queue
+import threading
+import time
+
+import numpy as np
+
+from dbsettings import get_connection
+from timings import record, span
+
+# ======= KONFIGURACE =======
+
+CHUNK_SIZE = 50_000   # řádků na jedno fetchmany()
+PREFETCH_DEPTH = 8    # kolik načtených položek (produktů) může čekat na zpracování
+
+_END = object()
+
+
+# ======= POMOCNÉ =======
+def _chunk_to_columns(rows, columns):
+    """Převede blok tuple řádků na {sloupec: np.ndarray}."""
+    transposed = list(zip(*rows))
+    return {
+        name: np.array(values, dtype=dtype)
+        for (name, dtype), values in zip(columns, transposed)
+    }
+
+
+def _empty_columns(columns):
+    return {name: np.array([], dtype=dtype) for name, dtype in columns}
+
+
+def _concat(parts, columns):
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name, _ in columns}
+
+
+# ======= DB =======
+def iter_chunks(sql, params, columns, chunk_size=CHUNK_SIZE, connect=None):
+    """
+    Generátor bloků {sloupec: np.ndarray} přímo z nebufferovaného kurzoru.
+    connect nahradí get_connection (např. dbsettings.mysql_connection).
+    """
+    conn = (connect or get_connection)()
+    cur = conn.cursor(buffered=False)
+    fetch_s = convert_s = 0.0
+    rows_total = 0
+    try:
+        with span("execute"):
+            cur.execute(sql, params)
+        while True:
+            started = time.perf_counter()
+            rows = cur.fetchmany(chunk_size)
+            fetch_s += time.perf_counter() - started
+            if not rows:
+                break
+            rows_total += len(rows)
+            started = time.perf_counter()
+            chunk = _chunk_to_columns(rows, columns)
+            convert_s += time.perf_counter() - started
+            yield chunk
+    finally:
+        # při předčasném ukončení musíme zbytek výsledku dočíst, jinak nejde zavřít
+        if conn.unread_result:
+            conn.consume_results()
+        cur.close()
+        conn.close()
+        record("fetch", fetch_s * 1000, rows=rows_total)
+        record("transform", convert_s * 1000, what="columns", rows=rows_total)
+
+
+def fetch_columns(sql, params, columns, chunk_size=CHUNK_SIZE, connect=None):
+    """Celý výsledek dotazu jako {sloupec: np.ndarray}."""
+    parts = list(iter_chunks(sql, params, columns, chunk_size, connect))
+    if not parts:
+        return _empty_columns(columns)
+    return _concat(parts, columns)
+
+
+def iter_product_groups(sql, params, columns, chunk_size=CHUNK_SIZE, key="product_id", connect=None):
+    """
+    Vydává {sloupec: np.ndarray} pro jeden produkt po druhém.
+    Výsledek dotazu musí být seřazený podle sloupce key.
+    """
+    pending = []   # části aktuálního (zatím neuzavřeného) produktu
+    for chunk in iter_chunks(sql, params, columns, chunk_size, connect):
+        ids = chunk[key]
+        cuts = np.flatnonzero(ids[1:] != ids[:-1]) + 1
+        starts = np.concatenate(([0], cuts))
+        ends = np.concatenate((cuts, [len(ids)]))
+        for start, end in zip(starts, ends):
+            if pending and pending[0][key][0] != ids[start]:
+                yield _concat(pending, columns)
+                pending = []
+            pending.append({name: arr[start:end] for name, arr in chunk.items()})
+    if pending:
+        yield _concat(pending, columns)
+
+
+# ======= PIPELINE =======
+def _put(q, stop, item) -> bool:
+    """Vloží do fronty; čeká, dokud je plná, ale skončí (False), když konzument skončil."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def prefetch(items, depth=PREFETCH_DEPTH):
+    """
+    Vydává položky items, které se čtou v samostatném vlákně do fronty
+    s nejvýš depth položkami – čtení z DB (síť, fetchmany) tak běží souběžně
+    se zpracováním u volajícího. Výjimka z vlákna se vyhodí u volajícího;
+    skončí-li volající dřív, vlákno generátor items zavře (dočte a zavře kurzor).
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(q, stop, (None, item)):
+                    break
+            else:
+                _put(q, stop, (_END, None))
+        except BaseException as e:   # předá se konzumentovi
+            _put(q, stop, (e, None))
+        finally:
+            if stop.is_set() and hasattr(items, "close"):
+                items.close()
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            error, item = q.get()
+            if error is _END:
+                return
+            if error is not None:
+                raise error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,175 @@
+# timings.py
+"""
+Měření kroků analýzy do <work_dir>/timings.json.
+
+Každý krok (skript) zapíše při skončení jeden záznam do pole "steps":
+celkový čas, špičkovou paměť (proces kroku i jeho workery render_pool),
+úseky (spans) v pořadí, jak začaly, a souhrn po názvech úseků.
+
+Úseky:
+  connect   – výdej připojení (dbsettings.get_connection)
+  execute   – cursor.execute (u nebufferovaného kurzoru jen do prvního řádku)
+  fetch     – čtení řádků z DB (rows = počet řádků)
+  transform – převod na pole / DataFrame a výpočty
+  render    – vykreslení jednoho produktu (product = product_id, i ve workeru)
+  cache     – čtení / zápis sdílených souborů ve work_dir
+
+Úseky z vedlejšího vlákna (fetch v režimu "pipeline") mají atribut thread.
+
+Měření je vždy zapnuté: úsek je dvojice perf_counter() a slovník v seznamu,
+getrusage() jednou na úsek. Záznam se zahájí v load_data_json (z cesty
+k data.json se pozná work_dir) a zapíše při ukončení procesu (atexit);
+warm worker (analysis_worker) volá flush() sám, protože fork končí os._exit.
+
+Použití ve skriptu:
+  with span("transform", products=n) as s:
+      ...
+      s["rows"] = len(df)          # atributy lze doplnit až uvnitř
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# ======= KONFIGURACE =======
+
+TIMINGS_FILE = "timings.json"
+
+_work_dir = None
+_step = None
+_pid = None
+_started_at = None
+_t0 = time.perf_counter()
+_spans = []
+_local = threading.local()   # hloubka vnoření zvlášť pro každé vlákno (fetch ve vlákně – pipeline)
+_atexit_registered = False
+
+
+# ======= POMOCNÉ =======
+def _now_ms() -> float:
+    return round((time.perf_counter() - _t0) * 1000, 3)
+
+
+def _peak_rss_mb(who=resource.RUSAGE_SELF) -> float:
+    # Linux vrací ru_maxrss v KiB
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def _depth() -> int:
+    return getattr(_local, "depth", 0)
+
+
+def _mark(entry):
+    """Hloubka vnoření a u vedlejšího vlákna jeho název (úseky se pak časově překrývají)."""
+    depth = _depth()
+    if depth:
+        entry["depth"] = depth
+    if threading.current_thread() is not threading.main_thread():
+        entry["thread"] = threading.current_thread().name
+
+
+def _summary(spans) -> dict:
+    """Součty po názvech úseků (vnořený úsek se počítá i ve svém nadřazeném)."""
+    summary = {}
+    for s in spans:
+        item = summary.setdefault(s["name"], {"count": 0, "total_ms": 0.0})
+        item["count"] += 1
+        item["total_ms"] = round(item["total_ms"] + s["duration_ms"], 3)
+        if "rows" in s:
+            item["rows"] = item.get("rows", 0) + s["rows"]
+    return summary
+
+
+# ======= ZÁZNAM =======
+def start(work_dir, step=None):
+    """Zahájí měření kroku; výsledek půjde do <work_dir>/timings.json."""
+    global _work_dir, _step, _pid, _started_at, _t0, _spans, _atexit_registered
+    _work_dir = work_dir
+    _step = step or os.path.basename(sys.argv[0])
+    _pid = os.getpid()
+    _started_at = datetime.now().isoformat(timespec="milliseconds")
+    _t0 = time.perf_counter()
+    _spans = []
+    _local.depth = 0
+    if not _atexit_registered:
+        atexit.register(flush)
+        _atexit_registered = True
+
+
+@contextmanager
+def span(name, **attrs):
+    """Změří blok; vrací slovník úseku, do kterého lze doplnit atributy (rows, …)."""
+    record = {"name": name, "start_ms": _now_ms(), **attrs}
+    _mark(record)
+    _spans.append(record)
+    _local.depth = _depth() + 1
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _local.depth -= 1
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        record["peak_rss_mb"] = _peak_rss_mb()
+
+
+def record(name, duration_ms, **attrs):
+    """
+    Úsek změřený jinde – např. render ve workeru nebo součet mnoha krátkých
+    čtení. Začátek se dopočítá zpět od teď.
+    """
+    end = _now_ms()
+    entry = {"name": name, "start_ms": round(end - duration_ms, 3), **attrs,
+             "duration_ms": round(duration_ms, 3)}
+    _mark(entry)
+    _spans.append(entry)
+    return entry
+
+
+def timed(fn, *args):
+    """Zavolá fn(*args) a vrátí (výsledek, trvání v ms) – pro předání z workeru."""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+# ======= ZÁPIS =======
+def flush(exit_code=None):
+    """Připíše záznam kroku do timings.json (jen v procesu, který měření zahájil)."""
+    global _work_dir
+    if _work_dir is None or os.getpid() != _pid:
+        return
+    work_dir, _work_dir = _work_dir, None
+
+    step = {
+        "step": _step,
+        "pid": _pid,
+        "started_at": _started_at,
+        "total_ms": _now_ms(),
+        "peak_rss_mb": _peak_rss_mb(),
+        "children_peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    if exit_code is not None:
+        step["exit_code"] = exit_code
+    step["summary"] = _summary(_spans)
+    step["spans"] = _spans
+
+    path = os.path.join(work_dir, TIMINGS_FILE)
+    try:
+        timings = {"steps": []}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                timings = json.load(f)
+        timings["steps"].append(step)
+        tmp_path = f"{path}.{_pid}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(timings, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except (OSError, ValueError, KeyError) as e:
+        # měření nesmí shodit krok
+        print(f"Varování: {path} se nepodařilo zapsat: {e}", file=sys.stderr)
@@ -90,6 +90,7 @@ function buildImageModule(allProducts) {
             // Pokud je tagValue přímo buffer nebo cesta k souboru, použij to
    
 
+            // U imageFormat "svg" / "webp" ukládají analýzy vedle i .png pro report
             if (fs.existsSync(imgPath + '.png')) {
                 return fs.readFileSync(imgPath + '.png');
             }
@@ -1,12 +1,13 @@
 // backend/src/routes/analyses.js
 
 import { Router } from 'express';
-import { query } from '../db.js';
+import { getPool, query } from '../db.js';
 
 import { promises as fs } from 'fs';
 import path from 'path';
 
 import { spawn } from 'child_process';
+import net from 'net';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
 import process from 'process'; // Add this import
@@ -16,6 +17,10 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = dirname(__filename);
 const BACKEND_DIR = path.join(__dirname, '../..');
 
+// Socket předehřátého Python workeru (scripts/analyzy/analysis_worker.py);
+// když není nastavený nebo worker neběží, spouští se python3 pro každý krok
+const PY_WORKER_SOCKET = process.env.PY_WORKER_SOCKET || '';
+
 
 const router = Router();
 
@@ -247,17 +252,17 @@ async function runAnalysis(analysisId, settings) {
     const resultDir = path.join(BACKEND_DIR, 'results', resultId.toString());
     await fs.mkdir(resultDir, { recursive: true });
 
-    // Uložíme settings do data.json
+    // Uložíme settings do data.json (resultId určuje názvy tabulek se statistikami)
     await fs.writeFile(
       path.join(resultDir, 'data.json'),
-      JSON.stringify(settings, null, 2)
+      JSON.stringify({ ...settings, resultId }, null, 2)
     );
 
 
 
     let workflow = settings?.workflow||'';
     let steps=workflow.split('\n').map(s=>s.trim()).filter(s=>s);
-    if (steps.length) {
+    try {
       for (const step of steps) {
         console.log(`Executing step: ${step} `);
         const success = await runScript(step, resultDir);
@@ -270,14 +275,32 @@ async function runAnalysis(analysisId, settings) {
           return;
         }
       }
+
+      await query(
+          'UPDATE result SET status = ? WHERE id = ?',
+          ['completed', resultId]
+        );
+    } finally {
+      await dropStatsTables(resultId);
     }
+}   
 
 
-    await query(
-        'UPDATE result SET status = ? WHERE id = ?',
-        ['completed', resultId]
-      );
-}   
+/**
+ * Smaže tabulky se statistikami výsledku z prepare_stats.py (a_desc_<id>
+ * a mezivýsledky a_desc1..3_<id>, pokud krok skončil v půlce). Kroky
+ * workflow je čtou opakovaně, proto se mažou až po posledním kroku.
+ * @param {number} resultId - Id výsledku
+ */
+async function dropStatsTables(resultId) {
+  const id = Number.parseInt(resultId, 10);
+  const tables = ['a_desc', 'a_desc1', 'a_desc2', 'a_desc3'].map(t => `${t}_${id}`);
+  try {
+    await getPool().query(`DROP TABLE IF EXISTS ${tables.join(', ')}`);
+  } catch (error) {
+    console.error(`Nepodařilo se smazat tabulky statistik výsledku ${id}: ${error.message}`);
+  }
+}
 
 
 
@@ -290,6 +313,12 @@ async function runAnalysis(analysisId, settings) {
 async function runScript(scriptPath, workDir) {
   const fullScriptPath = path.join(BACKEND_DIR, 'scripts', scriptPath);
   const ext = path.extname(scriptPath).toLowerCase();
+
+  if (ext === '.py' && PY_WORKER_SOCKET) {
+    const success = await runInWorker(fullScriptPath, workDir);
+    if (success !== null) return success;
+    console.warn(`Python worker na ${PY_WORKER_SOCKET} nedostupný, spouštím python3`);
+  }
   
   let command, args;
   switch (ext) {
@@ -335,5 +364,59 @@ async function runScript(scriptPath, workDir) {
   });
 }
 
+/**
+ * Spustí Python skript v předehřátém workeru (analysis_worker.py)
+ * @param {string} fullScriptPath - Absolutní cesta ke skriptu
+ * @param {string} workDir - Pracovní adresář pro skript
+ * @returns {Promise<boolean|null>} - true/false podle exit kódu, null pokud se k workeru nelze připojit
+ */
+function runInWorker(fullScriptPath, workDir) {
+  return new Promise((resolve) => {
+    let connected = false;
+    let exitCode = null;
+    let buffer = '';
+
+    const socket = net.createConnection(PY_WORKER_SOCKET, () => {
+      connected = true;
+      socket.write(JSON.stringify({ script: fullScriptPath, workDir }) + '\n');
+    });
+    socket.setEncoding('utf8');
+
+    // odpověď: řádky JSON {stream, data} a nakonec {exitCode}
+    socket.on('data', (chunk) => {
+      buffer += chunk;
+      let nl;
+      while ((nl = buffer.indexOf('\n')) >= 0) {
+        const line = buffer.slice(0, nl);
+        buffer = buffer.slice(nl + 1);
+        if (!line) continue;
+        let msg;
+        try {
+          msg = JSON.parse(line);
+        } catch (error) {
+          // poškozený výstup workeru = chybný krok, ne pád serveru
+          console.error(`Worker sent invalid line (${error.message}): ${line}`);
+          resolve(false);
+          socket.destroy();
+          return;
+        }
+        if (msg.stream === 'stdout') console.log(`Script output: ${msg.data}`);
+        else if (msg.stream === 'stderr') console.error(`Script error: ${msg.data}`);
+        else if ('exitCode' in msg) exitCode = msg.exitCode;
+      }
+    });
+
+    socket.on('error', (error) => {
+      if (!connected) return resolve(null);
+      console.error(`Worker error: ${error}`);
+      resolve(false);
+    });
+
+    socket.on('close', () => {
+      resolve(exitCode === 0);
+    });
+  });
+}
+
 
 export default router;